@@ -1,36 +1,193 @@
 import os, certifi
 from datetime import timedelta
 from flask import Flask
-from flask_bcrypt import Bcrypt
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
-from flask_pymongo import PyMongo
 from flask_restful import Api
 from flask_sslify import SSLify
+from werkzeug.middleware.proxy_fix import ProxyFix
 
+from .database import Mongo
+from .passwords import PasswordHasher
+from .compression import Compress
+from .events import ChangeBroker
+from .ratelimit import RateLimiter
+from .utils import ResponseCache
 
-## init flask app ##
-app = Flask(__name__)
 
-## config stuff ##
-app.url_map.strict_slashes = False
-app.config['PROPAGATE_EXCEPTIONS'] = True
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config['MONGO_URI'] = os.getenv('MONGO_RW_URI')
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(weeks=4)
+## addons, bound to an app by `create_app()` ##
+mongo = Mongo() # connects lazily, see `gunicorn.conf.py`
+hasher = PasswordHasher() # starts its process pool lazily, see `gunicorn.conf.py`
+response_cache = ResponseCache() # anonymous reads of public collections, per process
+jwt = JWTManager()
+cors = CORS()
+compress = Compress()
+events = ChangeBroker() # collection changes, see `/collections/events`
+limiter = RateLimiter()
 
-## addons ##
-sslify = SSLify(app)
-mongo = PyMongo(app, tlsCAFile=certifi.where())
-bcrypt = Bcrypt(app)
-api = Api(app)
-jwt = JWTManager(app)
-cors = CORS(app)
+## mongodb collections, resolved on use ##
+users_db = mongo.collection('users')
+cards_db = mongo.collection('cards')
+users_read_db = mongo.collection('users', secondary=True) # read only code paths, see `MONGO_SECONDARY_READS`
+cards_read_db = mongo.collection('cards', secondary=True)
+journal_db = mongo.collection('journal')
+owned_db = mongo.collection('owned')
+tags_db = mongo.collection('tags')
+jobs_db = mongo.collection('jobs')
+job_chunks_db = mongo.collection('job_chunks')
+migrations_db = mongo.collection('migrations')
+idempotency_db = mongo.collection('idempotency')
+ratelimits_db = mongo.collection('ratelimits', guarded=False) # the limiter fails open on its own
+snapshots_db = mongo.collection('snapshots')
+snapshot_chunks_db = mongo.collection('snapshot_chunks')
 
-## mongodb collections ##
-users_db = mongo.db['users']
-cards_db = mongo.db['cards']
 
+def default_config():
+    return {
+        'PROPAGATE_EXCEPTIONS': True,
+        'SECRET_KEY': os.getenv('SECRET_KEY'),
+        'MONGO_URI': os.getenv('MONGO_RW_URI'),
+        'MONGO_CLIENT': None, # an already created client, e.g. a local stand-in
+        'MONGO_DBNAME': None, # defaults to the database in `MONGO_URI`
+        'MONGO_OPTIONS': { 'tlsCAFile': certifi.where() },
+        'MONGO_SECONDARY_READS': os.getenv('MONGO_SECONDARY_READS', 'true').lower() == 'true',
+        'MONGO_MAX_STALENESS': int(os.getenv('MONGO_MAX_STALENESS', 90)), # seconds, at least 90
+        'READ_YOUR_WRITES_WINDOW': int(os.getenv('READ_YOUR_WRITES_WINDOW', 120)), # seconds a user reads from the primary after writing, more than the max staleness + 10
+        'REQUEST_TIMEOUT': float(os.getenv('REQUEST_TIMEOUT', 10)), # seconds of database reads per request, `0` for unbounded
+        'DB_BREAKER_THRESHOLD': int(os.getenv('DB_BREAKER_THRESHOLD', 5)), # consecutive failed requests
+        'DB_BREAKER_COOLDOWN': float(os.getenv('DB_BREAKER_COOLDOWN', 10)), # seconds
+        'JWT_ACCESS_TOKEN_EXPIRES': timedelta(weeks=4),
+        'BCRYPT_LOG_ROUNDS': int(os.getenv('BCRYPT_LOG_ROUNDS', 12)),
+        'BCRYPT_WORKERS': int(os.getenv('BCRYPT_WORKERS', 1)), # per serving process, `0` hashes inline
+        'BCRYPT_MAX_PENDING': int(os.getenv('BCRYPT_MAX_PENDING', 32)),
+        'PUBLIC_CACHE_MAX_BYTES': int(os.getenv('PUBLIC_CACHE_MAX_BYTES', 64*1024*1024)), # `0` disables the cache
+        'PUBLIC_CACHE_MAX_ENTRIES': int(os.getenv('PUBLIC_CACHE_MAX_ENTRIES', 10_000)),
+        'PUBLIC_CACHE_TTL': float(os.getenv('PUBLIC_CACHE_TTL', 10)),
+        'PUBLIC_CACHE_CHECK_INTERVAL': float(os.getenv('PUBLIC_CACHE_CHECK_INTERVAL', 1)), # seconds, catches other processes' changes
+        'PUBLIC_CACHE_MAX_STALE': float(os.getenv('PUBLIC_CACHE_MAX_STALE', 60)), # seconds stale entries are served while the database is down
+        'STATS_USERS': [ u.strip().lower() for u in os.getenv('STATS_USERS', '').split(',') if u.strip() ], # allowed to read `/stats`
+        'COMPRESS': True,
+        'COMPRESS_MIN_SIZE': int(os.getenv('COMPRESS_MIN_SIZE', 1024)), # bytes
+        'COMPRESS_LEVELS': { 'zstd': 3, 'br': 4, 'gzip': 5 }, # fast levels, most of the gain on repetitive json at a fraction of the cpu
+        'EVENTS_MAX_STREAMS': int(os.getenv('EVENTS_MAX_STREAMS', 16)), # per process, see `gunicorn.conf.py`
+        'EVENTS_CHANGE_STREAM': os.getenv('EVENTS_CHANGE_STREAM', 'true').lower() == 'true', # requires a replica set
+        'EVENTS_HEARTBEAT': float(os.getenv('EVENTS_HEARTBEAT', 15)), # seconds
+        'EVENTS_MAX_AGE': float(os.getenv('EVENTS_MAX_AGE', 300)), # seconds a stream stays open, clients reconnect after
+        'RATELIMIT': os.getenv('RATELIMIT', 'true').lower() == 'true',
+        'RATELIMIT_BACKEND': os.getenv('RATELIMIT_BACKEND', 'mongo'), # `mongo`, shared across processes, or `memory`
+        'RATELIMIT_LIMITS': { # limit class -> (burst capacity, seconds to refill it)
+            'login':  (int(os.getenv('RATELIMIT_LOGIN', 10)), 60),
+            'write':  (int(os.getenv('RATELIMIT_WRITE', 60)), 60),
+            'export': (int(os.getenv('RATELIMIT_EXPORT', 10)), 60),
+            'read':   (int(os.getenv('RATELIMIT_READ', 300)), 60),
+        },
+        'PROXY_COUNT': int(os.getenv('PROXY_COUNT', 1)), # reverse proxies in front of the app setting `X-Forwarded-For`, e.g. Heroku's router
+        'SSLIFY': True,
+    }
 
-## start `main.py` !important
-from . import main
+
+def create_app(config:dict={}) -> Flask:
+    '''
+    Creates the flask app.
+    Does not connect to the database, see `startup()`.
+
+    :param config: Overrides for `default_config()`
+    :return: A new `Flask` instance
+    '''
+    ## init flask app ##
+    app = Flask(__name__)
+
+    ## config stuff ##
+    app.url_map.strict_slashes = False
+    app.config.update(default_config())
+    app.config.update(config)
+
+    ## addons ##
+    mongo.init(
+        app.config['MONGO_URI'],
+        client = app.config['MONGO_CLIENT'],
+        dbname = app.config['MONGO_DBNAME'],
+        secondary_reads = app.config['MONGO_SECONDARY_READS'],
+        max_staleness = app.config['MONGO_MAX_STALENESS'],
+        read_your_writes = app.config['READ_YOUR_WRITES_WINDOW'],
+        **app.config['MONGO_OPTIONS']
+    )
+    hasher.init(
+        rounds = app.config['BCRYPT_LOG_ROUNDS'],
+        workers = app.config['BCRYPT_WORKERS'],
+        max_pending = app.config['BCRYPT_MAX_PENDING']
+    )
+    response_cache.init(
+        max_bytes = app.config['PUBLIC_CACHE_MAX_BYTES'],
+        max_entries = app.config['PUBLIC_CACHE_MAX_ENTRIES'],
+        ttl = app.config['PUBLIC_CACHE_TTL'],
+        check_interval = app.config['PUBLIC_CACHE_CHECK_INTERVAL'],
+        max_stale = app.config['PUBLIC_CACHE_MAX_STALE']
+    )
+    events.init(
+        max_streams = app.config['EVENTS_MAX_STREAMS'],
+        change_stream = app.config['EVENTS_CHANGE_STREAM']
+    )
+    if app.config['PROXY_COUNT']:
+        # only trust the forwarded addresses our own proxies added, clients can send any
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'])
+    if app.config['SSLIFY']:
+        SSLify(app)
+    mongo.init_app(app)
+    jwt.init_app(app)
+    cors.init_app(app)
+    compress.init_app(app)
+    limiter.init_app(app)
+    api = Api(app)
+
+    ## routes and commands ##
+    from .main import init_routes
+    from .commands import init_commands
+    init_routes(app, api)
+    init_commands(app)
+
+    return app
+
+
+def ensure_indexes():
+    '''
+    Creates the mongodb indexes, does nothing for already existing ones.
+    '''
+    journal_db.create_index([ ('user_id', 1), ('seq', 1) ], unique=True)
+    journal_db.create_index('date_created', expireAfterSeconds=int(os.getenv('JOURNAL_TTL', 60*60*24*30)))
+    owned_db.create_index([ ('user_id', 1), ('scryfall_id', 1) ], unique=True)
+    tags_db.create_index([ ('user_id', 1), ('tag', 1) ], unique=True)
+    cards_db.create_index([ ('user_id', 1), ('tag_normalized', 1) ])
+    cards_db.create_index([ ('user_id', 1), ('scryfall_id', 1) ])
+    cards_db.create_index([ ('scryfall_id', 1), ('user_id', 1) ], name='public_owners', partialFilterExpression={ 'public': True })
+    jobs_db.create_index([ ('status', 1), ('date_created', 1) ])
+    jobs_db.create_index('date_finished', expireAfterSeconds=int(os.getenv('JOB_TTL', 60*60*24*7)))
+    job_chunks_db.create_index([ ('job_id', 1), ('seq', 1) ], unique=True)
+    job_chunks_db.create_index('date_created', expireAfterSeconds=int(os.getenv('JOB_TTL', 60*60*24*7)))
+    idempotency_db.create_index('date_created', expireAfterSeconds=int(os.getenv('IDEMPOTENCY_TTL', 60*60*24)))
+    ratelimits_db.create_index('expires', expireAfterSeconds=0)
+    snapshots_db.create_index([ ('user_id', 1), ('date_created', -1) ])
+    snapshots_db.create_index('date_created', expireAfterSeconds=int(os.getenv('SNAPSHOT_TTL', 60*60*24*30)))
+    snapshot_chunks_db.create_index([ ('snapshot_id', 1), ('seq', 1) ], unique=True)
+    # chunks outlive their snapshot, so an expiring snapshot is never listed without its chunks
+    snapshot_chunks_db.create_index('date_created', expireAfterSeconds=int(os.getenv('SNAPSHOT_TTL', 60*60*24*30)) + 60*60*24)
+
+
+def warm_up():
+    '''
+    Opens the database connection pool and loads the card catalog ahead of the first request.
+    '''
+    mongo.db.command('ping')
+    if os.getenv('SCRYFALL_CATALOG'):
+        from .catalog import catalog
+        catalog.ensure_loaded()
+
+
+def startup(app:Flask):
+    '''
+    Explicit startup phase, run once per deployment before serving requests.
+    Creates indexes and warms up connections and caches.
+    '''
+    with app.app_context():
+        ensure_indexes()
+        warm_up()
@@ -0,0 +1,197 @@
+import gzip, json, os, re, threading
+from itertools import islice
+from typing import Dict, Iterator, List, Set, Tuple
+
+
+class CardCatalog():
+    '''
+    Local index of Scryfall's card data, the server knows nothing about cards besides their `scryfall_id` otherwise.
+
+    Built from a Scryfall bulk data file (`default_cards`) into a compact catalog file using `flask build-catalog`,
+    and loaded once per process from `SCRYFALL_CATALOG`, see `app.startup()`.
+    '''
+    SEARCH_MAX_IDS = int(os.getenv('SEARCH_MAX_IDS', 2000)) # printings a collection search filters by
+    def __init__(self, path:str=None):
+        self.path = path
+        self.loaded = False
+        self.cards:Dict[str, Tuple[str, str, str]] = {} # scryfall_id -> (name, set, collector_number)
+        self.names:Dict[str, List[str]] = {}            # normalized name -> scryfall_ids of all printings
+        self.sets:Dict[str, str] = {}                   # set code -> set name
+        self.set_cards:Dict[str, List[str]] = {}        # set code -> scryfall_ids, by collector number
+        self.trie:dict = {}                             # prefix trie over normalized names, see `search()`
+        self.trigrams:Dict[str, Set[str]] = {}          # trigram -> normalized names
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(name:str) -> str:
+        return ' '.join(name.lower().split())
+
+    @staticmethod
+    def to_trigrams(name:str) -> Set[str]:
+        padded = f'  {name} '
+        return { padded[i:i+3] for i in range(len(padded) - 2) }
+
+    @staticmethod
+    def collector_number_key(collector_number:str):
+        '''
+        Sort key for collector numbers, e.g. `'9' < '10' < '10a' < '★1'`.
+        '''
+        match = re.match(r'^(\D*)(\d*)(.*)$', collector_number)
+        prefix, number, suffix = match.groups()
+        return (prefix, int(number) if number else -1, suffix)
+
+    @classmethod
+    def build(cls, bulk_path:str, out_path:str) -> int:
+        '''
+        Builds a compact catalog file from a Scryfall bulk data file.
+        Digital only printings are skipped.
+
+        :param bulk_path: Path to a Scryfall `default_cards` bulk data file
+        :param out_path: Path of the gzipped catalog file to write
+        :return: Number of cards written
+        '''
+        with open(bulk_path, encoding='utf-8') as f:
+            data = json.load(f)
+        cards = [ card for card in data if not card.get('digital') ]
+        with gzip.open(out_path, 'wt', encoding='utf-8') as f:
+            for card in cards:
+                f.write(json.dumps([
+                    card['id'], card['name'], card['set'], card.get('collector_number', ''), card.get('set_name', '')
+                ]) + '\n')
+        return len(cards)
+
+    def load(self, path:str=None):
+        '''
+        Loads the catalog file, replacing any loaded data.
+
+        :param path: Path to a catalog file, defaults to the `SCRYFALL_CATALOG` environment variable
+        :raises RuntimeError: If no catalog file is configured
+        :return: An updated `CardCatalog` object
+        '''
+        path = path or self.path or os.getenv('SCRYFALL_CATALOG')
+        if not path:
+            raise RuntimeError('card catalog is not configured, set the `SCRYFALL_CATALOG` environment variable')
+
+        cards, names, sets, set_cards = {}, {}, {}, {}
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                scryfall_id, name, set_code, collector_number, *rest = json.loads(line)
+                cards[scryfall_id] = (name, set_code, collector_number)
+                for key in { name, *name.split(' // ') }: # double faced cards are also known by their front face
+                    names.setdefault(self.normalize(key), []).append(scryfall_id)
+                sets.setdefault(set_code, rest[0] if rest else set_code.upper())
+                set_cards.setdefault(set_code, []).append(scryfall_id)
+
+        for ids in set_cards.values():
+            ids.sort(key=lambda i: self.collector_number_key(cards[i][2]))
+        trie, trigrams = {}, {}
+        for name in names:
+            node = trie
+            for char in name:
+                node = node.setdefault(char, {})
+            node[''] = name # end of name marker
+            for trigram in self.to_trigrams(name):
+                trigrams.setdefault(trigram, set()).add(name)
+
+        self.cards, self.names, self.sets, self.set_cards = cards, names, sets, set_cards
+        self.trie, self.trigrams = trie, trigrams
+        self.path, self.loaded = path, True
+        return self
+
+    def ensure_loaded(self):
+        '''
+        Loads the catalog on first use.
+
+        :raises RuntimeError: If no catalog file is configured
+        :return: The `CardCatalog` object
+        '''
+        if not self.loaded:
+            with self._lock:
+                if not self.loaded:
+                    self.load()
+        return self
+
+    def ids_for_name(self, name:str) -> List[str]:
+        '''
+        Retrieves the ids of all printings of a card by its exact name, case insensitive.
+
+        :return: A list of `scryfall_id`s, empty if the name is unknown
+        '''
+        return self.ensure_loaded().names.get(self.normalize(name), [])
+
+
+    def search(self, query:str, limit:int=20, min_similarity:float=0.4) -> List[str]:
+        '''
+        Searches card names, case insensitive.
+        Names starting with `query` are matched first, shortest first.
+        If there are none, names are matched by trigram similarity, allowing typos.
+
+        :param query: A full or partial card name
+        :param limit: Max number of names to return
+        :param min_similarity: Min jaccard similarity of the trigram sets, between 0 and 1, for fuzzy matches
+        :return: A list of normalized card names, best match first
+        '''
+        return list(islice(self._matches(query, min_similarity), limit))
+
+    def _matches(self, query:str, min_similarity:float=0.4) -> Iterator[str]:
+        '''
+        Generates the names matching a search, best match first, see `search()`.
+        Prefix matches are walked lazily, so only as much of the trie as consumed is visited.
+        '''
+        self.ensure_loaded()
+        query = self.normalize(query)
+        if not query:
+            return
+
+        ## prefix search ##
+        node = self.trie
+        for char in query:
+            node = node.get(char)
+            if node is None:
+                break
+        if node is not None:
+            level = [ node ]
+            while level: # breadth first, so shorter names come first
+                next_level = []
+                for n in level:
+                    for char, child in sorted(n.items()):
+                        if char == '':
+                            yield child
+                        else:
+                            next_level.append(child)
+                level = next_level
+            return
+
+        ## fuzzy search ##
+        query_trigrams = self.to_trigrams(query)
+        hits = {}
+        for trigram in query_trigrams:
+            for name in self.trigrams.get(trigram, ()):
+                hits[name] = hits.get(name, 0) + 1
+        scored = []
+        for name, common in hits.items():
+            similarity = common / (len(query_trigrams) + len(name) + 1 - common) # a name has len(name)+1 trigrams
+            if similarity >= min_similarity:
+                scored.append((-similarity, name))
+        yield from ( name for _, name in sorted(scored) )
+
+    def ids_for_search(self, query:str, max_ids:int=None) -> List[str]:
+        '''
+        Retrieves the ids of all printings of the cards matching a search, see `search()`,
+        e.g. for a single indexed `$in` filter on a collection.
+        Matching names are taken best first until `max_ids` printings are collected, not only the top suggestions.
+
+        :param query: A full or partial card name
+        :param max_ids: Max number of ids, defaults to `SEARCH_MAX_IDS`
+        :return: A list of `scryfall_id`s, empty if nothing matches
+        '''
+        max_ids = self.SEARCH_MAX_IDS if max_ids is None else max_ids
+        res = {} # ordered, a double faced card's printings are listed under each of its names
+        for name in self._matches(query):
+            res.update(dict.fromkeys(self.names[name]))
+            if len(res) >= max_ids:
+                break
+        return list(res)[:max_ids]
+
+
+catalog = CardCatalog()
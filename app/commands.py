@@ -0,0 +1,222 @@
+'''
+Maintenance commands, run using `flask <command>`.
+'''
+import click, time
+from datetime import datetime, timedelta
+from flask import Flask
+from flask.cli import with_appcontext
+from pymongo import UpdateOne
+
+from . import mongo, users_db, cards_db, migrations_db
+from .models import UserModel, SnapshotModel, schema
+
+
+@click.command('reconcile-counters')
+@click.option('--username', default=None, help='Only reconcile a single user.')
+@with_appcontext
+def reconcile_counters(username):
+    '''
+    Recounts every user's collection counters and tag counts, and repairs any drift.
+    '''
+    query = { 'username': username } if username else {}
+    fixed = 0
+    for item in users_db.find(query, { '_id': 1 }):
+        user = UserModel(user_id=item['_id'])
+        drift = user.collection.reconcile()
+        if drift:
+            fixed += 1
+            click.echo(f'{user.username}: ' + ', '.join( f'{k} {old} -> {new}' for k,(old, new) in drift.items() ))
+    click.echo(f'{fixed} user(s) repaired')
+
+
+@click.command('run-jobs')
+@click.option('--workers', default=None, type=int, help='Number of worker processes, defaults to the number of CPUs.')
+@click.option('--poll-interval', default=1.0, type=float, help='Seconds to wait when the job queue is empty.')
+def run_jobs(workers, poll_interval):
+    '''
+    Runs a pool of background job workers.
+    '''
+    from .jobs import run_pool
+    run_pool(workers, poll_interval)
+
+
+@click.command('sync-public')
+@with_appcontext
+def sync_public():
+    '''
+    Copies every user's `public` flag onto their cards, used by the public owners index.
+    '''
+    modified = 0
+    for item in users_db.find({}, { '_id': 1 }):
+        modified += UserModel(user_id=item['_id']).sync_public()
+    click.echo(f'{modified} card(s) updated')
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db():
+    '''
+    Creates the database indexes.
+    '''
+    from . import ensure_indexes
+    ensure_indexes()
+    click.echo('indexes created')
+
+
+@click.command('build-catalog')
+@click.argument('bulk_path', type=click.Path(exists=True, dir_okay=False))
+@click.argument('out_path', type=click.Path(dir_okay=False))
+def build_catalog(bulk_path, out_path):
+    '''
+    Builds the card catalog from a Scryfall `default_cards` bulk data file.
+    '''
+    from .catalog import CardCatalog
+    count = CardCatalog.build(bulk_path, out_path)
+    click.echo(f'{count} card(s) written to {out_path}')
+
+
+def _storage_stats(name:str) -> dict:
+    stats = mongo.db.command('collStats', name)
+    return { k: stats.get(k, 0) for k in ('count', 'avgObjSize', 'size', 'storageSize', 'totalIndexSize') }
+
+
+@click.command('migrate-cards')
+@click.option('--batch-size', default=1000, type=int, help='Number of cards converted per write.')
+@click.option('--restart', is_flag=True, help='Start over instead of resuming from the last checkpoint.')
+@with_appcontext
+def migrate_cards(batch_size, restart):
+    '''
+    Converts card documents to the current storage schema, see `app.models.schema`.
+    Runs while the app is serving, and resumes from its last checkpoint if interrupted.
+    '''
+    before = _storage_stats(cards_db.name)
+    checkpoint = {} if restart else (migrations_db.find_one({ '_id': 'cards_v2' }) or {})
+    last_id, migrated = checkpoint.get('last_id'), checkpoint.get('migrated', 0)
+    projection = { 'v': 1, 'scryfall_id': 1, 'condition': 1, 'tag': 1, **{ k:1 for k in schema.FLAGS } }
+
+    while True:
+        query = { '_id': { '$gt': last_id } } if last_id else {}
+        data = list(cards_db.find(query, projection).sort('_id', 1).limit(batch_size))
+        if not data:
+            break
+        updates = [
+            UpdateOne(
+                { '_id': item['_id'], 'v': { '$ne': schema.SCHEMA_VERSION } }, # skip cards the app rewrote meanwhile
+                {
+                    '$set': {
+                        **schema.encode(item),
+                        'tag_normalized': sorted({ t.lower() for t in item.get('tag') or [] }),
+                    },
+                    '$unset': { k:'' for k in schema.FLAGS },
+                }
+            ) for item in data if item.get('v') != schema.SCHEMA_VERSION
+        ]
+        if updates:
+            migrated += cards_db.bulk_write(updates, ordered=False).modified_count
+        last_id = data[-1]['_id']
+        migrations_db.update_one(
+            { '_id': 'cards_v2' },
+            { '$set': { 'last_id': last_id, 'migrated': migrated, 'date_updated': datetime.now() } },
+            upsert = True
+        )
+        click.echo(f'{migrated} card(s) migrated, up to {last_id}')
+
+    after = _storage_stats(cards_db.name)
+    for k in before:
+        click.echo(f'{k:>14}: {before[k]:>14,} -> {after[k]:>14,}')
+    click.echo('storageSize only shrinks once the collection is compacted')
+
+
+@click.command('merge-duplicates')
+@click.option('--username', default=None, help='Only merge a single user\'s duplicates.')
+@click.option('--dry-run', is_flag=True, help='Report duplicates without merging them.')
+@click.option('--batch-size', default=500, type=int, help='Max number of cards written per transaction.')
+@click.option('--pause', default=0.0, type=float, help='Seconds to sleep between transactions, throttles the load on the database.')
+@click.option('--restart', is_flag=True, help='Start over instead of resuming from the last checkpoint.')
+@with_appcontext
+def merge_duplicates(username, dry_run, batch_size, pause, restart):
+    '''
+    Merges duplicate cards, ones that only differ by amount, into the earliest one, summing their amounts.
+    Runs while the app is serving, one user at a time, and resumes from the last checkpoint if interrupted.
+    Merging uses transactions, which require a replica set.
+    '''
+    checkpointed = not (dry_run or username)
+    checkpoint = (migrations_db.find_one({ '_id': 'merge_duplicates' }) or {}) if checkpointed and not restart else {}
+    last_id, removed = checkpoint.get('last_id'), checkpoint.get('removed', 0)
+    query = { 'username': username } if username else { '_id': { '$gt': last_id } } if last_id else {}
+    user_ids = [ item['_id'] for item in users_db.find(query, { '_id': 1 }).sort('_id', 1) ]
+    found = 0
+
+    for user_id in user_ids:
+        user = UserModel(user_id=user_id)
+        groups = user.collection.duplicates()
+        extras = sum( len(group) - 1 for group in groups )
+        found += extras
+        if groups:
+            click.echo(f'{user.username}: {len(groups)} duplicated card(s), {extras} extra document(s)')
+
+        if not dry_run:
+            batch = []
+            for i, group in enumerate(groups):
+                batch.append(group)
+                if i + 1 < len(groups) and sum( len(g) for g in batch ) + len(groups[i + 1]) <= batch_size:
+                    continue
+                try:
+                    removed += user.collection.merge_duplicates(batch)
+                except RuntimeError as e:
+                    click.echo(f'{user.username}: {e}, skipped until the next run')
+                    break
+                batch = []
+                if pause:
+                    time.sleep(pause)
+        if checkpointed:
+            migrations_db.update_one(
+                { '_id': 'merge_duplicates' },
+                { '$set': { 'last_id': user_id, 'removed': removed, 'date_updated': datetime.now() } },
+                upsert = True
+            )
+
+    if checkpointed:
+        migrations_db.delete_one({ '_id': 'merge_duplicates' }) # done, the next run starts over
+    if dry_run:
+        click.echo(f'{found} extra document(s) found in {len(user_ids)} user(s), nothing was merged')
+    else:
+        click.echo(f'{removed} document(s) merged in total')
+
+
+@click.command('snapshot-collections')
+@click.option('--username', default=None, help='Only snapshot a single user\'s collection.')
+@click.option('--max-age-hours', default=24.0, type=float, help='Skip collections with a snapshot younger than this.')
+@click.option('--pause', default=0.0, type=float, help='Seconds to sleep between snapshots, throttles the load on the database.')
+@with_appcontext
+def snapshot_collections(username, max_age_hours, pause):
+    '''
+    Takes a snapshot of every collection that changed since its latest snapshot, meant to run periodically, e.g. from cron.
+    Snapshots younger than `--max-age-hours` are kept as is, their journal replays cover the changes made since.
+    '''
+    query = { 'username': username } if username else { 'collection_version': { '$gt': 0 } }
+    cutoff = datetime.now() - timedelta(hours=max_age_hours)
+    taken = 0
+
+    for item in users_db.find(query, { '_id': 1, 'collection_version': 1 }).sort('_id', 1):
+        latest = SnapshotModel.latest(item['_id'])
+        if latest and (latest.version == item.get('collection_version', 0) or latest.date_created > cutoff):
+            continue
+        snapshot = SnapshotModel.create(UserModel(user_id=item['_id']), reason='scheduled')
+        click.echo(f'{item["_id"]}: {snapshot.doc_count} card(s) at version {snapshot.version}, {snapshot.size} bytes')
+        taken += 1
+        if pause:
+            time.sleep(pause)
+
+    click.echo(f'{taken} snapshot(s) taken')
+
+
+def init_commands(app:Flask):
+    app.cli.add_command(reconcile_counters)
+    app.cli.add_command(run_jobs)
+    app.cli.add_command(sync_public)
+    app.cli.add_command(init_db)
+    app.cli.add_command(build_catalog)
+    app.cli.add_command(migrate_cards)
+    app.cli.add_command(merge_duplicates)
+    app.cli.add_command(snapshot_collections)
@@ -0,0 +1,125 @@
+import zlib
+from flask import Flask, request, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+class Compress():
+    '''
+    Compresses responses using the best encoding accepted by the client, negotiated using `Accept-Encoding`.
+
+    Supports `zstd` and `br` when `zstandard` and `brotli` are installed, and `gzip`.
+    Streamed responses are compressed chunk by chunk. Compressed responses get a weak ETag,
+    same as the uncompressed ones they are derived from, see `etag_cached()`.
+    '''
+    MIMETYPES = { 'application/json', 'text/plain', 'text/html', 'text/csv' }
+
+    def __init__(self, app:Flask=None):
+        self.enabled = False
+        self.min_size = 1024
+        self.levels = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app:Flask):
+        self.enabled = app.config['COMPRESS']
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.levels = app.config['COMPRESS_LEVELS']
+        if self.enabled:
+            app.after_request(self.after_request)
+
+    @property
+    def encodings(self):
+        '''
+        Available encodings, most preferred first.
+        '''
+        return [
+            encoding for encoding, available in (('zstd', zstandard), ('br', brotli), ('gzip', True))
+            if available and encoding in self.levels
+        ]
+
+    def negotiate(self, size:int=None) -> str:
+        '''
+        Picks an encoding for the current request.
+
+        :param size: Size of the body, if known. Bodies smaller than `min_size` aren't compressed
+        :return: An encoding, or `None` to send the body as is
+        '''
+        if not self.enabled or (size is not None and size < self.min_size):
+            return None
+        return request.accept_encodings.best_match(self.encodings)
+
+    def compress(self, data:bytes, encoding:str) -> bytes:
+        level = self.levels[encoding]
+        if encoding == 'gzip':
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # 31: gzip container
+            return compressor.compress(data) + compressor.flush()
+        if encoding == 'br':
+            return brotli.compress(data, quality=level)
+        if encoding == 'zstd':
+            return zstandard.ZstdCompressor(level=level).compress(data)
+        raise ValueError(f'unsupported encoding `{encoding}`')
+
+    def compress_stream(self, chunks, encoding:str):
+        '''
+        Compresses an iterable of chunks, flushing after every chunk so clients can start parsing early.
+        '''
+        level = self.levels[encoding]
+        if encoding == 'gzip':
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+            feed, flush, finish = compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+        elif encoding == 'br':
+            compressor = brotli.Compressor(quality=level)
+            feed, flush, finish = compressor.process, compressor.flush, compressor.finish
+        elif encoding == 'zstd':
+            compressor = zstandard.ZstdCompressor(level=level).compressobj()
+            feed, flush, finish = compressor.compress, lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), compressor.flush
+        else:
+            raise ValueError(f'unsupported encoding `{encoding}`')
+
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = feed(chunk) + flush()
+            if data:
+                yield data
+        yield finish()
+
+    def set_headers(self, response:Response, encoding:str):
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+
+    def after_request(self, response:Response):
+        response.vary.add('Accept-Encoding')
+        if (
+            response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+            or 'Content-Encoding' in response.headers
+            or response.direct_passthrough
+            or response.mimetype not in self.MIMETYPES
+        ):
+            return response
+
+        if response.is_streamed:
+            encoding = self.negotiate()
+            if encoding:
+                response.response = self.compress_stream(response.response, encoding)
+                response.headers.pop('Content-Length', None)
+                self.set_headers(response, encoding)
+            return response
+
+        data = response.get_data()
+        encoding = self.negotiate(len(data))
+        if encoding:
+            response.set_data(self.compress(data, encoding))
+            self.set_headers(response, encoding)
+        return response
@@ -0,0 +1,311 @@
+import math, os, threading, time
+from datetime import timedelta
+from functools import wraps
+from flask import Flask, g, has_request_context, jsonify, make_response
+from pymongo import MongoClient
+from pymongo.errors import AutoReconnect, ExecutionTimeout
+from pymongo.read_preferences import ReadPreference, SecondaryPreferred
+
+from .utils import DatabaseUnavailable
+
+
+## failures counted by the circuit breaker, `AutoReconnect` covers network and server selection timeouts ##
+FAILURES = (ExecutionTimeout, AutoReconnect)
+
+## read methods bounded by the request deadline, and the name of their server side time limit argument ##
+TIMED_METHODS = {
+    'find':            'max_time_ms',
+    'find_one':        'max_time_ms',
+    'aggregate':       'maxTimeMS',
+    'count_documents': 'maxTimeMS',
+    'distinct':        'maxTimeMS',
+}
+## once a request writes, it is let to finish without a deadline so it isn't left half written, unless the write sets its own `maxTimeMS` ##
+WRITE_METHODS = {
+    'insert_one', 'insert_many', 'update_one', 'update_many', 'replace_one', 'delete_one', 'delete_many',
+    'bulk_write', 'find_one_and_update', 'find_one_and_replace', 'find_one_and_delete',
+}
+
+
+class CircuitBreaker():
+    '''
+    Fails fast while the database is unhealthy, instead of letting requests pile up waiting for it.
+
+    Opens after `threshold` consecutive failed requests, e.g. timeouts, and rejects database calls for `cooldown` seconds.
+    Then lets a single request through, the probe, closing if it succeeds and opening again otherwise.
+    A probe that isn't settled within `cooldown` seconds is replaced by the next request.
+    State is per process.
+    '''
+    def __init__(self, threshold:int=5, cooldown:float=10):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self._probing = None # when the current probe started
+        self._lock = threading.Lock()
+
+    def _probe_pending(self, now:float) -> bool:
+        return self._probing is not None and now - self._probing < self.cooldown
+
+    @property
+    def is_open(self) -> bool:
+        now = time.monotonic()
+        opened_at = self.opened_at
+        return opened_at is not None and (self._probe_pending(now) or now - opened_at < self.cooldown)
+
+    def retry_after(self) -> int:
+        '''
+        :return: Seconds until the breaker lets a request through, at least `1`
+        '''
+        opened_at = self.opened_at
+        if opened_at is None:
+            return 1
+        return max(1, math.ceil(opened_at + self.cooldown - time.monotonic()))
+
+    def allow(self) -> bool:
+        '''
+        :raises DatabaseUnavailable: If the breaker is open
+        :return: `True` if the caller is the probe, and should settle it with `success()` or `failure()`
+        '''
+        with self._lock:
+            if self.opened_at is None:
+                return False
+            now = time.monotonic()
+            if self._probe_pending(now) or now - self.opened_at < self.cooldown:
+                raise DatabaseUnavailable(retry_after=self.retry_after())
+            self._probing = now # half open
+            return True
+
+    def success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = None
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._probing is not None or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                self._probing = None
+
+
+class Mongo():
+    '''
+    Holds the process' `MongoClient`.
+
+    The client is created lazily on first use, so importing the app does not open any connection.
+    When preloading the app in a forking server, call `close()` before forking and let each worker
+    create its own client, see `gunicorn.conf.py`.
+    '''
+    def __init__(self, uri:str=None, **options):
+        self.client = None
+        self.uri = uri
+        self.dbname = None
+        self.options = options
+        self.read_preference = ReadPreference.PRIMARY
+        self.read_your_writes = timedelta(0)
+        self.request_timeout = 0
+        self.breaker = CircuitBreaker()
+        self._injected = False
+        self._lock = threading.Lock()
+
+    def init(self, uri:str=None, client=None, dbname:str=None, secondary_reads=False, max_staleness:int=90, read_your_writes:int=0, **options):
+        '''
+        Sets the connection options, closing the current client if any.
+
+        :param uri: A mongodb connection string, including the database name unless `dbname` is given
+        :param client: An already created client to use instead of connecting to `uri`, e.g. a local stand-in
+        :param dbname: The database name, defaults to the one in `uri`
+        :param secondary_reads: If `True`, collections accessed with `secondary=True` read from secondaries when available
+        :param max_staleness: Max replication lag in seconds of a secondary to read from, at least 90
+        :param read_your_writes: Seconds after a user's write during which their reads go to the primary, see `CollectionModel.reads`
+        :param options: Any `MongoClient` keyword arguments
+        :raises ValueError: If secondaries may lag longer than `read_your_writes`
+        '''
+        if secondary_reads:
+            # a secondary's lag is only measured every heartbeat, so it may be that much past `max_staleness`
+            max_lag = max_staleness + options.get('heartbeatFrequencyMS', 10_000) / 1000
+            if read_your_writes <= max_lag:
+                raise ValueError(
+                    f'the read your writes window ({read_your_writes}s) must be longer than the max staleness '
+                    f'plus the heartbeat interval ({max_lag:g}s), users could read older data than their own writes'
+                )
+        self.close()
+        self.uri = uri
+        self.dbname = dbname
+        self.options = options
+        self.read_preference = SecondaryPreferred(max_staleness=max_staleness) if secondary_reads else ReadPreference.PRIMARY
+        self.read_your_writes = timedelta(seconds=read_your_writes)
+        self.client = client
+        self._injected = client is not None
+
+    def connect(self):
+        '''
+        Creates this process' client.
+
+        :return: The `MongoClient` instance
+        '''
+        if self.client is None:
+            with self._lock:
+                if self.client is None:
+                    if not self.uri:
+                        raise RuntimeError('mongodb uri is not set, set the `MONGO_RW_URI` environment variable')
+                    self.client = MongoClient(
+                        self.uri,
+                        **{
+                            'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', 100)),
+                            'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', 0)),
+                            'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', 5000)),
+                            'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', 5000)),
+                            'socketTimeoutMS': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', 30000)),
+                            **self.options,
+                        }
+                    )
+        return self.client
+
+    def close(self):
+        '''
+        Closes this process' client, a new one will be created on next use.
+        '''
+        if self.client is not None and not self._injected:
+            self.client.close()
+            self.client = None
+
+    def reset(self):
+        '''
+        Drops a client inherited from a parent process without using it.
+        Should be called right after forking.
+        '''
+        if not self._injected:
+            self.client = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app:Flask):
+        '''
+        Bounds the database calls made while serving requests.
+        Each request gets a `REQUEST_TIMEOUT` seconds budget, passed down to its reads as `maxTimeMS`,
+        and calls fail fast with `503 Service Unavailable` while the circuit breaker is open.
+        '''
+        self.request_timeout = app.config['REQUEST_TIMEOUT']
+        self.breaker = CircuitBreaker(app.config['DB_BREAKER_THRESHOLD'], app.config['DB_BREAKER_COOLDOWN'])
+        app.before_request(self._start_request)
+        app.teardown_request(self._end_request)
+        app.register_error_handler(DatabaseUnavailable, self._unavailable)
+        for error in FAILURES:
+            app.register_error_handler(error, self._unavailable)
+
+    def _start_request(self):
+        # `g` outlives the request when an app context was already pushed, e.g. by tests or the cli
+        g.db_used, g.db_error, g.db_probe = False, None, False
+        self.renew_deadline()
+
+    def renew_deadline(self):
+        '''
+        Starts a new budget for the current request, e.g. for every poll of a long lived stream.
+        '''
+        g.db_deadline = time.monotonic() + self.request_timeout if self.request_timeout else None
+
+    def _end_request(self, exc=None):
+        if not g.get('db_used'):
+            return
+        error = g.get('db_error') or exc
+        if isinstance(error, DatabaseUnavailable) and not g.get('db_probe'):
+            return
+        if isinstance(error, FAILURES):
+            self.breaker.failure()
+        else:
+            self.breaker.success()
+
+    def _unavailable(self, e):
+        if isinstance(e, FAILURES):
+            g.db_error = e
+        return make_response(
+            jsonify({ 'message': 'database unavailable, try again shortly' }),
+            503,
+            { 'Retry-After': str(self.breaker.retry_after()) }
+        )
+
+    def remaining_ms(self) -> int:
+        '''
+        :return: Milliseconds left of the current request's budget, or `None` if unbounded
+        '''
+        deadline = g.get('db_deadline') if has_request_context() else None
+        if deadline is None:
+            return None
+        return int((deadline - time.monotonic()) * 1000)
+
+    def guard(self, method, name:str):
+        '''
+        Wraps a collection method called while serving a request, see `init_app()`.
+
+        :param method: A bound `Collection` method
+        :param name: The method's name
+        :raises DatabaseUnavailable: If the circuit breaker is open
+        :raises ExecutionTimeout: If the request's budget is already spent
+        '''
+        @wraps(method)
+        def inner(*args, **kwargs):
+            g.db_used = True
+            try:
+                if not g.get('db_probe'): # every call of the probing request is let through
+                    g.db_probe = self.breaker.allow()
+                if name in WRITE_METHODS:
+                    if 'maxTimeMS' not in kwargs:
+                        g.db_deadline = None
+                elif name in TIMED_METHODS and TIMED_METHODS[name] not in kwargs:
+                    remaining = self.remaining_ms()
+                    if remaining is not None:
+                        if remaining <= 0:
+                            raise ExecutionTimeout('request deadline exceeded')
+                        kwargs[TIMED_METHODS[name]] = remaining
+                return method(*args, **kwargs)
+            except (DatabaseUnavailable, *FAILURES) as e:
+                g.db_error = e # counted even if the caller handles it
+                raise
+        return inner
+
+    @property
+    def db(self):
+        client = self.connect()
+        return client.get_database(self.dbname) if self.dbname else client.get_default_database()
+
+    def collection(self, name:str, secondary=False, guarded=True) -> 'LazyCollection':
+        '''
+        Accessor for a collection of the database, resolved on every use.
+
+        :param name: The collection's name
+        :param secondary: If `True`, reads use the configured secondary read preference, for read only code paths
+        :param guarded: If `False`, calls skip `guard()` and don't count towards the circuit breaker, for callers handling failures themselves
+        :return: A `LazyCollection` proxy
+        '''
+        return LazyCollection(self, name, secondary, guarded)
+
+
+class LazyCollection():
+    '''
+    A proxy for a mongodb collection, resolved from `mongo.db` on every access.
+    Allows binding collections as module globals while the client is replaced after forking.
+    '''
+    def __init__(self, mongo:Mongo, name:str, secondary=False, guarded=True):
+        self._mongo = mongo
+        self._name = name
+        self._secondary = secondary
+        self._guarded = guarded
+
+    def _resolve(self):
+        if self._secondary:
+            return self._mongo.db.get_collection(self._name, read_preference=self._mongo.read_preference)
+        return self._mongo.db[self._name]
+
+    def __getattr__(self, attr):
+        value = getattr(self._resolve(), attr)
+        if self._guarded and (attr in TIMED_METHODS or attr in WRITE_METHODS) and has_request_context():
+            return self._mongo.guard(value, attr)
+        return value
+
+    def __getitem__(self, key):
+        return self._resolve()[key]
+
+    def __repr__(self):
+        return f'LazyCollection({self._name!r}, secondary={self._secondary})'
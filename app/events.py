@@ -0,0 +1,83 @@
+import logging, threading
+from typing import Dict, Set
+
+
+logger = logging.getLogger(__name__)
+
+
+class ChangeBroker():
+    '''
+    In-process pub/sub of collection changes, used by the `/collections/events` stream.
+
+    Writes made by this process are published by `CollectionModel.commit()`.
+    Writes made by other processes are published by a change stream on the journal, when `change_stream` is enabled,
+    which requires a replica set. Otherwise subscribers notice them on their next heartbeat.
+    Subscribers only get woken up, the changes themselves are read from the journal.
+    '''
+    def __init__(self):
+        self.max_streams = 0
+        self.change_stream = False
+        self._subscribers:Dict[str, Set[threading.Event]] = {}
+        self._watcher = None
+        self._lock = threading.Lock()
+
+    def init(self, max_streams:int=16, change_stream=False):
+        '''
+        :param max_streams: Max number of open streams per process, `0` disables streaming
+        :param change_stream: If `True`, watch the journal for writes made by other processes
+        '''
+        self.max_streams = max_streams
+        self.change_stream = change_stream
+
+    @property
+    def streams(self) -> int:
+        '''
+        Number of open streams in this process.
+        '''
+        return sum( len(events) for events in self._subscribers.values() )
+
+    def subscribe(self, user_id) -> threading.Event:
+        '''
+        :param user_id: The user whose changes to subscribe to
+        :return: An event set on every change, or `None` if `max_streams` are already open
+        '''
+        event = threading.Event()
+        with self._lock:
+            if self.streams >= self.max_streams:
+                return None
+            self._subscribers.setdefault(str(user_id), set()).add(event)
+            if self.change_stream and (self._watcher is None or not self._watcher.is_alive()):
+                # started on first use, so each forked worker has its own
+                self._watcher = threading.Thread(target=self._watch, name='journal-watcher', daemon=True)
+                self._watcher.start()
+        return event
+
+    def unsubscribe(self, user_id, event:threading.Event):
+        with self._lock:
+            events = self._subscribers.get(str(user_id))
+            if events is not None:
+                events.discard(event)
+                if not events:
+                    del self._subscribers[str(user_id)]
+
+    def publish(self, user_id):
+        '''
+        Wakes up the subscribers of a user's changes.
+        '''
+        with self._lock:
+            events = list(self._subscribers.get(str(user_id), ()))
+        for event in events:
+            event.set()
+
+    def _watch(self):
+        from . import journal_db
+        try:
+            with journal_db.watch([ { '$match': { 'operationType': 'insert' } } ]) as stream:
+                for change in stream:
+                    self.publish(change['fullDocument']['user_id'])
+                    if not self._subscribers:
+                        return # restarted by the next subscriber
+        except Exception as e:
+            # e.g. a standalone server, subscribers fall back to their heartbeat
+            self.change_stream = False
+            logger.warning(f'journal change stream stopped, falling back to heartbeats: {e}')
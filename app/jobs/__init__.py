@@ -0,0 +1,9 @@
+'''
+Background jobs for heavy collection operations.
+
+Jobs are queued using `JobModel.create()` and executed by a pool of worker processes,
+started using `flask run-jobs`.
+'''
+
+from .handlers import handlers
+from .worker import run_worker, run_pool
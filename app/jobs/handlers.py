@@ -0,0 +1,186 @@
+import json, os, time
+from urllib.request import Request, urlopen
+from bson import ObjectId
+
+from .. import cards_db, cards_read_db, job_chunks_db
+from ..models import UserModel, CardModel, JobModel, SnapshotModel, schema
+
+
+CHUNK_SIZE = int(os.getenv('JOB_CHUNK_SIZE', 500))
+SCRYFALL_COLLECTION_URL = 'https://api.scryfall.com/cards/collection'
+
+
+def clear(job:JobModel):
+    '''
+    Clears the user's collection, one chunk of cards at a time.
+    '''
+    user = UserModel(user_id=job.user_id)
+    if job.checkpoint is None:
+        SnapshotModel.create(user, reason='clear') # so the collection can be restored
+        # counted once, the counters are only reset when done
+        job.update_progress(0, user.doc_count(), checkpoint={ 'done': 0, 'total': user.doc_count() })
+    total = job.checkpoint['total']
+    done = max(job.checkpoint['done'], total - cards_db.count_documents({ 'user_id': user.user_id })) # a chunk deleted before its checkpoint
+    for ids in user.collection.clear_chunks(CHUNK_SIZE):
+        done += len(ids)
+        total = max(total, done) # cards added meanwhile
+        job.update_progress(done, total, checkpoint={ 'done': done, 'total': total })
+    user.collection.commit(cleared=True)
+    job.finish({ 'deleted': done })
+
+
+def import_cards(job:JobModel):
+    '''
+    Inserts or updates a list of cards in the user's collection, same as `POST /collections`.
+
+    Each chunk is first planned, resolving relative amounts such as `+2` against the collection, and the plan is checkpointed.
+    Then the plan is applied, see `CollectionModel.apply()`. A chunk interrupted mid-way is resumed by applying
+    its checkpointed plan again, which leaves already written cards as is, so no amount is added twice.
+    '''
+    total = job.params['inputs']
+    if job.checkpoint is None:
+        SnapshotModel.create(UserModel(user_id=job.user_id), reason='import') # so the collection can be restored
+        job.update_progress(0, total, checkpoint={ 'seq': 0, 'done': 0, 'actions': {}, 'plan': None })
+    checkpoint = job.checkpoint
+
+    for seq, cards in job.input_chunks(checkpoint['seq']):
+        user = UserModel(user_id=job.user_id)
+        if checkpoint['plan'] is None:
+            chunk = [ CardModel(parent=user.collection, **item) for item in cards ]
+            checkpoint['plan'] = user.collection.update(chunk).plan()
+            job.update_progress(checkpoint['done'], total, checkpoint=checkpoint)
+        for item in user.collection.apply(checkpoint['plan']):
+            checkpoint['actions'][item['action']] = checkpoint['actions'].get(item['action'], 0) + 1
+        checkpoint = { 'seq': seq + 1, 'done': checkpoint['done'] + len(cards), 'actions': checkpoint['actions'], 'plan': None }
+        job.update_progress(checkpoint['done'], total, checkpoint=checkpoint)
+    job.finish(checkpoint['actions'])
+
+
+def export_cards(job:JobModel):
+    '''
+    Exports the user's collection into result chunks, see `GET /jobs/<job_id>/result`.
+    '''
+    user = UserModel(user_id=job.user_id)
+    checkpoint = job.checkpoint or { 'last_id': None, 'seq': 0, 'done': 0 }
+    last_id, seq, done = checkpoint['last_id'], checkpoint['seq'], checkpoint['done']
+    total = user.doc_count()
+    job_chunks_db.delete_many({ 'job_id': job._id, 'seq': { '$gte': seq } }) # leftovers of an interrupted run
+
+    while True:
+        query = { 'user_id': user.user_id }
+        if last_id:
+            query['_id'] = { '$gt': last_id }
+        data = list(cards_db.find(query).sort('_id', 1).limit(CHUNK_SIZE))
+        if not data:
+            break
+        job_chunks_db.insert_one({
+            'job_id': job._id,
+            'seq': seq,
+            'cards': [ CardModel.from_mongo(user.collection, item).to_JSON(drop_cols=['user_id']) for item in data ],
+            'date_created': job.date_created,
+        })
+        last_id, seq, done = data[-1]['_id'], seq + 1, done + len(data)
+        job.update_progress(done, total, checkpoint={ 'last_id': last_id, 'seq': seq, 'done': done })
+    job.finish({ 'total_documents': done, 'chunks': seq })
+
+
+def reindex(job:JobModel):
+    '''
+    Rebuilds the user's collection counters, see `CollectionModel.reconcile()`.
+    '''
+    user = UserModel(user_id=job.user_id)
+    drift = user.collection.reconcile()
+    job.update_progress(1, 1)
+    job.finish({ 'repaired': { k: { 'old': old, 'new': new } for k,(old, new) in drift.items() } })
+
+
+def valuation(job:JobModel):
+    '''
+    Sums the value of the user's collection using Scryfall's prices.
+    '''
+    items = {}
+    for item in cards_read_db.aggregate([
+        { '$match': { 'user_id': ObjectId(job.user_id) } },
+        { '$group': { '_id': { 'v': '$v', 'scryfall_id': '$scryfall_id', 'foil': '$foil', 'flags': '$flags' }, 'amount': { '$sum': '$amount' } } },
+    ]):
+        card = schema.decode(item['_id'])
+        key = (card['scryfall_id'], bool(card.get('foil')))
+        items[key] = items.get(key, 0) + item['amount']
+    items = [ { '_id': { 'scryfall_id': k[0], 'foil': k[1] }, 'amount': v } for k,v in sorted(items.items()) ]
+    checkpoint = job.checkpoint or { 'index': 0, 'usd': 0.0, 'eur': 0.0, 'priced': 0, 'unpriced': 0 }
+    batch_size = 75 # scryfall's max identifiers per request
+
+    while checkpoint['index'] < len(items):
+        batch = items[checkpoint['index']:checkpoint['index'] + batch_size]
+        prices = _fetch_prices({ item['_id']['scryfall_id'] for item in batch })
+        for item in batch:
+            price = prices.get(item['_id']['scryfall_id'], {})
+            usd = price.get('usd_foil' if item['_id']['foil'] else 'usd')
+            eur = price.get('eur_foil' if item['_id']['foil'] else 'eur')
+            if usd or eur:
+                checkpoint['usd'] += float(usd or 0) * item['amount']
+                checkpoint['eur'] += float(eur or 0) * item['amount']
+                checkpoint['priced'] += item['amount']
+            else:
+                checkpoint['unpriced'] += item['amount']
+        checkpoint['index'] += len(batch)
+        job.update_progress(checkpoint['index'], len(items), checkpoint=checkpoint)
+        time.sleep(0.1) # scryfall's rate limit
+
+    job.finish({
+        'usd': round(checkpoint['usd'], 2),
+        'eur': round(checkpoint['eur'], 2),
+        'priced': checkpoint['priced'],
+        'unpriced': checkpoint['unpriced'],
+    })
+
+def snapshot(job:JobModel):
+    '''
+    Takes a snapshot of the user's collection, see `SnapshotModel`.
+    '''
+    user = UserModel(user_id=job.user_id)
+    job.update_progress(0, user.doc_count())
+    snapshot = SnapshotModel.create(user, reason=job.params.get('reason', 'manual'))
+    job.update_progress(snapshot.doc_count, snapshot.doc_count)
+    job.finish(snapshot.to_JSON())
+
+
+def restore(job:JobModel):
+    '''
+    Restores the user's collection to a version reconstructed from a snapshot, see `SnapshotModel.restore()`.
+    A snapshot of the current collection is taken first, so the restore itself can be undone.
+    '''
+    user = UserModel(user_id=job.user_id)
+    target = SnapshotModel.get(job.params['snapshot_id'], job.user_id)
+    checkpoint = job.checkpoint
+    if checkpoint is None:
+        checkpoint = { 'safety_snapshot_id': str(SnapshotModel.create(user, reason='restore')._id) }
+        job.update_progress(0, None, checkpoint=checkpoint)
+
+    counts = { 'created': 0, 'updated': 0, 'deleted': 0 }
+    for counts in target.restore(user.collection, job.params.get('version'), CHUNK_SIZE):
+        job.update_progress(sum(counts.values()), None, checkpoint=checkpoint)
+    job.finish({ **counts, 'safety_snapshot_id': checkpoint['safety_snapshot_id'] })
+
+
+def _fetch_prices(scryfall_ids) -> dict:
+    req = Request(
+        SCRYFALL_COLLECTION_URL,
+        data = json.dumps({ 'identifiers': [ { 'id': i } for i in scryfall_ids if i ] }).encode(),
+        headers = { 'Content-Type': 'application/json', 'Accept': 'application/json', 'User-Agent': 'magicdex-server' },
+        method = 'POST'
+    )
+    with urlopen(req, timeout=30) as res:
+        data = json.load(res)
+    return { card['id']: card.get('prices', {}) for card in data.get('data', []) }
+
+
+handlers = {
+    'clear':     clear,
+    'import':    import_cards,
+    'export':    export_cards,
+    'reindex':   reindex,
+    'valuation': valuation,
+    'snapshot':  snapshot,
+    'restore':   restore,
+}
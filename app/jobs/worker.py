@@ -0,0 +1,54 @@
+import os, socket, time, traceback
+import multiprocessing
+
+from ..models import JobModel
+
+
+def run_worker(name:str, poll_interval:float=1.0, once=False):
+    '''
+    Claims and executes queued jobs, forever.
+
+    :param name: The worker's name, saved on claimed jobs
+    :param poll_interval: Seconds to wait when the queue is empty
+    :param once: If `True`, returns once the queue is empty
+    '''
+    from .. import create_app
+    from .handlers import handlers
+
+    create_app() # configures the database connection of this process
+
+    while True:
+        job = JobModel.claim(name)
+        if job is None:
+            if once:
+                return
+            time.sleep(poll_interval)
+            continue
+
+        try:
+            with job.held():
+                handlers[job.kind](job)
+        except Exception as e:
+            traceback.print_exc()
+            job.fail(f'{type(e).__name__}: {e}')
+
+
+def run_pool(workers:int=None, poll_interval:float=1.0):
+    '''
+    Runs `workers` worker processes and waits for them.
+    Processes are spawned rather than forked, so each one opens its own database connections.
+
+    :param workers: Number of worker processes, defaults to the number of CPUs
+    :param poll_interval: Seconds each worker waits when the queue is empty
+    '''
+    ctx = multiprocessing.get_context('spawn')
+    workers = workers or os.cpu_count() or 1
+    host = socket.gethostname()
+    processes = [
+        ctx.Process(target=run_worker, args=(f'{host}:{os.getpid()}:{i}', poll_interval), daemon=True)
+        for i in range(workers)
+    ]
+    for p in processes:
+        p.start()
+    for p in processes:
+        p.join()
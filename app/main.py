@@ -1,11 +1,11 @@
-from flask import redirect
+from flask import Flask, current_app, redirect
+from flask_restful import Api
+from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from . import app, api
-from .routes import auth, collections, users
+from . import response_cache
+from .routes import auth, cards, collections, jobs, users
 
 
-@app.route('/', defaults={'path': ''})
-@app.route('/<string:path>')
 def index(path):
     '''
     Catch-all route
@@ -13,31 +13,78 @@ def index(path):
     return {'message': 'this is not the api you are looking for'}, 418
 
 
-def init_auth_route():
+@jwt_required()
+def stats_cache():
+    '''
+    Cache statistics of the serving process, for the users listed in `STATS_USERS`
+    '''
+    user_id, username = get_jwt_identity()
+    if username.lower() not in current_app.config['STATS_USERS']:
+        return {'message': 'you are not authorized to access this resource'}, 401
+    return response_cache.stats()
+
+
+def init_index_route(app:Flask):
+    app.add_url_rule('/', 'index', index, defaults={'path': ''})
+    app.add_url_rule('/<string:path>', 'index', index)
+
+
+def init_stats_route(app:Flask):
+    app.add_url_rule('/stats/cache', 'stats_cache', stats_cache, methods=['GET'])
+
+
+def init_auth_route(api:Api):
     api.add_resource(auth.UsersEndpoint, '/auth', endpoint='auth')
     api.add_resource(auth.UsersEndpoint, '/auth/users')
 
 
-def init_phash_route():
+def init_phash_route(app:Flask):
     func = lambda: redirect('https://github.com/LooLzzz/magicdex-server/raw/phash/image_data.pickle', 308)
     app.add_url_rule('/phash', 'phash', func, methods=['GET'])
 
 
-def init_collections_route():
+def init_collections_route(api:Api):
     api.add_resource(collections.CollectionsEndpoint, '/collections', endpoint='collections')
     api.add_resource(collections.CardEndpoint,        '/collections/<string:card_id>', endpoint='collections_card')
     api.add_resource(collections.AllEndpoint,         '/collections/all', endpoint='collections_all')
+    api.add_resource(collections.ChangesEndpoint,     '/collections/changes', endpoint='collections_changes')
+    api.add_resource(collections.EventsEndpoint,      '/collections/events', endpoint='collections_events')
+    api.add_resource(collections.CoverageEndpoint,    '/collections/coverage', endpoint='collections_coverage')
+    api.add_resource(collections.SetsEndpoint,        '/collections/sets', endpoint='collections_sets')
+    api.add_resource(collections.SetEndpoint,         '/collections/sets/<string:set_code>', endpoint='collections_set')
+    api.add_resource(collections.TagsEndpoint,        '/collections/tags', endpoint='collections_tags')
+    api.add_resource(collections.SnapshotsEndpoint,   '/collections/snapshots', endpoint='collections_snapshots')
+    api.add_resource(collections.SnapshotEndpoint,    '/collections/snapshots/<string:snapshot_id>', endpoint='collections_snapshot')
+    api.add_resource(collections.RestoreEndpoint,     '/collections/snapshots/<string:snapshot_id>/restore', endpoint='collections_snapshot_restore')
     
     
-def init_users_route():
+def init_users_route(api:Api):
     api.add_resource(users.UsersEndpoint,       '/users', '/users/<string:username>', endpoint='users')
     api.add_resource(users.CollectionsEndpoint, '/users/<string:username>/collection', endpoint='user_collection')
     api.add_resource(users.CardEndpoint,        '/users/<string:username>/collection/<string:card_id>', endpoint='user_collection_card')
     api.add_resource(users.AllEndpoint,         '/users/<string:username>/collection/all', endpoint='user_collections_all')
+    api.add_resource(users.CoverageEndpoint,    '/users/<string:username>/collection/coverage', endpoint='user_collection_coverage')
+
+
+def init_cards_route(api:Api):
+    api.add_resource(cards.BatchOwnersEndpoint, '/cards/owners', endpoint='cards_owners')
+    api.add_resource(cards.OwnersEndpoint,      '/cards/<string:scryfall_id>/owners', endpoint='cards_card_owners')
+    api.add_resource(cards.SearchEndpoint,      '/cards/search', endpoint='cards_search')
+
+
+def init_jobs_route(api:Api):
+    api.add_resource(jobs.JobsEndpoint,   '/jobs', endpoint='jobs')
+    api.add_resource(jobs.JobEndpoint,    '/jobs/<string:job_id>', endpoint='jobs_job')
+    api.add_resource(jobs.ResultEndpoint, '/jobs/<string:job_id>/result', endpoint='jobs_result')
 
 
 ## main ##
-init_auth_route()
-init_phash_route()
-init_collections_route()
-init_users_route()
+def init_routes(app:Flask, api:Api):
+    init_index_route(app)
+    init_auth_route(api)
+    init_phash_route(app)
+    init_stats_route(app)
+    init_collections_route(api)
+    init_users_route(api)
+    init_cards_route(api)
+    init_jobs_route(api)
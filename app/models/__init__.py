@@ -1,3 +1,8 @@
 from .cards import CardModel
+from .journal import JournalModel
 from .collections import CollectionModel
 from .users import UserModel
+from .jobs import JobModel
+from .owners import OwnersModel
+from .idempotency import IdempotencyModel
+from .snapshots import SnapshotModel
@@ -4,12 +4,38 @@ from bson.objectid import ObjectId
 
 from .. import cards_db
 from ..utils import CardCondition, DatabaseOperation, to_bool
+from . import schema
+
+
+def _to_object_id(value:Union[str, ObjectId]):
+    if value is None or isinstance(value, ObjectId):
+        return value
+    return ObjectId(value) if value else None
+
+
+def _to_bool(value):
+    if value is None or value is True or value is False:
+        return value
+    return to_bool(value)
 
 
 class CardModel():
     CardCondition     = CardCondition
     DatabaseOperation = DatabaseOperation
 
+    # fields stored in a card document, see `from_mongo()`
+    FIELDS = (
+        '_id', 'user_id', 'scryfall_id', 'amount', 'tag', 'foil', 'condition',
+        'signed', 'altered', 'misprint', 'date_created',
+    )
+
+    __slots__ = (
+        'parent', 'user_id', '_id', 'operation',
+        'scryfall_id', 'amount', 'tag', 'foil', 'condition',
+        'signed', 'altered', 'misprint', 'date_created',
+        'stored', 'stored_doc',
+    )
+
     def __init__(self, parent=None, scryfall_id:str=None, _id:Union[str, ObjectId]=None, user_id:Union[str, ObjectId]=None, amount:Union[int, str]=None, tag:Union[str, dict]=None, foil:bool=None,
                        condition:Union[CardCondition, int, str]=None, signed:bool=None, altered:bool=None, misprint:bool=None, date_created:datetime=None,
                        operation:Union[DatabaseOperation, int, str]=DatabaseOperation.UPDATE, fetch_data_by_id=False):
@@ -19,49 +45,68 @@ class CardModel():
         :raises EnumParsingError(ValueError): when `condition` or `operation` cant be parsed to its enum counterpart
         :raises bson.errors.InvalidId: when `_id` is not a valid ObjectId
         '''
-        data = None
+        data = raw = None
         if not (_id or scryfall_id):
             raise ValueError('Either `_id` or `scryfall_id` must be provided')
+        if user_id is None:
+            user_id = parent.user_id
         if fetch_data_by_id:
             if not _id:
                 raise ValueError('`_id` must be provided when using `fetch_data_by_id=True`')
-            data = self.get_card_data_by_id(_id)
+            raw = self.get_card_data_by_id(_id, user_id)
+            data = schema.decode(raw)
         if isinstance(amount, str):
             amount = amount.replace(' ', '')
-        if user_id is None:
-            user_id = parent.user_id
 
         self.parent = parent
-        self.user_id = ObjectId(user_id) if user_id else user_id
-        self._id = ObjectId(_id) if _id else _id
-        self.operation = DatabaseOperation.parse(operation)
+        self.user_id = _to_object_id(user_id)
+        self._id = _to_object_id(_id)
+        self.operation = operation if isinstance(operation, DatabaseOperation) else DatabaseOperation.parse(operation)
         
         if data:
-            self.scryfall_id = data['scryfall_id']
-            self.amount = data['amount']
-            self.tag = data['tag']
-            self.foil = data['foil']
-            self.condition = CardCondition.parse(data['condition'])
-            self.signed = data['signed']
-            self.altered = data['altered']
-            self.misprint = data['misprint']
-            self.date_created = data['date_created']
-        else:
-            self.scryfall_id = scryfall_id
-            self.amount = amount
-            self.tag = tag
-            self.foil = foil
-            self.condition = CardCondition.parse(condition)
-            self.signed = signed
-            self.altered = altered
-            self.misprint = misprint
-            self.date_created = date_created
-        
+            scryfall_id = data['scryfall_id']
+            amount = data['amount']
+            tag = data['tag']
+            foil = data['foil']
+            condition = data['condition']
+            signed = data['signed']
+            altered = data['altered']
+            misprint = data['misprint']
+            date_created = data['date_created']
+
+        self.scryfall_id = scryfall_id
+        self.amount = amount
+        self.tag = tag
+        self.foil = foil
+        self.condition = condition if isinstance(condition, CardCondition) else CardCondition.parse(condition)
+        self.signed = signed
+        self.altered = altered
+        self.misprint = misprint
+        self.date_created = date_created
+        self.stored = (self.scryfall_id, self.amount, self.normalized_tags()) if data else None # `(scryfall_id, amount, tags)` as currently saved in the database
+        self.stored_doc = self.to_mongo() if data and raw.get('v') == schema.SCHEMA_VERSION else None # v2 document as currently saved in the database
+
     @classmethod
-    def get_card_data_by_id(cls, card_id:Union[ObjectId, str]):
-        data = cards_db.find_one(
-            { '_id': ObjectId(card_id) }
-        )
+    def from_mongo(cls, parent, data:dict):
+        '''
+        Creates a `CardModel` from a document loaded from the database.
+
+        :param parent: The parent `CollectionModel`
+        :param data: A card document, in either schema version
+        :return: A new `CardModel` instance
+        '''
+        decoded = schema.decode(data)
+        card = cls(parent, **{ k:decoded[k] for k in cls.FIELDS if k in decoded })
+        card.stored = (card.scryfall_id, card.amount, card.normalized_tags())
+        card.stored_doc = card.to_mongo() if data.get('v') == schema.SCHEMA_VERSION else None
+        return card
+
+    @classmethod
+    def get_card_data_by_id(cls, card_id:Union[ObjectId, str], user_id:Union[ObjectId, str]=None):
+        query = { '_id': ObjectId(card_id) }
+        if user_id:
+            query['user_id'] = ObjectId(user_id)
+        data = cards_db.find_one(query)
         if data:
             return data
         # else:
@@ -88,38 +133,68 @@ class CardModel():
                 }
             } for tag in tags],
         ]
+
+        # match documents of both schema versions
+        doc = self.to_mongo()
+        data_v2 = {
+            **{ k:doc[k] for k in ('v', 'user_id', 'scryfall_id', 'condition', 'flags') },
+            '$and': data['$and'],
+        }
         
         res = cards_db.find_one(
-            { **data }
+            { '$or': [ data, data_v2 ] }
         )
         if res:
-            return CardModel(self.parent, **res)
+            return CardModel.from_mongo(self.parent, res)
         return None
 
     def __getitem__(self, key):
         if isinstance(key, str):
-            keys = [ key ]
-        elif isinstance(key, (list, tuple)):
-            keys = key
-        else: #if not isinstance(key, (list, tuple)):
-            raise ValueError(f'Invalid key type {type(key)}')
-
-        res = {}
-        for k in keys:
-            res[k] = getattr(self, k)
-        return res if isinstance(key, (list, tuple)) else list(res.values())[0]
+            return getattr(self, key)
+        if isinstance(key, (list, tuple)):
+            return { k:getattr(self, k) for k in key }
+        raise ValueError(f'Invalid key type {type(key)}')
 
     def __setitem__(self, key, value):
         setattr(self, key, value)
 
+    def identity(self):
+        '''
+        Identity tuple of this `CardModel`, excluding `{_id, amount, date_created, operation}`.
+        Tags are compared as `normalized_tags()`, same as `CollectionModel.duplicates()`.
+        Default values are used if `None` is found.
+        Cards are mutable and not hashable themselves, key sets and dicts on this tuple instead.
+
+        :return: A hashable tuple identifying this card within a collection
+        '''
+        return (
+            self.user_id,
+            self.scryfall_id,
+            self.normalized_tags(),
+            self.foil or False,
+            self.condition or CardCondition.NM,
+            self.signed or False,
+            self.altered or False,
+            self.misprint or False,
+        )
+
+    def normalized_tags(self):
+        '''
+        Distinct tags of this `CardModel`, lowercased and sorted.
+        Stored as `tag_normalized` alongside `tag`, see `CollectionModel.tags()`.
+
+        :return: A tuple of tags
+        '''
+        return tuple(sorted({ t.lower() for t in self.tag })) if self.tag else ()
+
     def __eq__(self, other:'CardModel'):
-        if self._id == other._id:
+        if self is other:
             return True
-        
-        card = self.to_JSON(drop_cols=['_id', 'amount', 'operation'])
-        other = other.to_JSON(drop_cols=['_id', 'amount', 'operation'])
-        
-        return card == other
+        if not isinstance(other, CardModel):
+            return NotImplemented
+        return self.identity() == other.identity()
+
+    __hash__ = None # mutable, see `identity()`
 
     def generate_id(self):
         '''
@@ -151,6 +226,24 @@ class CardModel():
         }
         return { k:v for k,v in res.items() if k not in drop_cols }
 
+    def to_mongo(self):
+        '''
+        Document representation of this `CardModel`, in the current storage schema, see `schema`.
+        Does not include `_id` and `public`.
+        '''
+        condition = self.condition or CardCondition.NM
+        return {
+            'v': schema.SCHEMA_VERSION,
+            'user_id': self.user_id,
+            'scryfall_id': schema.encode_scryfall_id(self.scryfall_id),
+            'amount': self.amount or 1,
+            'tag': self.tag or [],
+            'tag_normalized': list(self.normalized_tags()),
+            'condition': condition.value,
+            'flags': schema.pack_flags(foil=self.foil, signed=self.signed, altered=self.altered, misprint=self.misprint),
+            'date_created': self.date_created,
+        }
+
     def to_dict(self, drop_cols=[], drop_none=False):
         '''
         Dictionary representation of this `CardModel` instance
@@ -173,9 +266,7 @@ class CardModel():
             'date_created': self.date_created,
             'operation': self.operation,
         }
-        res = { k:v for k,v in res.items() if v is not None } if drop_none else res
-        res = { k:v for k,v in res.items() if k not in drop_cols }
-        return res
+        return { k:v for k,v in res.items() if k not in drop_cols and (v is not None or not drop_none) }
 
     def __repr__(self):
         return repr(self.to_dict())
@@ -205,23 +296,39 @@ class CardModel():
         :return: An updated `CardModel` instance
         '''
         if 'amount' in kwargs:
-            amount = str(kwargs['amount'])
-            if amount[0] in {'+', '-'}:
-                self.amount += int(amount)
+            amount = kwargs['amount']
+            if isinstance(amount, int) and not isinstance(amount, bool):
+                # typed input, negative values are relative same as `'-X'`
+                if amount < 0:
+                    self.amount += amount
+                else:
+                    self.amount = amount
             else:
-                self.amount = int(amount)
+                amount = str(amount)
+                if amount[0] in {'+', '-'}:
+                    self.amount += int(amount)
+                else:
+                    self.amount = int(amount)
         if self.amount > 0:
             self.operation = DatabaseOperation.UPDATE
         else:
             self.operation = DatabaseOperation.DELETE
 
-        self.scryfall_id = kwargs['scryfall_id'] if 'scryfall_id' in kwargs else self.scryfall_id
-        self.tag = kwargs['tag'] if 'tag' in kwargs else self.tag
-        self.foil = to_bool(kwargs['foil']) if 'foil' in kwargs else self.foil
-        self.condition = CardCondition.parse(kwargs['condition']) if 'condition' in kwargs else self.condition
-        self.signed = to_bool(kwargs['signed']) if 'signed' in kwargs else self.signed
-        self.altered = to_bool(kwargs['altered']) if 'altered' in kwargs else self.altered
-        self.misprint = to_bool(kwargs['misprint']) if 'misprint' in kwargs else self.misprint
+        if 'scryfall_id' in kwargs:
+            self.scryfall_id = kwargs['scryfall_id']
+        if 'tag' in kwargs:
+            self.tag = kwargs['tag']
+        if 'foil' in kwargs:
+            self.foil = _to_bool(kwargs['foil'])
+        if 'condition' in kwargs:
+            condition = kwargs['condition']
+            self.condition = condition if isinstance(condition, CardCondition) else CardCondition.parse(condition)
+        if 'signed' in kwargs:
+            self.signed = _to_bool(kwargs['signed'])
+        if 'altered' in kwargs:
+            self.altered = _to_bool(kwargs['altered'])
+        if 'misprint' in kwargs:
+            self.misprint = _to_bool(kwargs['misprint'])
 
         return self
 
@@ -240,13 +347,15 @@ class CardModel():
         '''
         old_id = self._id
         
+        doc = { **self.to_mongo(), 'date_created': datetime.now() }
         res = cards_db.insert_one(
             {
-                **self.to_JSON(to_mongo=True, drop_cols=['_id']),
-                'date_created': datetime.now(),
+                **doc,
+                'public': bool(self.parent.public), # denormalized for `OwnersModel`
             }
         )
         self._id = res.inserted_id
+        self.stored_doc = doc
         
         del self.parent[old_id]
         self.parent[self._id] = self
@@ -264,23 +373,33 @@ class CardModel():
     
     def _update(self):
         '''
-        Updates this `CardModel` instance in the database.
+        Updates this `CardModel` instance in the database, only sending the changed fields.
+        v1 documents are rewritten in the current schema.
         Internal method, should not be called directly, use `CardModel.save()` instead.
         '''
-        return cards_db.update_one(
+        doc = self.to_mongo()
+        if self.stored_doc is None:
+            update = { '$set': doc, '$unset': { k:'' for k in schema.FLAGS } }
+        else:
+            changed = { k:v for k,v in doc.items() if self.stored_doc.get(k) != v }
+            if not changed:
+                return None
+            update = { '$set': changed }
+
+        res = cards_db.update_one(
             { '_id': self._id }, # card_id
-            {
-                '$set': {
-                    **self.to_JSON(to_mongo=True)
-                }
-            }
+            update
         )
+        self.stored_doc = doc
+        return res
 
-    def save(self):
+    def save(self, commit=True):
         '''
         Saves this `CardModel` instance to the database.
         Calls `_create()`, `_update()` or `_delete()` internally.
         
+        :param commit: Record the write with `CollectionModel.commit()`, defaults to `True`.
+                       `CollectionModel.save()` passes `False` and commits once for the whole batch.
         :raises Exception: If the operation fails
         :return: A Dictionary containing operation info
         '''
@@ -304,6 +423,9 @@ class CardModel():
         else:
             raise Exception('Invalid operation')
                 
+        if commit:
+            self.parent.commit([ self ])
+
         res['_id']    = str(self._id)
         res['action'] = self.operation.to_past_tense()
         return res
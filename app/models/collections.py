@@ -1,12 +1,19 @@
-import json, os
+import json, os, re
+import numpy as np
 from datetime import datetime
 from flask import abort, jsonify, make_response
 from typing import Iterable, Union, List, Dict
 from bson import ObjectId, json_util
 
-from ..utils import DatabaseOperation
-from .. import cards_db
-from . import CardModel
+from pymongo import UpdateOne, DeleteOne, ReplaceOne
+
+from ..utils import CardCondition, DatabaseOperation, VersionedCache
+from .. import mongo, cards_db, cards_read_db, owned_db, tags_db, response_cache, events
+from ..catalog import catalog
+from . import CardModel, JournalModel, schema
+
+
+_set_progress_cache = VersionedCache(maxsize=int(os.getenv('SET_PROGRESS_CACHE_SIZE', 256)))
 
 
 class CollectionModel():
@@ -17,6 +24,9 @@ class CollectionModel():
         self._cards:Dict[ObjectId, CardModel] = {}
         # self.cards = { card._id: card for card in [CardModel(parent=self, **item) for item in data['cards']] }
         self.clear_db = False
+        self.total_documents = None
+        self.journal = JournalModel(parent=self)
+        self._missing = set() # ids known not to be in the collection
 
     def __getitem__(self, key):
         if isinstance(key, (ObjectId, str)):
@@ -26,11 +36,48 @@ class CollectionModel():
         else: # if not isinstance(key, Iterable):
             raise ValueError(f'Invalid key type {type(key)}')
 
-        for k in keys:
-            if k not in self._cards:
-                self._cards[k] = CardModel(self, _id=k, fetch_data_by_id=True)
-        res = { k:v for k,v in self._cards.items() if k in keys }
-        return res if isinstance(key, (list, tuple)) else list(res.values())[0]
+        self.fetch(keys)
+        return { k:self._cards[k] for k in keys } if isinstance(key, (list, tuple)) else self._cards[keys[0]]
+
+    def fetch(self, keys:List[ObjectId], missing_ok=False):
+        '''
+        Loads the given card ids that aren't loaded yet from the database, using a single query.
+        Only cards belonging to this collection's user are loaded.
+
+        :param keys: List of card ids
+        :param missing_ok: If `True`, ids that aren't found are ignored
+        :raises KeyError: If any of the ids isn't found in the collection, listing all of them
+        :return: An updated `CollectionModel` object
+        '''
+        missing = [ k for k in dict.fromkeys(keys) if k not in self._cards and k not in self._missing ]
+        if missing:
+            for item in cards_db.find({ '_id': { '$in': missing }, 'user_id': self.user_id }):
+                self._cards[item['_id']] = CardModel.from_mongo(self, item)
+            self._missing.update( k for k in missing if k not in self._cards )
+
+        if not missing_ok:
+            missing = [ str(k) for k in keys if k not in self._cards ]
+            if len(missing) == 1:
+                raise KeyError(f'No card with id `{missing[0]}` found')
+            if missing:
+                raise KeyError(f'No cards with ids {missing} found')
+        return self
+
+    @property
+    def public(self):
+        return self.parent.public
+
+    @property
+    def reads(self):
+        '''
+        The cards collection to use for read only queries.
+        Reads go to a secondary, unless the user wrote to the collection within `READ_YOUR_WRITES_WINDOW`,
+        so users always read their own writes.
+        '''
+        date_written = self.parent.date_written
+        if date_written and datetime.utcnow() - date_written < mongo.read_your_writes:
+            return cards_db
+        return cards_read_db
 
     def __setitem__(self, key, value):
         self._cards[ObjectId(key)] = value
@@ -58,20 +105,293 @@ class CollectionModel():
 
     def doc_count(self):
         '''
-        Retrieves the number of document cards in the collection from the database.
+        Retrieves the number of document cards in the collection, see `UserModel.doc_count()`.
         
         :return: Number of document cards in the collection
         '''
         return self.parent.doc_count()
 
-    # def inc_doc_count(self, amount:int):
-    #     '''
-    #     Increments the number of document cards in the collection by `amount`.
+    def commit(self, cards:List[CardModel]=[], cleared=False):
+        '''
+        Records writes that were already saved to the database.
+        Increments the collection version by one for each change, updates the collection counters and tag counts,
+        appends the changes to the journal, invalidates the user's cached public responses and notifies their event streams.
+
+        :param cards: List of saved `CardModel`s, `NOP`s are ignored
+        :param cleared: Whether the collection was cleared
+        :return: The new collection version
+        '''
+        cards = [ card for card in cards if card.operation != DatabaseOperation.NOP ]
+        count = len(cards) + int(cleared)
+        if not count:
+            return self.parent.collection_version
 
-    #     :param amount: The amount to increment
-    #     :return: The new document count
-    #     '''
-    #     return self.parent.inc_doc_count(amount)
+        if cleared:
+            owned_db.delete_many({ 'user_id': self.user_id })
+            tags_db.delete_many({ 'user_id': self.user_id })
+            version = self.parent.bump_collection_version(count, reset_counters=True)
+        else:
+            self._update_tags(cards) # before `_update_owned()`, which overwrites `card.stored`
+            version = self.parent.bump_collection_version(count, counters=self._update_owned(cards))
+        self.journal.append(version - count + 1, cards, cleared)
+        if self.parent.counters['doc_count'] is None:
+            self.reconcile() # users created before the counters existed, counted on their first write
+        response_cache.invalidate(self.parent.username.lower())
+        events.publish(self.user_id)
+        return version
+
+    def _update_owned(self, cards:List[CardModel]):
+        '''
+        Updates the per `scryfall_id` document and amount counts of saved cards.
+        Internal method, should not be called directly, use `CollectionModel.commit()` instead.
+
+        :param cards: List of saved `CardModel`s
+        :return: Increments for the user's `{doc_count, card_count, unique_count}` counters
+        '''
+        doc_count, card_count = 0, 0
+        owned = {} # scryfall_id -> [docs, amount]
+        for card in cards:
+            if card.stored:
+                scryfall_id, amount, _ = card.stored
+                item = owned.setdefault(scryfall_id, [0, 0])
+                item[0] -= 1
+                item[1] -= amount
+                doc_count -= 1
+                card_count -= amount
+            if card.operation == DatabaseOperation.DELETE or card.amount <= 0:
+                card.stored = None
+            else:
+                item = owned.setdefault(card.scryfall_id, [0, 0])
+                item[0] += 1
+                item[1] += card.amount
+                doc_count += 1
+                card_count += card.amount
+                card.stored = (card.scryfall_id, card.amount, card.normalized_tags())
+        owned = { k:v for k,v in owned.items() if v != [0, 0] }
+        if not owned:
+            return { 'doc_count': doc_count, 'card_count': card_count, 'unique_count': 0 }
+
+        owned_db.bulk_write([
+            UpdateOne(
+                { 'user_id': self.user_id, 'scryfall_id': scryfall_id },
+                { '$inc': { 'docs': docs, 'amount': amount } },
+                upsert = True
+            ) for scryfall_id, (docs, amount) in owned.items()
+        ], ordered=False)
+        
+        unique_count = 0
+        for item in owned_db.find(
+            { 'user_id': self.user_id, 'scryfall_id': { '$in': list(owned) } },
+            { '_id': 0, 'scryfall_id': 1, 'docs': 1 }
+        ):
+            before = item['docs'] - owned[item['scryfall_id']][0]
+            if before <= 0 < item['docs']:
+                unique_count += 1
+            elif item['docs'] <= 0 < before:
+                unique_count -= 1
+        owned_db.delete_many({ 'user_id': self.user_id, 'docs': { '$lte': 0 } })
+
+        return { 'doc_count': doc_count, 'card_count': card_count, 'unique_count': unique_count }
+
+    def _update_tags(self, cards:List[CardModel]):
+        '''
+        Updates the per tag document counts of saved cards.
+        Internal method, should not be called directly, use `CollectionModel.commit()` instead.
+
+        :param cards: List of saved `CardModel`s
+        '''
+        tags = {} # normalized tag -> [docs, display name]
+        for card in cards:
+            before = card.stored[2] if card.stored else ()
+            after = () if card.operation == DatabaseOperation.DELETE or card.amount <= 0 else card.normalized_tags()
+            for tag in before:
+                tags.setdefault(tag, [0, tag])[0] -= 1
+            for tag in card.tag or []:
+                item = tags.setdefault(tag.lower(), [0, tag])
+                if tag.lower() in after:
+                    item[0] += 1
+                    item[1] = tag
+                    after = tuple( t for t in after if t != tag.lower() ) # count duplicates once
+        tags = { k:v for k,v in tags.items() if v[0] != 0 }
+        if not tags:
+            return
+
+        tags_db.bulk_write([
+            UpdateOne(
+                { 'user_id': self.user_id, 'tag': tag },
+                { '$inc': { 'docs': docs }, '$setOnInsert': { 'name': name } },
+                upsert = True
+            ) for tag, (docs, name) in tags.items()
+        ], ordered=False)
+        if any( docs < 0 for docs, _ in tags.values() ):
+            tags_db.delete_many({ 'user_id': self.user_id, 'docs': { '$lte': 0 } })
+
+    def tags(self, prefix:str='', limit:int=20):
+        '''
+        Autocompletes the collection's tags, case insensitive, most used first.
+
+        :param prefix: Start of the tag
+        :param limit: Max number of tags to return
+        :return: List of `{tag, count}` dictionaries, `count` is the number of cards with the tag
+        '''
+        query = { 'user_id': self.user_id }
+        if prefix:
+            query['tag'] = { '$regex': f'^{re.escape(prefix.lower())}' }
+        return [
+            { 'tag': item['name'], 'count': item['docs'] }
+            for item in tags_db
+                .find(query, { '_id': 0, 'name': 1, 'docs': 1 })
+                .sort([ ('docs', -1), ('tag', 1) ])
+                .limit(limit)
+        ]
+
+    def duplicates(self):
+        '''
+        Finds cards that only differ by amount, using a server side aggregation.
+        Cards are the same if they share `scryfall_id`, condition, flags and tags (case and order insensitive),
+        in either schema version.
+
+        :return: A list of duplicate groups, each a list of `{_id, amount, date_created}`, earliest first
+        '''
+        pipeline = [
+            { '$match': { 'user_id': self.user_id } },
+            {
+                '$group': {
+                    '_id': {
+                        'v': '$v',
+                        'scryfall_id': '$scryfall_id',
+                        'condition': '$condition',
+                        'flags': '$flags',
+                        **{ k: f'${k}' for k in schema.FLAGS },
+                        'tag': { '$ifNull': [ '$tag_normalized', '$tag' ] },
+                    },
+                    'cards': { '$push': { '_id': '$_id', 'amount': '$amount', 'date_created': '$date_created' } },
+                }
+            },
+        ]
+        if not cards_db.count_documents({ 'user_id': self.user_id, 'v': { '$ne': schema.SCHEMA_VERSION } }, limit=1):
+            # without v1 documents duplicates share the exact same group
+            pipeline.append({ '$match': { 'cards.1': { '$exists': True } } })
+
+        groups = {}
+        for item in cards_db.aggregate(pipeline, allowDiskUse=True):
+            key = schema.decode(item['_id'])
+            identity = (
+                key['scryfall_id'],
+                (CardCondition.parse(key.get('condition')) or CardCondition.NM).name,
+                *( bool(key.get(k)) for k in schema.FLAGS ),
+                tuple(sorted({ t.lower() for t in key.get('tag') or [] })),
+            )
+            groups.setdefault(identity, []).extend(item['cards'])
+        return [
+            sorted(cards, key=lambda card: (card.get('date_created') or datetime.max, card['_id']))
+            for cards in groups.values() if len(cards) > 1
+        ]
+
+    def merge_duplicates(self, groups:List[List[dict]]):
+        '''
+        Merges groups of duplicate cards into their earliest card, summing their amounts, using a single transaction.
+        The changes are recorded with `commit()`.
+
+        :param groups: Duplicate groups, see `duplicates()`
+        :raises RuntimeError: If any of the cards changed meanwhile, nothing is merged then
+        :return: Number of cards removed
+        '''
+        self.fetch([ card['_id'] for group in groups for card in group ], missing_ok=True)
+        cards, requests, removed = [], [], 0
+        for group in groups:
+            found = [ self._cards[card['_id']] for card in group if card['_id'] in self._cards ]
+            if len(found) < 2:
+                continue
+            keeper, *extras = found
+            total = sum( card.amount for card in found )
+            # guarded by the amounts read, so concurrent writes abort the transaction instead of being lost
+            requests.append(UpdateOne({ '_id': keeper._id, 'amount': keeper.amount }, { '$set': { 'amount': total } }))
+            requests += [ DeleteOne({ '_id': card._id, 'amount': card.amount }) for card in extras ]
+            keeper.amount = total
+            if keeper.stored_doc:
+                keeper.stored_doc['amount'] = total
+            for card in extras:
+                card.operation = DatabaseOperation.DELETE
+            cards += [ keeper, *extras ]
+            removed += len(extras)
+        if not requests:
+            return 0
+
+        with mongo.connect().start_session() as session:
+            with session.start_transaction():
+                res = cards_db.bulk_write(requests, ordered=False, session=session)
+                if res.matched_count + res.deleted_count != len(requests):
+                    raise RuntimeError('cards changed while merging')
+        self.commit(cards)
+        return removed
+
+    def reconcile(self):
+        '''
+        Recounts the collection counters from the cards in the database and repairs any drift.
+        Rebuilds the per `scryfall_id` and per tag counts as well.
+
+        :return: A dictionary of `{counter: (stored_value, actual_value)}` for every counter that drifted
+        '''
+        owned = {}
+        for item in cards_db.aggregate([
+            { '$match': { 'user_id': self.user_id } },
+            { '$group': { '_id': '$scryfall_id', 'docs': { '$sum': 1 }, 'amount': { '$sum': '$amount' } } },
+        ]):
+            # documents of both schema versions may hold the same `scryfall_id`
+            scryfall_id = schema.decode_scryfall_id(item['_id'])
+            if scryfall_id in owned:
+                owned[scryfall_id]['docs'] += item['docs']
+                owned[scryfall_id]['amount'] += item['amount']
+            else:
+                owned[scryfall_id] = { **item, '_id': scryfall_id }
+        owned = list(owned.values())
+        owned_db.delete_many({ 'user_id': self.user_id })
+        if owned:
+            owned_db.insert_many([
+                {
+                    'user_id': self.user_id,
+                    'scryfall_id': item['_id'],
+                    'docs': item['docs'],
+                    'amount': item['amount'],
+                } for item in owned
+            ], ordered=False)
+        
+        counters = {
+            'doc_count': sum( item['docs'] for item in owned ),
+            'card_count': sum( item['amount'] for item in owned ),
+            'unique_count': len(owned),
+        }
+        drift = { k:(self.parent.counters.get(k), v) for k,v in counters.items() if self.parent.counters.get(k) != v }
+        self.parent.set_counters(counters)
+        self._reconcile_tags()
+        return drift
+
+    def _reconcile_tags(self):
+        # backfill `tag_normalized` for cards saved before it existed, then recount
+        cards_db.update_many(
+            { 'user_id': self.user_id },
+            [{ '$set': {
+                'tag_normalized': { '$setUnion': [
+                    { '$map': { 'input': { '$ifNull': [ '$tag', [] ] }, 'in': { '$toLower': '$$this' } } }, []
+                ] }
+            } }]
+        )
+        tags = list(cards_db.aggregate([
+            { '$match': { 'user_id': self.user_id } },
+            { '$unwind': '$tag' },
+            { '$group': { '_id': { '$toLower': '$tag' }, 'name': { '$first': '$tag' }, 'cards': { '$addToSet': '$_id' } } },
+        ]))
+        tags_db.delete_many({ 'user_id': self.user_id })
+        if tags:
+            tags_db.insert_many([
+                {
+                    'user_id': self.user_id,
+                    'tag': item['_id'],
+                    'name': item['name'],
+                    'docs': len(item['cards']),
+                } for item in tags
+            ], ordered=False)
 
     def to_JSON(self, to_mongo=False, drop_cols=[], cards_drop_cols=[]):
         '''
@@ -85,17 +405,32 @@ class CollectionModel():
         }
         return { k:v for k,v in res.items() if k not in drop_cols }
 
-    def load(self, page:int=1, per_page:int=20, cards:List[CardModel]=[]):
+    def load(self, page:int=1, per_page:int=20, cards:List[CardModel]=[], scryfall_ids:List[str]=None, tag:str=None):
         '''
         Loads cards from the database.
 
         :param page: Page number
         :param per_page: Number of cards per page
         :param cards: List of cards. To load all cards pass `cards=[]`. Defaults to `[]`
+        :param scryfall_ids: If given, only cards with one of these `scryfall_id`s are loaded, e.g. from a name search
+        :param tag: If given, only cards with this tag are loaded, case insensitive
         :return: An updated `CollectionModel` object
         '''
         skip_amount = (page - 1) * per_page
-        doc_count = len(cards) if cards else self.doc_count()
+        query = {
+            'user_id': ObjectId(self.user_id),
+            '_id': { '$in': [ card._id for card in cards ] } if cards # if a list of cards is provided, then return only those card ids
+                                                             else { '$exists': True }
+        }
+        if tag:
+            query['tag_normalized'] = tag.lower()
+        if scryfall_ids is not None:
+            query['scryfall_id'] = schema.scryfall_id_in(scryfall_ids)
+        if tag or scryfall_ids is not None:
+            doc_count = self.reads.count_documents(query) if scryfall_ids != [] else 0
+        else:
+            doc_count = len(cards) if cards else self.doc_count()
+        self.total_documents = doc_count
 
         if skip_amount >= doc_count:
             abort(make_response(
@@ -107,15 +442,11 @@ class CollectionModel():
                 200
             ))
         else:
-            data = cards_db \
-                .find({
-                    'user_id': ObjectId(self.user_id),
-                    '_id': { '$in': [ card._id for card in cards ] } if cards # if a list of cards is provided, then return only those card ids
-                                                                     else { '$exists': True }
-                }) \
+            data = self.reads \
+                .find(query) \
                 .skip(skip_amount) \
                 .limit(per_page)
-            self._cards = { item['_id']: CardModel(self, **item) for item in data }
+            self._cards = { item['_id']: CardModel.from_mongo(self, item) for item in data }
         return self
     
     def load_all(self, cards:List[CardModel]=[]):
@@ -125,14 +456,84 @@ class CollectionModel():
         :param cards: List of cards. To load all cards pass `cards=[]`. Defaults to `[]`
         :return: An updated `CollectionModel` object
         '''
-        data = cards_db.find({
+        data = self.reads.find({
             'user_id': ObjectId(self.user_id),
             '_id': { '$in': [ card._id for card in cards ] } if cards
                                                              else { '$exists': True }
         })
-        self._cards = { item['_id']: CardModel(self, **item) for item in data }
+        self._cards = { item['_id']: CardModel.from_mongo(self, item) for item in data }
+        self.total_documents = len(self._cards)
         return self
 
+    def coverage(self, deck:List[dict]):
+        '''
+        Checks which cards of a deck list are owned, using a single projected query.
+        Copies are summed per `scryfall_id` across tags, conditions and foil variants,
+        and per card name across all of its printings.
+
+        :param deck: List of `{scryfall_id, amount}` or `{name, amount}` entries
+        :raises RuntimeError: If a card name is given and the card catalog isn't configured
+        :return: The deck entries, each updated with `{owned, missing, status}`
+        '''
+        entry_ids = [
+            [ entry['scryfall_id'] ] if entry.get('scryfall_id') else catalog.ids_for_name(entry['name'])
+            for entry in deck
+        ]
+        all_ids = list(dict.fromkeys( i for ids in entry_ids for i in ids ))
+
+        owned = {}
+        if all_ids:
+            for item in self.reads.aggregate([
+                { '$match': { 'user_id': self.user_id, 'scryfall_id': schema.scryfall_id_in(all_ids) } },
+                { '$project': { '_id': 0, 'scryfall_id': 1, 'amount': 1 } },
+                { '$group': { '_id': '$scryfall_id', 'amount': { '$sum': '$amount' } } },
+            ]):
+                scryfall_id = schema.decode_scryfall_id(item['_id'])
+                owned[scryfall_id] = owned.get(scryfall_id, 0) + item['amount']
+
+        # sum owned copies per entry, then compare against the needed amounts
+        id_index = { scryfall_id: i for i, scryfall_id in enumerate(all_ids) }
+        owned_per_id = np.array([ owned.get(scryfall_id, 0) for scryfall_id in all_ids ], dtype=np.int64)
+        entry_index = np.repeat(np.arange(len(deck)), [ len(ids) for ids in entry_ids ])
+        flat_ids = np.array([ id_index[i] for ids in entry_ids for i in ids ], dtype=np.int64)
+        owned_per_entry = np.bincount(entry_index, weights=owned_per_id[flat_ids], minlength=len(deck)).astype(np.int64)
+
+        needed = np.array([ entry['amount'] for entry in deck ], dtype=np.int64)
+        have = np.minimum(owned_per_entry, needed)
+        missing = needed - have
+        status = np.where(missing == 0, 'OWNED', np.where(have > 0, 'PARTIAL', 'MISSING'))
+        known = np.array([ bool(ids) for ids in entry_ids ], dtype=bool)
+        status = np.where(known, status, 'UNKNOWN')
+
+        return [
+            { **entry, 'owned': int(h), 'missing': int(m), 'status': str(s) }
+            for entry, h, m, s in zip(deck, have, missing, status)
+        ]
+
+    def set_progress(self):
+        '''
+        Counts the distinct printings owned per set, using a single projected query.
+        Results are cached per collection version.
+
+        :raises RuntimeError: If the card catalog isn't configured
+        :return: `(owned_ids, owned_per_set)`, a set of owned `scryfall_id`s and a dict of set code to owned count
+        '''
+        version = self.parent.collection_version
+        res = _set_progress_cache.get(self.user_id, version)
+        if res is None:
+            cards = catalog.ensure_loaded().cards
+            owned_ids = frozenset(
+                schema.decode_scryfall_id(i) for i in self.reads.distinct('scryfall_id', { 'user_id': self.user_id, 'amount': { '$gt': 0 } })
+            )
+            owned_per_set = {}
+            for scryfall_id in owned_ids:
+                if scryfall_id in cards:
+                    set_code = cards[scryfall_id][1]
+                    owned_per_set[set_code] = owned_per_set.get(set_code, 0) + 1
+            res = (owned_ids, owned_per_set)
+            _set_progress_cache.set(self.user_id, version, res)
+        return res
+
     def save(self):
         '''
         Saves all changes to the collection to the database.
@@ -143,27 +544,37 @@ class CollectionModel():
         
         if self.clear_db:
             self.clear_db = False
-            cards = cards_db.find(
-                { 'user_id': ObjectId(self.user_id) },
-                { '_id': 1 }
-            )
-            delete_res = cards_db.delete_many({
-                '_id': {
-                    '$in': [ item['_id'] for item in cards ]
-                }
-            })
-            for item in cards:
-                res += [{
-                    '_id': item['_id'],
-                    'action': 'DELETED'
-                }]
+            for ids in self.clear_chunks():
+                res += [ { '_id': str(card_id), 'action': 'DELETED' } for card_id in ids ]
+            self.commit(cleared=True)
         else:
             cards = list(self._cards.values())
             for card in cards:
-                res += [ card.save() ]
+                res += [ card.save(commit=False) ]
+            self.commit(cards)
         
         return res
     
+    def clear_chunks(self, chunk_size:int=1000):
+        '''
+        Deletes all cards of the collection from the database, one chunk at a time.
+        Does not call `commit()`, which should be called with `cleared=True` once done.
+
+        :param chunk_size: Number of cards to delete per chunk
+        :return: A generator of deleted card id lists, one per chunk
+        '''
+        while True:
+            ids = [
+                item['_id'] for item in cards_db.find(
+                    { 'user_id': self.user_id },
+                    { '_id': 1 }
+                ).limit(chunk_size)
+            ]
+            if not ids:
+                return
+            cards_db.delete_many({ 'user_id': self.user_id, '_id': { '$in': ids } })
+            yield ids
+
     def clear(self):
         '''
         Clears the collection from the database.
@@ -183,6 +594,7 @@ class CollectionModel():
         :param cards: A list of `CardModel` to be added or updated
         :return: An updated `CollectionModel` object
         '''
+        self.fetch([ card._id for card in cards if card._id is not None ], missing_ok=True)
         for card in cards:
             dup = card.find_duplicate()
             if card._id is not None:
@@ -219,3 +631,72 @@ class CollectionModel():
                     card.amount = abs(int(card.amount))
                     self._cards[card._id] = card
         return self
+
+    def plan(self) -> List[dict]:
+        '''
+        The changes pending after `update()`, with relative amounts resolved to absolute ones, see `apply()`.
+        Does not update the database.
+
+        :return: A list of `{_id, operation, card}` changes, `card` holds the card's fields unless deleted
+        '''
+        res = []
+        for card in self._cards.values():
+            operation = card.operation
+            if operation == DatabaseOperation.CREATE and card.amount <= 0:
+                operation = DatabaseOperation.NOP # same as `CardModel.save()`
+            elif operation != DatabaseOperation.NOP and card.amount <= 0:
+                operation = DatabaseOperation.DELETE
+            item = { '_id': card._id, 'operation': operation.name }
+            if operation in (DatabaseOperation.CREATE, DatabaseOperation.UPDATE):
+                item['card'] = card.to_JSON(to_mongo=True, drop_cols=['_id', 'user_id'])
+            res.append(item)
+        return res
+
+    def apply(self, plan:List[dict]):
+        '''
+        Makes the database match a plan from `plan()`, using a single bulk write recorded with `commit()`.
+        Cards already matching the plan are left as is, so applying a plan again,
+        e.g. when resuming an interrupted job, doesn't change anything twice.
+
+        :param plan: The changes, see `plan()`
+        :return: List of result objects, same as `save()`
+        '''
+        ids = [ item['_id'] for item in plan if item['operation'] != DatabaseOperation.NOP.name ]
+        current = { item['_id']: CardModel.from_mongo(self, item) for item in cards_db.find({ '_id': { '$in': ids }, 'user_id': self.user_id }) }
+        requests, cards, res = [], [], []
+        for item in plan:
+            operation, stored = DatabaseOperation.parse(item['operation']), current.get(item['_id'])
+            if operation == DatabaseOperation.NOP:
+                res += [{
+                    '_id': str(item['_id']),
+                    'action': operation.to_past_tense(),
+                    'message': '`_id` not found in collection',
+                    'extra_info': "when creating a new card, leave it's `_id` field empty",
+                }]
+                continue
+            res += [{ '_id': str(item['_id']), 'action': operation.to_past_tense() }]
+
+            if operation == DatabaseOperation.DELETE:
+                if stored:
+                    stored.operation = DatabaseOperation.DELETE
+                    requests.append(DeleteOne({ '_id': stored._id, 'user_id': self.user_id }))
+                    cards.append(stored)
+                continue
+
+            card = CardModel(parent=self, _id=item['_id'], user_id=self.user_id, **item['card'])
+            res[-1]['card'] = card.to_JSON(drop_cols=['user_id'])
+            if stored and stored.to_JSON(to_mongo=True, drop_cols=['_id', 'user_id']) == item['card']:
+                continue # applied before
+            card.operation = DatabaseOperation.UPDATE if stored else DatabaseOperation.CREATE
+            card.stored = stored.stored if stored else None
+            requests.append(ReplaceOne(
+                { '_id': card._id, 'user_id': self.user_id },
+                { **card.to_mongo(), 'public': bool(self.public) }, # denormalized for `OwnersModel`
+                upsert = True
+            ))
+            cards.append(card)
+
+        if requests:
+            cards_db.bulk_write(requests, ordered=False)
+            self.commit(cards)
+        return res
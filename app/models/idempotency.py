@@ -0,0 +1,151 @@
+import os, threading, time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Union
+from bson import ObjectId
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from .. import idempotency_db
+
+
+class IdempotencyModel():
+    '''
+    A request made with an `Idempotency-Key` header, so retries of it are answered with the first execution's response.
+
+    Records are keyed by user, route and key, and expire `IDEMPOTENCY_TTL` seconds after creation using a TTL index.
+    A record is `PENDING` while its request executes, duplicates wait for it instead of executing again.
+    A pending record's lease is renewed while its request executes, see `held()`,
+    a record whose execution died, e.g. with its worker, is taken over once `LEASE` expires.
+    '''
+    PENDING = 'PENDING'
+    DONE    = 'DONE'
+
+    LEASE = timedelta(seconds=int(os.getenv('IDEMPOTENCY_LEASE', 60)))
+    WAIT = float(os.getenv('IDEMPOTENCY_WAIT', 30)) # max seconds a duplicate waits for the pending execution
+    MAX_KEY_LENGTH = 255
+
+    def __init__(self, data:dict):
+        self._id = data['_id']
+        self.status = data['status']
+        self.fingerprint = data['fingerprint']
+        self.response = data.get('response')
+        self.date_started = data['date_started']
+        self.heartbeat = data.get('heartbeat') # missing on records stored by earlier versions
+
+    @classmethod
+    def begin(cls, user_id:Union[ObjectId, str], route:str, key:str, fingerprint:str):
+        '''
+        Claims a key for executing a request, unless it was already claimed.
+
+        :param user_id: The user making the request
+        :param route: The request's method and path
+        :param key: The `Idempotency-Key` header
+        :param fingerprint: A hash of the request's body, to tell apart a key reused for a different request
+        :return: `(record, claimed)`, if `claimed` is `False` the record belongs to an earlier request
+        '''
+        now = datetime.now()
+        data = {
+            '_id': { 'user_id': ObjectId(user_id), 'route': route, 'key': key },
+            'status': cls.PENDING,
+            'fingerprint': fingerprint,
+            'date_started': now,
+            'heartbeat': now,
+            'date_created': now,
+        }
+        try:
+            idempotency_db.insert_one(data)
+            return IdempotencyModel(data), True
+        except DuplicateKeyError:
+            data = idempotency_db.find_one({ '_id': data['_id'] })
+            if data is None: # expired meanwhile
+                return cls.begin(user_id, route, key, fingerprint)
+            return IdempotencyModel(data), False
+
+    def wait(self, timeout:float, poll_interval:float=0.05):
+        '''
+        Waits for a pending record's execution to finish, taking it over if its lease expired.
+
+        :param timeout: Max seconds to wait
+        :param poll_interval: Initial seconds between polls, doubled up to 1 second
+        :return: `(record, claimed)`, the record is still `PENDING` after a timeout unless `claimed`
+        '''
+        deadline = time.monotonic() + timeout
+        record = self
+        while record.status == self.PENDING:
+            if datetime.now() - (record.heartbeat or record.date_started) > self.LEASE:
+                now = datetime.now()
+                data = idempotency_db.find_one_and_update(
+                    { '_id': record._id, 'status': self.PENDING, 'date_started': record.date_started, 'heartbeat': record.heartbeat },
+                    { '$set': { 'date_started': now, 'heartbeat': now } },
+                    return_document = ReturnDocument.AFTER
+                )
+                if data:
+                    return IdempotencyModel(data), True
+            if time.monotonic() + poll_interval > deadline:
+                break
+            time.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, 1)
+            data = idempotency_db.find_one({ '_id': record._id })
+            if data is None: # the execution failed and released the key, retry it
+                record, claimed = self.begin(fingerprint=self.fingerprint, **self._id)
+                if claimed:
+                    return record, True
+                continue
+            record = IdempotencyModel(data)
+        return record, False
+
+    def renew(self) -> bool:
+        '''
+        Renews the lease of a pending record, while its request is still executing.
+
+        :return: `False` if the record was taken over, finished or released meanwhile
+        '''
+        self.heartbeat = datetime.now()
+        res = idempotency_db.update_one(
+            { '_id': self._id, 'status': self.PENDING, 'date_started': self.date_started },
+            { '$set': { 'heartbeat': self.heartbeat } }
+        )
+        return res.matched_count > 0
+
+    @contextmanager
+    def held(self):
+        '''
+        Renews the record's lease from a background thread every third of `LEASE` while the block executes,
+        so a request running longer than `LEASE` isn't taken over and executed again by a retry.
+        '''
+        stop = threading.Event()
+        def run():
+            while not stop.wait(self.LEASE.total_seconds() / 3):
+                try:
+                    if not self.renew():
+                        return
+                except Exception: # retried on the next beat, the lease only lapses if the database stays unavailable
+                    pass
+        thread = threading.Thread(target=run, name='idempotency-lease', daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+
+    def finish(self, body:str, status:int, headers:dict={}):
+        '''
+        Stores the response of the request's execution, to replay on retries.
+
+        :param body: The serialized response body
+        :param status: The response status code
+        :param headers: Response headers to replay
+        '''
+        self.status = self.DONE
+        self.response = { 'body': body, 'status': status, 'headers': headers }
+        idempotency_db.update_one(
+            { '_id': self._id, 'date_started': self.date_started },
+            { '$set': { 'status': self.DONE, 'response': self.response } }
+        )
+
+    def release(self):
+        '''
+        Drops a pending record whose execution failed, so the request can be retried.
+        '''
+        idempotency_db.delete_one({ '_id': self._id, 'status': self.PENDING, 'date_started': self.date_started })
@@ -0,0 +1,233 @@
+import os, threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Union
+from bson import ObjectId
+from pymongo import ReturnDocument
+
+from .. import jobs_db, job_chunks_db
+
+
+class JobModel():
+    '''
+    A background job, stored in the jobs queue.
+
+    Jobs are created by the api with `JobModel.create()` and executed by a worker, see `app.jobs`.
+    Running jobs save a checkpoint with every progress update, so a job whose worker died
+    is picked up again after its lease expires and resumed from its last checkpoint.
+    A job whose worker died `MAX_ATTEMPTS` times, e.g. running out of memory on it, fails instead.
+    '''
+    QUEUED  = 'QUEUED'
+    RUNNING = 'RUNNING'
+    DONE    = 'DONE'
+    FAILED  = 'FAILED'
+
+    KINDS = ('clear', 'import', 'export', 'reindex', 'valuation', 'snapshot', 'restore')
+    LEASE = timedelta(seconds=int(os.getenv('JOB_LEASE', 60)))
+    MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 3))
+    INPUT_CHUNK_SIZE = int(os.getenv('JOB_CHUNK_SIZE', 500))
+
+    def __init__(self, data:dict):
+        self._id = data['_id']
+        self.user_id = data['user_id']
+        self.kind = data['kind']
+        self.status = data['status']
+        self.params = data.get('params', {})
+        self.checkpoint = data.get('checkpoint')
+        self.progress = data.get('progress', { 'done': 0, 'total': None })
+        self.result = data.get('result')
+        self.error = data.get('error')
+        self.attempts = data.get('attempts', 0)
+        self.worker = data.get('worker')
+        self.date_created = data['date_created']
+        self.date_finished = data.get('date_finished')
+
+    @classmethod
+    def create(cls, user_id:Union[ObjectId, str], kind:str, params:dict={}, inputs:list=None):
+        '''
+        Adds a new job to the queue.
+
+        :param user_id: The user the job belongs to
+        :param kind: One of `JobModel.KINDS`
+        :param params: Job specific parameters
+        :param inputs: A list of items for the job to process, e.g. cards to import.
+                       Stored in chunks next to the job rather than in it, see `input_chunks()`
+        :raises ValueError: If `kind` is not a valid job kind
+        :return: A new `JobModel` instance
+        '''
+        if kind not in cls.KINDS:
+            raise ValueError(f'`{kind}` is not a valid job kind, should be one of {list(cls.KINDS)}')
+        data = {
+            '_id': ObjectId(),
+            'user_id': ObjectId(user_id),
+            'kind': kind,
+            'status': cls.QUEUED,
+            'params': params,
+            'progress': { 'done': 0, 'total': None },
+            'attempts': 0,
+            'date_created': datetime.now(),
+        }
+        if inputs is not None:
+            # stored before the job is queued, so a worker never claims a job with missing inputs
+            chunks = [ inputs[i:i + cls.INPUT_CHUNK_SIZE] for i in range(0, len(inputs), cls.INPUT_CHUNK_SIZE) ]
+            if chunks:
+                job_chunks_db.insert_many([
+                    { 'job_id': data['_id'], 'seq': seq, 'inputs': chunk, 'date_created': data['date_created'] }
+                    for seq, chunk in enumerate(chunks)
+                ])
+            data['params'] = { **params, 'inputs': len(inputs), 'input_chunks': len(chunks) }
+            data['progress']['total'] = len(inputs)
+        jobs_db.insert_one(data)
+        return JobModel(data)
+
+    def input_chunks(self, start:int=0):
+        '''
+        Loads the job's inputs, see `create()`, one chunk at a time.
+
+        :param start: Sequence number of the first chunk to load
+        :return: A generator of `(seq, items)`
+        '''
+        for seq in range(start, self.params.get('input_chunks', 0)):
+            data = job_chunks_db.find_one({ 'job_id': self._id, 'seq': seq })
+            if data is None:
+                raise KeyError(f'input chunk {seq} of job `{self._id}` is missing')
+            yield seq, data['inputs']
+
+    @classmethod
+    def get(cls, job_id:Union[ObjectId, str], user_id:Union[ObjectId, str]):
+        '''
+        Loads a job from the database.
+
+        :raises KeyError: If the job does not exist or belongs to another user
+        :raises bson.errors.InvalidId: when `job_id` is not a valid ObjectId
+        :return: A `JobModel` instance
+        '''
+        data = jobs_db.find_one({ '_id': ObjectId(job_id), 'user_id': ObjectId(user_id) })
+        if not data:
+            raise KeyError(f'No job with id `{job_id}` found')
+        return JobModel(data)
+
+    @classmethod
+    def claim(cls, worker:str):
+        '''
+        Atomically claims the oldest queued job, or a running job whose lease has expired.
+        Jobs claimed more than `MAX_ATTEMPTS` times are failed rather than run again.
+
+        :param worker: The claiming worker's name
+        :return: A `JobModel` instance, or `None` if there are no jobs to run
+        '''
+        while True:
+            now = datetime.now()
+            data = jobs_db.find_one_and_update(
+                {
+                    '$or': [
+                        { 'status': cls.QUEUED },
+                        { 'status': cls.RUNNING, 'heartbeat': { '$lt': now - cls.LEASE } },
+                    ]
+                },
+                {
+                    '$set': { 'status': cls.RUNNING, 'worker': worker, 'heartbeat': now },
+                    '$inc': { 'attempts': 1 },
+                },
+                sort = [ ('date_created', 1) ],
+                return_document = ReturnDocument.AFTER
+            )
+            if not data:
+                return None
+            job = JobModel(data)
+            if job.attempts <= cls.MAX_ATTEMPTS:
+                return job
+            job.fail(f'gave up after {cls.MAX_ATTEMPTS} attempts, its worker stopped each time')
+
+    def renew(self) -> bool:
+        '''
+        Renews the job's lease, while its handler is still running.
+
+        :return: `False` if the job was claimed by another worker or finished meanwhile
+        '''
+        res = jobs_db.update_one(
+            { '_id': self._id, 'status': self.RUNNING, 'worker': self.worker },
+            { '$set': { 'heartbeat': datetime.now() } }
+        )
+        return res.matched_count > 0
+
+    @contextmanager
+    def held(self):
+        '''
+        Renews the job's lease from a background thread every third of `LEASE` while the block executes,
+        so a single step running longer than `LEASE`, e.g. a snapshot or a restore, isn't claimed again by another worker.
+        '''
+        stop = threading.Event()
+        def run():
+            while not stop.wait(self.LEASE.total_seconds() / 3):
+                try:
+                    if not self.renew():
+                        return
+                except Exception: # retried on the next beat, the lease only lapses if the database stays unavailable
+                    pass
+        thread = threading.Thread(target=run, name='job-lease', daemon=True)
+        thread.start()
+        try:
+            yield self
+        finally:
+            stop.set()
+
+    def update_progress(self, done:int, total:int=None, checkpoint=None):
+        '''
+        Saves the job's progress and checkpoint, and renews its lease.
+
+        :param done: Number of processed items
+        :param total: Total number of items, if known
+        :param checkpoint: Anything needed to resume the job from this point
+        '''
+        self.progress = { 'done': done, 'total': total if total is not None else self.progress['total'] }
+        self.checkpoint = checkpoint
+        jobs_db.update_one(
+            { '_id': self._id },
+            { '$set': { 'progress': self.progress, 'checkpoint': checkpoint, 'heartbeat': datetime.now() } }
+        )
+
+    def finish(self, result=None):
+        '''
+        Marks the job as done.
+
+        :param result: The job's result
+        '''
+        self._set_final(self.DONE, result=result)
+
+    def fail(self, error:str):
+        '''
+        Marks the job as failed.
+
+        :param error: A description of the error
+        '''
+        self._set_final(self.FAILED, error=error)
+
+    def _set_final(self, status:str, **fields):
+        self.status = status
+        self.date_finished = datetime.now()
+        for k,v in fields.items():
+            setattr(self, k, v)
+        jobs_db.update_one(
+            { '_id': self._id },
+            { '$set': { 'status': status, 'date_finished': self.date_finished, **fields } }
+        )
+
+    def to_JSON(self):
+        '''
+        JSON representation of this `JobModel`, used for JSON serialization.
+        '''
+        res = {
+            '_id': str(self._id),
+            'kind': self.kind,
+            'status': self.status,
+            'progress': self.progress,
+            'date_created': self.date_created.replace(microsecond=0).isoformat(),
+        }
+        if self.status == self.DONE:
+            res['result'] = self.result
+        if self.status == self.FAILED:
+            res['error'] = self.error
+        if self.date_finished:
+            res['date_finished'] = self.date_finished.replace(microsecond=0).isoformat()
+        return res
@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from ..utils import DatabaseOperation
+from .. import journal_db
+
+
+class JournalModel():
+    '''
+    Per-user change journal of a collection.
+
+    Every write to the collection appends one entry per affected card, numbered with the collection version,
+    see `UserModel.bump_collection_version()`. Entries expire after `JOURNAL_TTL` seconds.
+    '''
+    CLEARED = 'CLEARED'
+    PENDING_TIMEOUT = timedelta(seconds=60) # a gap older than that is left by a write that failed midway
+
+    def __init__(self, parent):
+        self.parent = parent
+        self.user_id = self.parent.user_id
+
+    @classmethod
+    def to_entry(cls, card) -> dict:
+        '''
+        Compact journal entry for a saved `CardModel`, without `user_id` and `seq`.
+        '''
+        if card.operation == DatabaseOperation.DELETE or card.amount <= 0:
+            return { 'action': DatabaseOperation.DELETE.to_past_tense(), 'card_id': card._id }
+        return {
+            'action': card.operation.to_past_tense(),
+            'card_id': card._id,
+            'card': card.to_JSON(to_mongo=True, drop_cols=['_id', 'user_id']),
+        }
+
+    def append(self, first_seq:int, cards:list=[], cleared=False):
+        '''
+        Appends entries for the given cards to the journal, numbered from `first_seq`.
+
+        :param first_seq: Sequence number of the first entry
+        :param cards: List of saved `CardModel`s
+        :param cleared: If `True`, a single `CLEARED` entry is appended before the cards
+        '''
+        now = datetime.now()
+        entries = [{ 'action': self.CLEARED }] if cleared else []
+        entries += [ self.to_entry(card) for card in cards ]
+        if entries:
+            journal_db.insert_many([
+                {
+                    **entry,
+                    'user_id': self.user_id,
+                    'seq': first_seq + i,
+                    'date_created': now,
+                } for i, entry in enumerate(entries)
+            ], ordered=False)
+
+    def since(self, seq:int, limit:int=1000) -> Tuple[List[dict], bool, bool]:
+        '''
+        Retrieves journal entries newer than `seq`, in order.
+
+        The collection version is bumped before the matching entries are appended, see `CollectionModel.commit()`,
+        so concurrent writes may leave gaps for a moment. Only the entries up to the first gap are returned, with `has_more`,
+        the rest are retrieved once the gap is filled. A gap left for longer than `PENDING_TIMEOUT`, e.g. by a crashed writer,
+        is treated as lost.
+
+        :param seq: Last sequence number known to the client
+        :param limit: Max number of entries to return
+        :return: `(entries, full_resync, has_more)`, `full_resync` is `True` if the entries after `seq` expired or were lost
+        '''
+        version = self.parent.parent.collection_version
+        if seq == version:
+            return [], False, False
+        if seq < 0 or seq > version:
+            return [], True, False
+
+        entries = list(
+            journal_db
+                .find(
+                    { 'user_id': self.user_id, 'seq': { '$gt': seq } },
+                    { '_id': 0, 'user_id': 0 }
+                )
+                .sort('seq', 1)
+                .limit(limit)
+        )
+        expected = seq + 1
+        for entry in entries:
+            if entry['seq'] != expected:
+                break
+            expected += 1
+        found = entries[:expected - seq - 1]
+        next_created = entries[len(found)]['date_created'] if len(entries) > len(found) else None
+        for entry in entries:
+            del entry['date_created']
+        if found:
+            return found, False, found[-1]['seq'] < version
+
+        # the entry right after `seq` is missing, it either expired, is still being appended, or was lost
+        oldest = journal_db.find_one({ 'user_id': self.user_id }, { 'seq': 1 }, sort=[ ('seq', 1) ])
+        if oldest is not None and oldest['seq'] > expected:
+            return [], True, False
+        if next_created:
+            age = datetime.now() - next_created
+        else:
+            date_written = self.parent.parent.date_written # utc, see `UserModel.bump_collection_version()`
+            age = datetime.utcnow() - date_written if date_written else self.PENDING_TIMEOUT
+        if age >= self.PENDING_TIMEOUT:
+            return [], True, False
+        return [], False, True
@@ -0,0 +1,71 @@
+from typing import List, Union
+from bson import ObjectId
+
+from .. import cards_read_db, users_db
+from . import schema
+
+
+class OwnersModel():
+    '''
+    Lookup of public users owning given cards, used for finding trades.
+
+    Backed by a partial `(scryfall_id, user_id)` index on cards of public users,
+    cards carry a copy of their owner's `public` flag, see `UserModel.sync_public()`.
+    '''
+    MAX_BATCH = 100
+
+    @classmethod
+    def find(cls, scryfall_ids:List[str], page:int=1, per_page:int=20, exclude_user_id:Union[ObjectId, str]=None):
+        '''
+        Finds public users owning any of the given cards, using a single indexed query.
+        Results are grouped per card and user, with per card variant quantities.
+
+        :param scryfall_ids: List of Scryfall card ids, at most `MAX_BATCH`
+        :param page: Page number
+        :param per_page: Number of owners per page
+        :param exclude_user_id: A user to leave out of the results, usually the one asking
+        :raises ValueError: If too many cards are requested
+        :return: `(owners, has_more)`
+        '''
+        if len(scryfall_ids) > cls.MAX_BATCH:
+            raise ValueError(f'at most {cls.MAX_BATCH} cards can be looked up at once')
+
+        match = { 'public': True, 'scryfall_id': schema.scryfall_id_in(scryfall_ids) }
+        if exclude_user_id:
+            match['user_id'] = { '$ne': ObjectId(exclude_user_id) }
+
+        data = list(cards_read_db.aggregate([
+            { '$match': match },
+            {
+                '$group': {
+                    '_id': { 'scryfall_id': '$scryfall_id', 'user_id': '$user_id' },
+                    'amount': { '$sum': '$amount' },
+                    'cards': {
+                        '$push': {
+                            'v': '$v',
+                            'amount': '$amount',
+                            'flags': '$flags',
+                            'foil': '$foil',
+                            'condition': '$condition',
+                            'signed': '$signed',
+                            'altered': '$altered',
+                            'misprint': '$misprint',
+                        }
+                    },
+                }
+            },
+            { '$sort': { '_id.scryfall_id': 1, 'amount': -1, '_id.user_id': 1 } },
+            { '$skip': (page - 1) * per_page },
+            { '$limit': per_page + 1 },
+            { '$lookup': { 'from': users_db.name, 'localField': '_id.user_id', 'foreignField': '_id', 'as': 'user' } },
+        ]))
+
+        owners = [
+            {
+                'scryfall_id': schema.decode_scryfall_id(item['_id']['scryfall_id']),
+                'username': item['user'][0]['username'] if item['user'] else None,
+                'amount': item['amount'],
+                'cards': [ schema.decode(card) for card in item['cards'] ],
+            } for item in data[:per_page]
+        ]
+        return owners, len(data) > per_page
@@ -0,0 +1,95 @@
+'''
+Storage schema of card documents.
+
+v1 documents store `scryfall_id` as a string, `condition` by name and every flag as a separate boolean.
+v2 documents are marked with `v: 2` and store `scryfall_id` as a 16 byte binary UUID,
+`condition` by value and the flags packed into a single `flags` int.
+
+Models read both versions and always write v2, run `flask migrate-cards` to convert the remaining v1 documents.
+'''
+import uuid
+from typing import Iterable, Union
+from bson.binary import Binary, UUID_SUBTYPE
+
+from ..utils import CardCondition
+
+
+SCHEMA_VERSION = 2
+
+FLAGS = {
+    'foil':     1,
+    'signed':   2,
+    'altered':  4,
+    'misprint': 8,
+}
+
+
+def encode_scryfall_id(value:str) -> Union[Binary, str]:
+    '''
+    :return: `value` as a binary UUID, or as is if it isn't a valid UUID
+    '''
+    try:
+        return Binary(uuid.UUID(value).bytes, UUID_SUBTYPE)
+    except (TypeError, ValueError, AttributeError):
+        return value
+
+
+def decode_scryfall_id(value) -> str:
+    '''
+    :return: A `scryfall_id` as stored in either schema version, as a string
+    '''
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, bytes) and len(value) == 16: # `Binary` is a subclass of `bytes`
+        return str(uuid.UUID(bytes=bytes(value)))
+    return value
+
+
+def scryfall_id_in(scryfall_ids:Iterable[str]) -> dict:
+    '''
+    Query filter matching any of the given ids, in either schema version.
+    '''
+    scryfall_ids = list(scryfall_ids)
+    encoded = [ encode_scryfall_id(i) for i in scryfall_ids ]
+    return { '$in': scryfall_ids + [ i for i in encoded if isinstance(i, Binary) ] }
+
+
+def pack_flags(**flags) -> int:
+    return sum( bit for k, bit in FLAGS.items() if flags.get(k) )
+
+
+def encode(doc:dict) -> dict:
+    '''
+    Converts the schema dependent fields of a card document to v2.
+
+    :param doc: A card document, in either schema version
+    :return: A dictionary of v2 fields, to `$set` along with unsetting `FLAGS`
+    '''
+    if doc.get('v') == SCHEMA_VERSION:
+        return { k: doc[k] for k in ('v', 'scryfall_id', 'condition', 'flags') if k in doc }
+    condition = CardCondition.parse(doc.get('condition'))
+    return {
+        'v': SCHEMA_VERSION,
+        'scryfall_id': encode_scryfall_id(doc.get('scryfall_id')),
+        'condition': condition.value if condition else CardCondition.NM.value,
+        'flags': pack_flags(**doc),
+    }
+
+
+def decode(doc:dict) -> dict:
+    '''
+    Converts a card document of either schema version to the v1 field layout used by the models.
+
+    :param doc: A card document, or a partial one
+    :return: A new dictionary
+    '''
+    if doc.get('v') != SCHEMA_VERSION:
+        return doc
+    res = { k:v for k,v in doc.items() if k not in ('v', 'flags') }
+    if 'scryfall_id' in doc:
+        res['scryfall_id'] = decode_scryfall_id(doc['scryfall_id'])
+    if 'condition' in doc:
+        res['condition'] = CardCondition(doc['condition']).name
+    if 'flags' in doc:
+        res.update({ k: bool(doc['flags'] & bit) for k, bit in FLAGS.items() })
+    return res
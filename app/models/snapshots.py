@@ -0,0 +1,299 @@
+import os, zlib
+from datetime import datetime
+from typing import Dict, Iterator, List, Tuple, Union
+import bson
+from bson import Binary, ObjectId
+from pymongo import DeleteOne, ReplaceOne
+
+from ..utils import DatabaseOperation
+from .. import cards_db, journal_db, jobs_db, snapshots_db, snapshot_chunks_db
+from . import CardModel, JobModel, JournalModel
+
+
+class SnapshotModel():
+    '''
+    A point-in-time copy of a user's collection, to browse or restore it.
+
+    A snapshot stores a full copy of the collection, its base, as zlib compressed chunks of cards.
+    Later states are not copied again, they are reconstructed by replaying the collection's journal on top of the base,
+    see `JournalModel`. So a snapshot reproduces any collection version from its `consistent_version` up to the current one,
+    as long as the journal entries in between haven't expired.
+
+    The base is read while the app keeps serving, so writes made meanwhile may or may not be part of it.
+    Replaying every journal entry after the version read before the base makes up for that,
+    reconstructions past `consistent_version` are exact.
+    '''
+    CHUNK_SIZE = int(os.getenv('SNAPSHOT_CHUNK_SIZE', 2000)) # cards per compressed chunk
+    MAX_PER_USER = int(os.getenv('SNAPSHOT_MAX_PER_USER', 10)) # older snapshots are dropped
+    COMPRESSION_LEVEL = 6
+
+    def __init__(self, data:dict):
+        self._id = data['_id']
+        self.user_id = data['user_id']
+        self.version = data['version']
+        self.consistent_version = data['consistent_version']
+        self.doc_count = data['doc_count']
+        self.chunks = data['chunks']
+        self.size = data['size']
+        self.reason = data['reason']
+        self.date_created = data['date_created']
+
+    @classmethod
+    def create(cls, user, reason:str='manual'):
+        '''
+        Takes a snapshot of a user's collection.
+        The snapshot is listed once all its chunks were written, an interrupted snapshot leaves only chunks behind, which expire.
+
+        :param user: The `UserModel` whose collection to copy
+        :param reason: Why the snapshot was taken, e.g. `manual`, `scheduled` or the job it precedes
+        :return: A new `SnapshotModel` instance
+        '''
+        snapshot_id = ObjectId()
+        now = datetime.now()
+        version = user.refresh_collection_version()
+        seq, doc_count, size, last_id = 0, 0, 0, None
+
+        while True:
+            query = { 'user_id': user.user_id }
+            if last_id:
+                query['_id'] = { '$gt': last_id }
+            data = list(cards_db.find(query).sort('_id', 1).limit(cls.CHUNK_SIZE))
+            if not data:
+                break
+            cards = [ CardModel.from_mongo(user.collection, item).to_JSON(to_mongo=True, drop_cols=['user_id']) for item in data ]
+            blob = zlib.compress(bson.encode({ 'cards': cards }), cls.COMPRESSION_LEVEL)
+            snapshot_chunks_db.insert_one({
+                'snapshot_id': snapshot_id,
+                'seq': seq,
+                'data': Binary(blob),
+                'date_created': now,
+            })
+            last_id, seq, doc_count, size = data[-1]['_id'], seq + 1, doc_count + len(data), size + len(blob)
+
+        data = {
+            '_id': snapshot_id,
+            'user_id': user.user_id,
+            'version': version,
+            'consistent_version': user.refresh_collection_version(),
+            'doc_count': doc_count,
+            'chunks': seq,
+            'size': size,
+            'reason': reason,
+            'date_created': now,
+        }
+        snapshots_db.insert_one(data)
+        cls._prune(user.user_id)
+        return SnapshotModel(data)
+
+    @classmethod
+    def _prune(cls, user_id:ObjectId):
+        '''
+        Drops the user's snapshots beyond the newest `MAX_PER_USER`, except ones a pending `restore` job refers to.
+        '''
+        pinned = {
+            ObjectId(item['params']['snapshot_id']) for item in jobs_db.find(
+                { 'user_id': user_id, 'kind': 'restore', 'status': { '$in': [ JobModel.QUEUED, JobModel.RUNNING ] } },
+                { 'params.snapshot_id': 1 }
+            )
+        }
+        old = [
+            item['_id'] for item in snapshots_db
+                .find({ 'user_id': user_id }, { '_id': 1 })
+                .sort('date_created', -1)
+                .skip(cls.MAX_PER_USER)
+            if item['_id'] not in pinned
+        ]
+        if old:
+            snapshots_db.delete_many({ '_id': { '$in': old } })
+            snapshot_chunks_db.delete_many({ 'snapshot_id': { '$in': old } })
+
+    @classmethod
+    def get(cls, snapshot_id:Union[ObjectId, str], user_id:Union[ObjectId, str]):
+        '''
+        Loads a snapshot from the database.
+
+        :raises KeyError: If the snapshot does not exist or belongs to another user
+        :raises bson.errors.InvalidId: when `snapshot_id` is not a valid ObjectId
+        :return: A `SnapshotModel` instance
+        '''
+        data = snapshots_db.find_one({ '_id': ObjectId(snapshot_id), 'user_id': ObjectId(user_id) })
+        if not data:
+            raise KeyError(f'No snapshot with id `{snapshot_id}` found')
+        return SnapshotModel(data)
+
+    @classmethod
+    def find(cls, user_id:Union[ObjectId, str]):
+        '''
+        :return: The user's snapshots, newest first
+        '''
+        return [ SnapshotModel(data) for data in snapshots_db.find({ 'user_id': ObjectId(user_id) }).sort('date_created', -1) ]
+
+    @classmethod
+    def latest(cls, user_id:Union[ObjectId, str]):
+        '''
+        :return: The user's newest snapshot, or `None`
+        '''
+        data = snapshots_db.find_one({ 'user_id': ObjectId(user_id) }, sort=[ ('date_created', -1) ])
+        return SnapshotModel(data) if data else None
+
+    def check(self):
+        '''
+        Checks that all of the snapshot's chunks are still stored.
+
+        :raises ValueError: If any chunk is missing, e.g. the snapshot is being pruned or expired
+        '''
+        found = snapshot_chunks_db.count_documents({ 'snapshot_id': self._id })
+        if found != self.chunks:
+            raise ValueError(f'snapshot is incomplete, {found} of {self.chunks} chunks found')
+
+    def base(self) -> Iterator[dict]:
+        '''
+        Streams the snapshot's base, decompressing one chunk at a time.
+
+        :raises ValueError: If chunks went missing while streaming, see `check()`
+        :return: A generator of cards, as `CardModel.to_JSON(to_mongo=True)` without `user_id`, sorted by `_id`
+        '''
+        seq, doc_count = 0, 0
+        for chunk in snapshot_chunks_db.find({ 'snapshot_id': self._id }).sort('seq', 1):
+            if chunk['seq'] != seq:
+                break
+            cards = bson.decode(zlib.decompress(chunk['data']))['cards']
+            seq, doc_count = seq + 1, doc_count + len(cards)
+            yield from cards
+        if (seq, doc_count) != (self.chunks, self.doc_count):
+            raise ValueError(f'snapshot is incomplete, {doc_count} of {self.doc_count} cards found')
+
+    def changes(self, version:int) -> Tuple[Dict[ObjectId, dict], bool]:
+        '''
+        Collapses the journal entries between the snapshot and `version` into the last state of each changed card.
+
+        :param version: The collection version to reach
+        :raises ValueError: If `version` is out of the snapshot's range, or the journal entries in between expired
+        :return: `(changes, cleared)`, `changes` maps card ids to their journal `card`, `None` for deleted cards,
+                 `cleared` is `True` if the base was cleared on the way
+        '''
+        if version < self.consistent_version:
+            raise ValueError(f'version should be at least {self.consistent_version}, the snapshot\'s consistent version')
+        changes, cleared = {}, False
+        if version == self.version:
+            return changes, cleared
+
+        entries = journal_db.find(
+            { 'user_id': self.user_id, 'seq': { '$gt': self.version, '$lte': version } },
+            { '_id': 0, 'seq': 1, 'action': 1, 'card_id': 1, 'card': 1 }
+        ).sort('seq', 1)
+        expected = self.version + 1
+        for entry in entries:
+            if entry['seq'] != expected:
+                break
+            expected += 1
+            if entry['action'] == JournalModel.CLEARED:
+                changes, cleared = {}, True
+            else:
+                changes[entry['card_id']] = entry.get('card') # no `card` for deleted ones
+        if expected != version + 1:
+            raise ValueError(f'version {version} can no longer be reconstructed from this snapshot, the changes leading to it expired or are yet to be made')
+        return changes, cleared
+
+    def reconstruct(self, version:int=None) -> Iterator[dict]:
+        '''
+        Reconstructs the collection as it was at a given version.
+        Validates `version` eagerly, only the cards themselves are streamed.
+
+        :param version: The collection version, defaults to the snapshot's `consistent_version`
+        :raises ValueError: See `changes()` and `check()`
+        :return: A generator of cards, same as `base()`, changed cards come last
+        '''
+        changes, cleared = self.changes(self.consistent_version if version is None else version)
+        if not cleared:
+            self.check()
+
+        def generate():
+            if not cleared:
+                for card in self.base():
+                    if card['_id'] not in changes:
+                        yield card
+            for card_id, card in changes.items():
+                if card is not None:
+                    yield { '_id': card_id, **card }
+        return generate()
+
+    def restore(self, collection, version:int=None, batch_size:int=500) -> Iterator[Dict[str, int]]:
+        '''
+        Restores a collection to a reconstructed version, writing only the cards that differ from it, using bulk writes.
+        Each batch is recorded with `CollectionModel.commit()`, so restoring shows up as ordinary changes in the journal.
+        A restore interrupted mid-way can simply be run again.
+        The whole target version is read before anything is written, so an incomplete snapshot fails without touching the collection.
+
+        :param collection: The user's `CollectionModel`
+        :param version: The collection version to restore, see `reconstruct()`
+        :param batch_size: Max number of cards written per bulk write
+        :raises ValueError: See `changes()` and `check()`
+        :return: A generator of the running `{created, updated, deleted}` counts, one per batch
+        '''
+        target = { card['_id']: card for card in self.reconstruct(version) }
+        public = bool(collection.parent.public)
+        counts = { 'created': 0, 'updated': 0, 'deleted': 0 }
+        requests:List = []
+        cards:List[CardModel] = []
+
+        def flush():
+            if requests:
+                cards_db.bulk_write(requests, ordered=False)
+                collection.commit(cards)
+                requests.clear()
+                cards.clear()
+            return dict(counts)
+
+        def write(card:CardModel, stored:CardModel=None):
+            card.stored = stored.stored if stored else None
+            requests.append(ReplaceOne(
+                { '_id': card._id, 'user_id': card.user_id },
+                { **card.to_mongo(), 'public': public },
+                upsert = True
+            ))
+            cards.append(card)
+
+        last_id = None
+        while True:
+            query = { 'user_id': collection.user_id }
+            if last_id:
+                query['_id'] = { '$gt': last_id }
+            data = list(cards_db.find(query).sort('_id', 1).limit(batch_size))
+            if not data:
+                break
+            last_id = data[-1]['_id']
+            for item in data:
+                current = CardModel.from_mongo(collection, item)
+                wanted = target.pop(current._id, None)
+                if wanted is None:
+                    current.operation = DatabaseOperation.DELETE
+                    requests.append(DeleteOne({ '_id': current._id, 'user_id': current.user_id }))
+                    cards.append(current)
+                    counts['deleted'] += 1
+                elif wanted != current.to_JSON(to_mongo=True, drop_cols=['user_id']):
+                    write(CardModel(parent=collection, user_id=collection.user_id, operation=DatabaseOperation.UPDATE, **wanted), current)
+                    counts['updated'] += 1
+                if len(requests) >= batch_size:
+                    yield flush()
+
+        for wanted in target.values():
+            write(CardModel(parent=collection, user_id=collection.user_id, operation=DatabaseOperation.CREATE, **wanted))
+            counts['created'] += 1
+            if len(requests) >= batch_size:
+                yield flush()
+        yield flush()
+
+    def to_JSON(self):
+        '''
+        JSON representation of this `SnapshotModel`, used for JSON serialization.
+        '''
+        return {
+            '_id': str(self._id),
+            'version': self.version,
+            'consistent_version': self.consistent_version,
+            'doc_count': self.doc_count,
+            'size': self.size,
+            'reason': self.reason,
+            'date_created': self.date_created.replace(microsecond=0).isoformat(),
+        }
@@ -2,10 +2,11 @@ import re
 from datetime import datetime
 from typing import Union
 from bson import ObjectId
+from pymongo import ReturnDocument
 from flask_jwt_extended import create_access_token
 
 from ..utils import UserDoesNotExist, UserAlreadyExists
-from .. import bcrypt, users_db, cards_db
+from .. import hasher, response_cache, users_db, users_read_db, cards_db
 from . import CollectionModel
 
 
@@ -29,20 +30,25 @@ def exist_required(invert=False):
 
 
 class UserModel():
-    def __init__(self, user_id:Union[ObjectId, str]=None, username:str=None, public:bool=False, **kwargs):
+    COUNTERS = ('doc_count', 'card_count', 'unique_count')
+
+    def __init__(self, user_id:Union[ObjectId, str]=None, username:str=None, public:bool=False, secondary=False, **kwargs):
         '''
         Intitates a user.
         If the user doesnt exists, `bool(self)` will be set to False and any subsequent operation will raise an exception.
+        Pass `secondary=True` for read only lookups of other users, which may be served by a secondary.
+        Such lookups may be up to `MONGO_MAX_STALENESS` seconds old, don't use them to check the `public` flag.
         '''
         if not (bool(user_id) != bool(username)): # not xor
             raise ValueError('Please provide either username or user_id')
         
-        user = self.exists(user_id, username)
+        user = self.exists(user_id, username, secondary)
         if not user:
             self.user_id = user_id
             self.username = username
             self.public = public
             self.date_created = None
+            self.date_written = None
             self.exists = False
         else:
             self.user_id = user['_id']
@@ -50,30 +56,108 @@ class UserModel():
             self.password = user['password']
             self.public = user['public']
             self.date_created = user['date_created']
+            self.date_written = user.get('date_written') # last write to the collection, see `CollectionModel.reads`
+            self.collection_version = user.get('collection_version', 0)
+            self.counters = { k: user.get(k) for k in self.COUNTERS }
             self.collection = CollectionModel(parent=self)
 
     def __bool__(self):
         return bool(self.exists)
     
+    @exist_required()
     def doc_count(self):
         '''
-        Retrieves the number of document cards in the collection from the database.
+        Retrieves the number of document cards in the collection, as maintained on the user document.
+        Users without counters yet get them on their next write, see `CollectionModel.commit()`, meanwhile the cards are counted.
         
         :return: Number of document cards in the collection
         '''
-        return cards_db.count_documents({ 'user_id': self.user_id })
+        if self.counters['doc_count'] is None:
+            return self.collection.reads.count_documents({ 'user_id': self.user_id })
+        return self.counters['doc_count']
+
+    @exist_required()
+    def set_counters(self, counters:dict):
+        '''
+        Overwrites the user's collection counters.
+
+        :param counters: A dictionary of `{doc_count, card_count, unique_count}`
+        :raises `UserDoesNotExist(ValueError)`: If the user does not exist
+        '''
+        users_db.update_one(
+            { '_id': self.user_id },
+            { '$set': { k: counters[k] for k in self.COUNTERS } }
+        )
+        self.counters = { k: counters[k] for k in self.COUNTERS }
+
+    @exist_required()
+    def bump_collection_version(self, amount:int=1, counters:dict={}, reset_counters=False):
+        '''
+        Atomically increments the user's collection version, alongside the collection counters.
+        Should be called after every write to the user's collection.
+        The versions in `(old_version, new_version]` are reserved for the caller's journal entries.
+
+        :param amount: Number of changes written, defaults to `1`
+        :param counters: Increments for the `{doc_count, card_count, unique_count}` counters
+        :param reset_counters: If `True`, the counters are set to `0` instead
+        :raises `UserDoesNotExist(ValueError)`: If the user does not exist
+        :return: The new collection version
+        '''
+        update = { '$inc': { 'collection_version': amount }, '$set': { 'date_written': datetime.utcnow() } }
+        if reset_counters:
+            update['$set'].update({ k: 0 for k in self.COUNTERS })
+        elif self.counters['doc_count'] is not None:
+            # counters are left missing until reconciled
+            update['$inc'].update({ k:v for k,v in counters.items() if v })
+
+        user = users_db.find_one_and_update(
+            { '_id': self.user_id },
+            update,
+            projection = { 'collection_version': 1, 'date_written': 1, **{ k: 1 for k in self.COUNTERS } },
+            return_document = ReturnDocument.AFTER
+        )
+        self.collection_version = user['collection_version']
+        self.date_written = user['date_written']
+        self.counters = { k: user.get(k) for k in self.COUNTERS }
+        return self.collection_version
+
+    @exist_required()
+    def refresh_collection_version(self):
+        '''
+        Reloads the user's collection version, e.g. to notice writes made by other processes.
+
+        :raises `UserDoesNotExist(ValueError)`: If the user does not exist
+        :return: The collection version
+        '''
+        user = users_db.find_one({ '_id': self.user_id }, { 'collection_version': 1 }) or {}
+        self.collection_version = user.get('collection_version', 0)
+        return self.collection_version
 
     @exist_required()
     def check_password_hash(self, password):
         '''
         Tests a password hash against a candidate password. The candidate password is first hashed and then subsequently compared in constant time to the existing hash. This will either return `True` or `False`.
+        On success, a hash made with an outdated work factor is replaced in the background.
 
-        :param pw_hash: The hash to be compared against
         :param password: The password to compare
         :raises `UserDoesNotExist(ValueError)`: If the user does not exist
-        :return: An access token for the user
+        :raises `ServerBusy(RuntimeError)`: If too many password operations are in progress
+        :return: `True` if the password matches
         '''
-        return bcrypt.check_password_hash(self.password, password)
+        valid = hasher.check(self.password, password)
+        if valid and hasher.needs_rehash(self.password):
+            try:
+                hasher.hash_async(password).add_done_callback(self._save_rehash(self.password))
+            except Exception:
+                pass # retried on next login
+        return valid
+
+    def _save_rehash(self, old_hash:str):
+        def callback(future):
+            if not future.exception():
+                # only replace the hash that was checked, the password may have changed meanwhile
+                users_db.update_one({ '_id': self.user_id, 'password': old_hash }, { '$set': { 'password': future.result() } })
+        return callback
 
     @exist_required()
     def create_access_token(self):
@@ -90,21 +174,23 @@ class UserModel():
         return access_token
 
     @classmethod
-    def exists(cls, user_id:Union[ObjectId, str]=None, username:str=None):
+    def exists(cls, user_id:Union[ObjectId, str]=None, username:str=None, secondary=False):
         '''
         Checks if a user exists in the database
         
         :param user_id: The user's id
         :param username: The user's username
+        :param secondary: If `True`, the lookup may be served by a secondary
         :return: `mongo.find_one()` results
         '''
         if not (bool(user_id) != bool(username)): # not xor
             raise ValueError('Please provide either username or user_id')
 
+        db = users_read_db if secondary else users_db
         if user_id:
-            return users_db.find_one({ '_id': ObjectId(user_id) })
+            return db.find_one({ '_id': ObjectId(user_id) })
         # elif username:
-        return users_db.find_one({ 'username': { '$regex': f'^{username}$', '$options': 'i' } }) # case insensitive exact match
+        return db.find_one({ 'username': { '$regex': f'^{username}$', '$options': 'i' } }) # case insensitive exact match
 
     @exist_required(invert=True)
     def create(self, password):
@@ -118,9 +204,10 @@ class UserModel():
         '''
         user_id = users_db.insert_one({
             'username': self.username,
-            'password': bcrypt.generate_password_hash(password).decode('utf-8'),
+            'password': hasher.hash(password),
             'public': self.public if self.public else False,
             'date_created': datetime.now(),
+            **{ k: 0 for k in self.COUNTERS },
         }).inserted_id
         
         return UserModel(user_id=str(user_id))
@@ -149,9 +236,11 @@ class UserModel():
         :param kwargs: Any `UserModel` properties to update, except [`user_id`, `date_created`]
         :raises UserDoesNotExist: If the user does not exist
         :raises UserAlreadyExists: If the username is already taken
+        :raises ServerBusy: If too many password operations are in progress, nothing is saved
         :return: A Dictionary containing operation info
         '''
         res = []
+        old_username = self.username
         
         if 'username' in kwargs:
             if kwargs['username'] != self.username:
@@ -165,8 +254,9 @@ class UserModel():
             
         
         if 'password' in kwargs:
-            if bcrypt.check_password_hash(self.password, kwargs['password']) == False:
-                self.password = bcrypt.generate_password_hash(kwargs['password']).decode('utf-8')
+            # only hashed once known to differ, a failed check leaves no hashing task behind
+            if hasher.check(self.password, kwargs['password']) == False:
+                self.password = hasher.hash(kwargs['password'])
                 res += [{ 'field': 'password', 'action': 'UPDATED' }]
             else:
                 res += [{ 'field': 'password', 'action': 'NOP' }]
@@ -184,9 +274,28 @@ class UserModel():
                 {
                     '$set': {
                         **self.to_JSON(to_mongo=True, include_collection=False, drop_cols=['user_id']),
+                        'password': self.password,
                     }
                 }
             )
+        if any( item['field'] == 'public' and item['action'] == 'UPDATED' for item in res ):
+            self.sync_public()
+        if kwargs:
+            response_cache.invalidate(old_username.lower())
+            response_cache.invalidate(self.username.lower())
         
         return res
+
+    @exist_required()
+    def sync_public(self):
+        '''
+        Copies the user's `public` flag onto all of the user's cards, which is what the public owners index covers.
+
+        :raises UserDoesNotExist: If the user does not exist
+        :return: Number of modified cards
+        '''
+        return cards_db.update_many(
+            { 'user_id': self.user_id, 'public': { '$ne': self.public } },
+            { '$set': { 'public': self.public } }
+        ).modified_count
     
\ No newline at end of file
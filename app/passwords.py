@@ -0,0 +1,151 @@
+import threading, multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+import bcrypt
+
+from .utils import ServerBusy
+
+
+def _hashpw(password:bytes, rounds:int) -> bytes:
+    return bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+
+def _checkpw(password:bytes, pw_hash:bytes) -> bool:
+    return bcrypt.checkpw(password, pw_hash)
+
+
+class PasswordHasher():
+    '''
+    Hashes and verifies passwords with bcrypt, in a bounded pool of worker processes.
+
+    Keeps slow password hashing from occupying the serving threads, and caps how much CPU
+    a burst of logins can take from other requests. Requests beyond `max_pending` fail fast with `ServerBusy`,
+    as do requests not answered within `timeout` seconds or whose worker process died.
+    The pool is created lazily, like the database client it must be recreated after forking, see `gunicorn.conf.py`.
+    With `workers=0` hashing runs inline, e.g. for local development.
+    '''
+    def __init__(self, rounds:int=12, workers:int=0, max_pending:int=64, timeout:float=30):
+        self.init(rounds, workers, max_pending, timeout)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def init(self, rounds:int=12, workers:int=0, max_pending:int=64, timeout:float=30):
+        '''
+        Sets the hashing options, closing the current pool if any.
+
+        :param rounds: The bcrypt work factor (log2 of the number of rounds) for new hashes
+        :param workers: Number of worker processes, `0` hashes inline
+        :param max_pending: Max number of hashing tasks queued or running at once
+        :param timeout: Seconds to wait for a result
+        '''
+        if getattr(self, '_pool', None):
+            self.close()
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._pending = threading.BoundedSemaphore(max_pending)
+
+    def _submit(self, func, *args) -> Future:
+        if not self.workers:
+            future = Future()
+            future.set_result(func(*args))
+            return future
+
+        if not self._pending.acquire(blocking=False):
+            raise ServerBusy('too many password operations in progress')
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        try:
+            future = self._pool.submit(func, *args)
+        except BrokenProcessPool:
+            self._pending.release()
+            self.close()
+            raise ServerBusy('password hashing pool restarting')
+        except Exception:
+            self._pending.release()
+            raise
+        future.add_done_callback(lambda _: self._pending.release())
+        return future
+
+    def _result(self, future:Future):
+        try:
+            return future.result(self.timeout)
+        except FutureTimeout:
+            future.cancel() # frees its slot if it didn't start yet
+            raise ServerBusy('password operation timed out')
+        except BrokenProcessPool:
+            # a worker process died, e.g. killed for its memory, start a new pool on next use
+            self.close()
+            raise ServerBusy('password hashing pool restarting')
+
+    def hash_async(self, password:str) -> Future:
+        '''
+        :return: A `Future` of the password's hash, as a string
+        '''
+        future = self._submit(_hashpw, password.encode('utf-8'), self.rounds)
+        res = Future()
+        def done(f):
+            if f.cancelled() or res.cancelled():
+                return
+            if f.exception():
+                res.set_exception(f.exception())
+            else:
+                res.set_result(f.result().decode('utf-8'))
+        future.add_done_callback(done)
+        res.add_done_callback(lambda r: r.cancelled() and future.cancel())
+        return res
+
+    def check_async(self, pw_hash:str, password:str) -> Future:
+        '''
+        :return: A `Future` of whether the password matches the hash
+        '''
+        return self._submit(_checkpw, password.encode('utf-8'), pw_hash.encode('utf-8'))
+
+    def hash(self, password:str) -> str:
+        '''
+        Hashes a password using the current work factor.
+
+        :raises ServerBusy: If too many password operations are in progress, or the result didn't come in time
+        :return: The password's hash
+        '''
+        return self._result(self.hash_async(password))
+
+    def check(self, pw_hash:str, password:str) -> bool:
+        '''
+        Tests a password against a hash, in constant time.
+
+        :raises ServerBusy: If too many password operations are in progress, or the result didn't come in time
+        :return: `True` if the password matches
+        '''
+        return self._result(self.check_async(pw_hash, password))
+
+    def needs_rehash(self, pw_hash:str) -> bool:
+        '''
+        :return: `True` if the hash was made with a work factor other than the current one
+        '''
+        try:
+            return int(pw_hash.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+
+    def close(self):
+        '''
+        Shuts down this process' pool, a new one will be created on next use.
+        Waits for the pool's manager thread to exit, under `gevent` it is a greenlet that a fork
+        right after would copy into the child, where it fails on the parent's processes.
+        '''
+        pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def reset(self):
+        '''
+        Drops a pool inherited from a parent process without using it.
+        Should be called right after forking.
+        '''
+        self._pool = None
+        self._lock = threading.Lock()
+        self._pending = threading.BoundedSemaphore(self.max_pending)
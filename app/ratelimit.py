@@ -0,0 +1,183 @@
+import math, threading, time
+from datetime import datetime, timedelta
+from functools import wraps
+from typing import Dict, Tuple
+from flask import Flask, Response, abort, g, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+from pymongo import ReturnDocument
+
+from .database import CircuitBreaker
+from .utils import DatabaseUnavailable
+
+
+class MemoryBackend():
+    '''
+    Token buckets held by the current process, a local stand-in for `MongoBackend`.
+    Limits aren't shared across server processes.
+    '''
+    def __init__(self):
+        self._buckets:Dict[str, Tuple[float, float]] = {} # key -> (tokens, timestamp)
+        self._lock = threading.Lock()
+
+    def take(self, key:str, capacity:int, period:float, cost:int=1) -> Tuple[bool, float]:
+        '''
+        Refills a bucket by the time passed since its last use, then takes `cost` tokens from it if it holds enough.
+
+        :param key: The bucket's key
+        :param capacity: Max number of tokens, refilled over `period` seconds
+        :param period: Seconds for an empty bucket to refill
+        :param cost: Number of tokens to take
+        :return: `(allowed, tokens)`, the tokens left in the bucket
+        '''
+        now = time.monotonic()
+        with self._lock:
+            tokens, ts = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - ts) * capacity / period)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > 100_000:
+                self._prune()
+        return allowed, tokens
+
+    def _prune(self):
+        # full buckets carry no state, drop the oldest half
+        for key, _ in sorted(self._buckets.items(), key=lambda item: item[1][1])[:len(self._buckets) // 2]:
+            del self._buckets[key]
+
+
+class MongoBackend():
+    '''
+    Token buckets shared across server processes, each update is a single atomic upsert.
+    Buckets expire once idle long enough to be full again, using a TTL index on `expires`.
+    The collection should bypass `Mongo.guard()`, the limiter's own timeouts must not trip the circuit breaker.
+    '''
+    MAX_TIME_MS = 200 # the limiter fails open rather than slowing requests down
+
+    def __init__(self, collection, breaker:CircuitBreaker=None):
+        self.collection = collection
+        self.breaker = breaker
+
+    def take(self, key:str, capacity:int, period:float, cost:int=1) -> Tuple[bool, float]:
+        '''
+        See `MemoryBackend.take()`.
+
+        :raises DatabaseUnavailable: If the circuit breaker is open, without waiting on the database
+        '''
+        if self.breaker is not None and self.breaker.is_open:
+            raise DatabaseUnavailable(retry_after=self.breaker.retry_after())
+        now = time.time()
+        refilled = {
+            '$min': [
+                capacity,
+                { '$add': [
+                    { '$ifNull': [ '$tokens', capacity ] },
+                    { '$multiply': [ { '$subtract': [ now, { '$ifNull': [ '$ts', now ] } ] }, capacity / period ] },
+                ] },
+            ]
+        }
+        data = self.collection.find_one_and_update(
+            { '_id': key },
+            [ # an update pipeline, so the refill is computed by the server from the stored state
+                { '$set': { 'tokens': refilled, 'ts': now } },
+                { '$set': {
+                    'allowed': { '$gte': [ '$tokens', cost ] },
+                    'tokens': { '$cond': [ { '$gte': [ '$tokens', cost ] }, { '$subtract': [ '$tokens', cost ] }, '$tokens' ] },
+                    'expires': datetime.utcnow() + timedelta(seconds=period),
+                } },
+            ],
+            projection = { '_id': 0, 'allowed': 1, 'tokens': 1 },
+            upsert = True,
+            maxTimeMS = self.MAX_TIME_MS,
+            return_document = ReturnDocument.AFTER
+        )
+        return data['allowed'], data['tokens']
+
+
+class RateLimiter():
+    '''
+    Token bucket rate limiting, per user and limit class.
+    Requests are keyed by JWT identity, or by client address for anonymous ones.
+
+    Each limit class allows bursts of `capacity` requests, refilled evenly over `period` seconds, see `RATELIMIT_LIMITS`.
+    Responses carry `RateLimit-Limit`, `RateLimit-Remaining` and `RateLimit-Reset` headers,
+    and requests over the limit get a `429 Too Many Requests` response with a `Retry-After` header.
+    The limiter fails open, requests are let through if the backend is unavailable.
+    '''
+    def __init__(self, app:Flask=None):
+        self.enabled = False
+        self.limits:Dict[str, Tuple[int, float]] = {}
+        self.backend = MemoryBackend()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app:Flask):
+        self.enabled = app.config['RATELIMIT']
+        self.limits = app.config['RATELIMIT_LIMITS']
+        if app.config['RATELIMIT_BACKEND'] == 'mongo':
+            from . import mongo, ratelimits_db
+            self.backend = MongoBackend(ratelimits_db, mongo.breaker)
+        else:
+            self.backend = MemoryBackend()
+        app.after_request(self.after_request)
+
+    def key(self, name:str) -> str:
+        try:
+            identity = get_jwt_identity()
+        except RuntimeError: # not wrapped by `jwt_required`
+            identity = None
+        if identity:
+            return f'{name}:u:{identity[0]}'
+        return f'{name}:ip:{request.remote_addr}' # the client's, as seen by our outermost proxy, see `PROXY_COUNT`
+
+    def hit(self, name:str, cost:int=1):
+        '''
+        Takes a token from the current request's bucket for a limit class.
+
+        :param name: The limit class, one of `RATELIMIT_LIMITS`
+        :param cost: Number of tokens to take
+        :return: `(allowed, capacity, period, tokens)`
+        '''
+        capacity, period = self.limits[name]
+        try:
+            allowed, tokens = self.backend.take(self.key(name), capacity, period, cost)
+        except Exception:
+            return True, capacity, period, capacity
+        return allowed, capacity, period, tokens
+
+    def limit(self, name:str, cost:int=1):
+        '''
+        A wrapper for rate limiting an endpoint.
+        Should be wrapped by `jwt_required`, so requests are keyed by identity.
+
+        :param name: The limit class, one of `RATELIMIT_LIMITS`
+        :param cost: Number of tokens a request takes
+        '''
+        def outer(func):
+            @wraps(func)
+            def inner(*args, **kwargs):
+                if not self.enabled:
+                    return func(*args, **kwargs)
+                allowed, capacity, period, tokens = self.hit(name, cost)
+                rate = capacity / period
+                g.rate_limit = {
+                    'RateLimit-Limit': str(capacity),
+                    'RateLimit-Remaining': str(int(tokens)),
+                    'RateLimit-Reset': str(math.ceil((capacity - tokens) / rate)), # until the bucket is full again
+                    'RateLimit-Policy': f'{capacity};w={int(period)};burst={capacity}',
+                }
+                if not allowed:
+                    abort(make_response(
+                        jsonify({ 'message': 'too many requests, slow down' }),
+                        429,
+                        { 'Retry-After': str(math.ceil((cost - tokens) / rate)) }
+                    ))
+                return func(*args, **kwargs)
+            return inner
+        return outer
+
+    def after_request(self, response:Response):
+        for k, v in g.get('rate_limit', {}).items():
+            response.headers.setdefault(k, v)
+        return response
@@ -2,9 +2,10 @@ from flask_restful import Resource
 from flask_restful.reqparse import RequestParser
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
-from ...utils import UserAlreadyExists, UserDoesNotExist
+from ...utils import UserAlreadyExists, UserDoesNotExist, ServerBusy
 from ...utils import get_arg_dict, to_bool
 from ...models import UserModel
+from ... import limiter
 
 parser = RequestParser(bundle_errors=True, trim=True)
 parser.add_argument('username', location=['form', 'args', 'json'], required=True,  nullable=False, case_sensitive=True,  type=str)
@@ -23,6 +24,7 @@ class UsersEndpoint(Resource):
     Register a new user using a username and password combination.
     '''
     @jwt_required(optional=True)
+    @limiter.limit('login')
     def post(self):
         jwt_identity = get_jwt_identity()
         
@@ -49,11 +51,18 @@ class UsersEndpoint(Resource):
                     { 'message': 'username and password combination not found' },
                     401
                 )
+            except ServerBusy as e:
+                return (
+                    { 'message': 'too many login attempts in progress, try again shortly' },
+                    503,
+                    { 'Retry-After': '1' }
+                )
 
     @jwt_required(optional=True)
     def get(self):
         return self.post()
        
+    @limiter.limit('login')
     def put(self):
         kwargs = get_arg_dict(parser)
         user = UserModel(**kwargs)
@@ -76,3 +85,9 @@ class UsersEndpoint(Resource):
                 },
                 400
             )
+        except ServerBusy as e:
+            return (
+                { 'message': 'too many registrations in progress, try again shortly' },
+                503,
+                { 'Retry-After': '1' }
+            )
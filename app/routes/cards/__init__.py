@@ -0,0 +1,11 @@
+'''
+A container for the cards api.
+
+Contains three endpoints accesible by:
+    - `cards.OwnersEndpoint`
+    - `cards.BatchOwnersEndpoint`
+    - `cards.SearchEndpoint`
+'''
+
+from .owners import OwnersEndpoint, BatchOwnersEndpoint
+from .search import SearchEndpoint
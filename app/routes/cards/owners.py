@@ -0,0 +1,59 @@
+import os
+from typing import List
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from .route_utils import parsers
+from ...utils import get_arg_dict
+from ...models import OwnersModel
+from ... import limiter
+
+
+def owners_response(scryfall_ids:List[str], url:str):
+    user_id, username = get_jwt_identity() or (None, None)
+    args = get_arg_dict(parsers.pagination_parser)
+    page, per_page = args['page'], args['per_page']
+
+    try:
+        owners, has_more = OwnersModel.find(scryfall_ids, page, per_page, exclude_user_id=user_id)
+    except ValueError as e:
+        return { 'message': 'bad owners request', 'errors': e.args }, 400
+
+    res = {
+        'page': page,
+        'per_page': per_page,
+        'data': owners,
+    }
+    if has_more:
+        # show url for the next page if there are owners left to show
+        res['next_page'] = f'{os.getenv("APP_URL")}{url}?page={page + 1}&per_page={per_page}'
+    return res
+
+
+class OwnersEndpoint(Resource):
+    '''
+    ## `/cards/<scryfall_id>/owners` ENDPOINT
+
+    ### GET
+    Finds public users owning a given card.  
+    Supports pagination.
+    '''
+    @jwt_required(optional=True)
+    @limiter.limit('read')
+    def get(self, scryfall_id:str):
+        return owners_response([ scryfall_id ], f'/cards/{scryfall_id}/owners')
+
+
+class BatchOwnersEndpoint(Resource):
+    '''
+    ## `/cards/owners` ENDPOINT
+
+    ### POST
+    Finds public users owning any of the given cards.  
+    Supports pagination.
+    '''
+    @jwt_required(optional=True)
+    @limiter.limit('read')
+    def post(self):
+        scryfall_ids = get_arg_dict(parsers.scryfall_ids_parser)['scryfall_ids']
+        return owners_response(scryfall_ids, '/cards/owners')
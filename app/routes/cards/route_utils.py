@@ -0,0 +1,19 @@
+from flask_restful.reqparse import RequestParser
+
+
+class parsers():
+    '''
+    Parsers for the cards routes
+    '''
+    pagination_parser = RequestParser(bundle_errors=True, trim=True)
+    pagination_parser.add_argument('page',     location=['form', 'args'], case_sensitive=False, default=1,  type=int)
+    pagination_parser.add_argument('per_page', location=['form', 'args'], case_sensitive=False, default=20, type=int)
+
+
+    scryfall_ids_parser = RequestParser(bundle_errors=True, trim=True)
+    scryfall_ids_parser.add_argument('scryfall_ids', location=['json'], required=True, nullable=False, type=str, action='append')
+
+
+    search_parser = RequestParser(bundle_errors=True, trim=True)
+    search_parser.add_argument('q',     location=['args'], case_sensitive=False, required=True, type=str)
+    search_parser.add_argument('limit', location=['args'], case_sensitive=False, default=10, type=int)
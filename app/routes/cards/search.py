@@ -0,0 +1,31 @@
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+
+from .route_utils import parsers
+from ...utils import get_arg_dict
+from ...catalog import catalog
+from ... import limiter
+
+
+class SearchEndpoint(Resource):
+    '''
+    ## `/cards/search` ENDPOINT
+
+    ### GET
+    Suggests card names matching a full or partial name, for typeahead.
+    '''
+    @jwt_required(optional=True)
+    @limiter.limit('read')
+    def get(self):
+        args = get_arg_dict(parsers.search_parser)
+        try:
+            names = catalog.search(args['q'], limit=min(max(args['limit'], 1), 50))
+        except RuntimeError as e:
+            return { 'message': 'searching by card name is not available', 'errors': e.args }, 503
+
+        return {
+            'data': [
+                { 'name': catalog.cards[catalog.names[name][0]][0], 'scryfall_ids': catalog.names[name] }
+                for name in names
+            ]
+        }
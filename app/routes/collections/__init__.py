@@ -1,12 +1,27 @@
 '''
 A container for the collections api.
 
-Contains three endpoints accesible by:
+Contains twelve endpoints accesible by:
     - `collections.CollectionsEndpoint`
     - `collections.CardEndpoint`
     - `collections.AllEndpoint`
+    - `collections.ChangesEndpoint`
+    - `collections.EventsEndpoint`
+    - `collections.CoverageEndpoint`
+    - `collections.SetsEndpoint`
+    - `collections.SetEndpoint`
+    - `collections.TagsEndpoint`
+    - `collections.SnapshotsEndpoint`
+    - `collections.SnapshotEndpoint`
+    - `collections.RestoreEndpoint`
 '''
 
 from .all import AllEndpoint
 from .cards import CardEndpoint
+from .changes import ChangesEndpoint
+from .events import EventsEndpoint
+from .coverage import CoverageEndpoint
+from .sets import SetsEndpoint, SetEndpoint
+from .tags import TagsEndpoint
+from .snapshots import SnapshotsEndpoint, SnapshotEndpoint, RestoreEndpoint
 from .collections import CollectionsEndpoint
@@ -3,7 +3,10 @@ from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from .route_utils import data_validator, parsers
-from ...models import UserModel, CardModel
+from ..jobs.route_utils import job_accepted
+from ...utils import etag_cached
+from ...models import UserModel, CardModel, JobModel
+from ... import limiter
 
 class AllEndpoint(Resource):
     '''
@@ -13,14 +16,13 @@ class AllEndpoint(Resource):
     Loads *all* cards associated with a given user from the database.
 
     ### DELETE
-    Clears all cards associated with a given user from the database.
+    Queues a background job clearing all cards associated with a given user from the database.
     '''
     @jwt_required()
+    @limiter.limit('export')
     @data_validator(parsers.cardlist_parser)
+    @etag_cached
     def get(self, user:UserModel, cards:List[CardModel]):
-        user_id, username = get_jwt_identity()
-        user = UserModel(user_id)
-
         data = user.collection \
                 .load_all(cards) \
                 .to_JSON(cards_drop_cols=['user_id'])
@@ -30,10 +32,7 @@ class AllEndpoint(Resource):
         }
 
     @jwt_required()
+    @limiter.limit('write')
     def delete(cls):
         user_id, username = get_jwt_identity()
-        user = UserModel(user_id)
-
-        return user.collection \
-                .clear() \
-                .save()
+        return job_accepted(JobModel.create(user_id, 'clear'))
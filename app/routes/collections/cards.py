@@ -1,8 +1,9 @@
 from flask_restful import Resource
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required
 
 from .route_utils import data_validator, parsers
 from ...models import UserModel
+from ... import limiter
 
 
 class CardEndpoint(Resource):
@@ -19,15 +20,15 @@ class CardEndpoint(Resource):
     Updates a specific card using it's `card_id` from the database.
     '''
     @jwt_required()
-    def get(self, card_id:str):
-        user_id, username = get_jwt_identity()
-        user = UserModel(user_id)
-
+    @limiter.limit('read')
+    @data_validator(parsers.empty_parser)
+    def get(self, card_id:str, user:UserModel):
         return user \
                 .collection[card_id] \
                 .to_JSON(drop_cols=['user_id'])
 
     @jwt_required()
+    @limiter.limit('write')
     @data_validator(parsers.card_parser)
     def post(self, card_id:str, user:UserModel, **kwargs):
         res = user.collection[card_id] \
@@ -38,10 +39,9 @@ class CardEndpoint(Resource):
         return { k:v for k,v in user.collection[card_id].to_JSON().items() if k in fields }
     
     @jwt_required()
-    def delete(self, card_id:str):
-        user_id, username = get_jwt_identity()
-        user = UserModel(user_id)
-        
+    @limiter.limit('write')
+    @data_validator(parsers.empty_parser)
+    def delete(self, card_id:str, user:UserModel):
         return user \
                 .collection[card_id] \
                 .delete() \
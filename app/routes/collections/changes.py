@@ -0,0 +1,47 @@
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+
+from .route_utils import data_validator, parsers
+from ...utils import make_etag, not_modified, with_etag
+from ...models import UserModel
+from ... import limiter
+
+
+class ChangesEndpoint(Resource):
+    '''
+    ## `/collections/changes` ENDPOINT
+
+    ### GET
+    Loads changes made to the user's collection since a given sequence number.
+    '''
+    @jwt_required()
+    @limiter.limit('read')
+    @data_validator(parsers.changes_parser)
+    def get(self, user:UserModel, since:int, limit:int):
+        entries, full_resync, has_more = user.collection.journal.since(since, limit)
+        # derived from the changes returned rather than the version alone,
+        # which is bumped before its changes can be read, see `JournalModel.since()`
+        last_seq = entries[-1]['seq'] if entries else since
+        etag = make_etag(user.user_id, f'{user.collection_version}:{last_seq}:{int(full_resync)}:{int(has_more)}')
+        res = not_modified(etag)
+        if res:
+            return res
+
+        changes = []
+        for entry in entries:
+            item = { 'seq': entry['seq'], 'action': entry['action'] }
+            if 'card_id' in entry:
+                item['_id'] = str(entry['card_id'])
+            if 'card' in entry:
+                item['card'] = entry['card']
+                if entry['card'].get('date_created'):
+                    item['card']['date_created'] = entry['card']['date_created'].replace(microsecond=0).isoformat()
+            changes += [ item ]
+
+        return with_etag(etag, {
+            'since': since,
+            'version': user.collection_version,
+            'full_resync': full_resync,
+            'has_more': has_more,
+            'changes': changes,
+        })
@@ -1,11 +1,14 @@
 import os
 from typing import List
+from flask import abort, jsonify, make_response
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required
 
-from .route_utils import data_validator, parsers
-from ...utils import get_arg_dict, DatabaseOperation
+from .route_utils import data_validator, idempotent, parsers
+from ...utils import get_arg_dict, etag_cached, DatabaseOperation
 from ...models import UserModel, CardModel
+from ...catalog import catalog
+from ... import limiter
 
 
 class CollectionsEndpoint(Resource):
@@ -14,24 +17,39 @@ class CollectionsEndpoint(Resource):
 
     ### GET
     Loads cards associated with a given user from the database.  
-    Supports pagination.
+    Supports pagination, searching by card name and filtering by tag.
 
     ### DELETE
     Deletes selected `card_id`s associated with a given user from the database.
 
     ### POST
-    Updates or inserts cards from given user's collections in the database.
+    Updates or inserts cards from given user's collections in the database.  
+    Retries sent with the same `Idempotency-Key` header are answered with the first response.
     '''
 
     @jwt_required()
+    @limiter.limit('read')
     @data_validator(parsers.cardlist_parser)
+    @etag_cached
     def get(self, user:UserModel, cards:List[CardModel]):
         # page, per_page = get_arg_list(parsers.pagination_parser)
         args = get_arg_dict(parsers.pagination_parser)
         page, per_page = args['page'], args['per_page']
 
+        scryfall_ids = None
+        if args.get('q'):
+            try:
+                scryfall_ids = catalog.ids_for_search(args['q'])
+            except RuntimeError as e:
+                abort(make_response(
+                    jsonify({
+                        'message': 'searching by card name is not available',
+                        'errors': e.args
+                    }), 503
+                ))
+
         data = user.collection \
-                .load(page, per_page, cards) \
+                .load(page, per_page, cards, scryfall_ids, args.get('tag')) \
                 .to_JSON(cards_drop_cols=['user_id'])
         res = {
             'page': page,
@@ -39,10 +57,11 @@ class CollectionsEndpoint(Resource):
             'data': data['cards']
         }
 
+        total_documents = user.collection.total_documents
         if page == 1:
             # show total document count on the first page
-            res['total_documents'] = data['doc_count']
-        if page * per_page < data['doc_count']:
+            res['total_documents'] = total_documents
+        if page * per_page < total_documents:
             # show url for the next page if there are cards left to show
             page += 1
             args = '&'.join([ f'{k}={v}' for k,v in args.items() ])
@@ -51,6 +70,7 @@ class CollectionsEndpoint(Resource):
         return res
 
     @jwt_required()
+    @limiter.limit('write')
     @data_validator(parsers.cardlist_parser)
     def delete(self, user:UserModel, cards:List[CardModel]):
         cards = [ card.delete() for card in cards ]
@@ -59,6 +79,8 @@ class CollectionsEndpoint(Resource):
                 .save()
 
     @jwt_required()
+    @limiter.limit('write')
+    @idempotent
     @data_validator(parsers.cardlist_parser)
     def post(self, user:UserModel, cards:List[CardModel]):
         res = user.collection \
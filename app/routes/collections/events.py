@@ -0,0 +1,84 @@
+import json, time
+from flask import Response, current_app, request, stream_with_context
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+
+from .route_utils import data_validator, parsers
+from ...models import UserModel
+from ... import mongo, events, limiter
+
+
+def to_event(name:str, seq:int, data:dict) -> str:
+    return f'id: {seq}\nevent: {name}\ndata: {json.dumps(data)}\n\n'
+
+
+class EventsEndpoint(Resource):
+    '''
+    ## `/collections/events` ENDPOINT
+
+    ### GET
+    Streams changes made to the user's collection as server-sent events, read from the collection's journal.
+    Resumes after the event id sent as `Last-Event-ID` on reconnects.
+    '''
+    RETRY = 3000 # ms, reconnection delay hint for clients
+
+    @jwt_required(locations=['headers', 'query_string']) # `EventSource` can't send headers
+    @limiter.limit('read')
+    @data_validator(parsers.events_parser)
+    def get(self, user:UserModel, last_event_id:int=None):
+        last_event_id = request.headers.get('Last-Event-ID', last_event_id)
+        try:
+            last_seq = int(last_event_id) if last_event_id is not None else None
+        except ValueError:
+            last_seq = -1 # unknown position, resynced below
+
+        if events.streams >= events.max_streams:
+            return { 'message': 'too many open event streams, try again shortly' }, 503, { 'Retry-After': '5' }
+
+        heartbeat = current_app.config['EVENTS_HEARTBEAT']
+        closes_at = time.monotonic() + current_app.config['EVENTS_MAX_AGE']
+
+        def stream(last_seq):
+            event = events.subscribe(user.user_id) # subscribed here, a generator that never starts never reaches its `finally`
+            if event is None:
+                yield f'retry: {self.RETRY}\n\n'
+                return
+            try:
+                yield f'retry: {self.RETRY}\n\n'
+                if last_seq is None:
+                    last_seq = user.collection_version
+                    yield to_event('ready', last_seq, { 'version': last_seq })
+
+                while True:
+                    event.clear() # before reading, so changes committed meanwhile wake up the next wait
+                    mongo.renew_deadline()
+                    user.refresh_collection_version()
+                    entries, full_resync, has_more = user.collection.journal.since(last_seq, 1000)
+                    if full_resync:
+                        # the journal was compacted past `last_seq`, the client should reload the collection
+                        last_seq = user.collection_version
+                        yield to_event('resync', last_seq, { 'version': last_seq })
+                    for entry in entries:
+                        item = { 'action': entry['action'] }
+                        if 'card_id' in entry:
+                            item['_id'] = str(entry['card_id'])
+                        if 'card' in entry:
+                            item['amount'] = entry['card'].get('amount')
+                        last_seq = entry['seq']
+                        yield to_event('change', last_seq, item)
+                    if has_more:
+                        continue
+
+                    remaining = closes_at - time.monotonic()
+                    if remaining <= 0:
+                        return # the client reconnects with `Last-Event-ID`
+                    if not event.wait(min(heartbeat, remaining)):
+                        yield ': heartbeat\n\n'
+            finally:
+                events.unsubscribe(user.user_id, event)
+
+        return Response(
+            stream_with_context(stream(last_seq)),
+            mimetype = 'text/event-stream',
+            headers = { 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no' }
+        )
@@ -1,12 +1,16 @@
 # from flask import request # for accessing request.data
-from flask import abort, jsonify, make_response
+import hashlib, json
+from functools import wraps
+from flask import Response, abort, jsonify, make_response, request
 from flask_jwt_extended import get_jwt_identity
 from flask_restful.reqparse import RequestParser
 from bson.errors import InvalidId
+from pymongo.errors import PyMongoError
 
-from ...utils import get_arg_dict, to_taglist, to_bool, to_amount, to_card
-from ...utils import CardCondition
-from ...models import UserModel, CardModel
+from ...utils import get_arg_dict, to_taglist, to_bool, to_amount, to_deck
+from ...utils import CardCondition, CardListValidator, DatabaseUnavailable
+from ...models import UserModel, CardModel, IdempotencyModel, SnapshotModel
+from ... import mongo
 
 
 def data_validator(parser, data_mandatory=False):
@@ -20,7 +24,7 @@ def data_validator(parser, data_mandatory=False):
     :param data_mandatory: If `True`, data received from the request must **not** be empty. Defaults to `False`.
     '''
     def outer(func):
-        def inner(self, card_id:str=None):
+        def inner(self, card_id:str=None, **url_kwargs):
             user_id, username = get_jwt_identity()
             user = UserModel(user_id)
             
@@ -52,6 +56,8 @@ def data_validator(parser, data_mandatory=False):
                     }),
                     404
                 ))
+            except (DatabaseUnavailable, PyMongoError):
+                raise # answered with a 503, see `Mongo.init_app()`
             except Exception as e:
                 abort(make_response(
                     jsonify({
@@ -60,22 +66,125 @@ def data_validator(parser, data_mandatory=False):
                     401
                 ))
             
-            return func(self, user=user, **kwargs)
+            return func(self, user=user, **url_kwargs, **kwargs)
         return inner
     return outer
 
 
+def idempotent(func):
+    '''
+    A wrapper for answering retries of a request made with an `Idempotency-Key` header with the first execution's response.
+    Should wrap `data_validator`, so replayed responses don't touch the collection at all.
+    Only successful responses are stored, a failed execution releases the key for a retry.
+
+    Responds with `409 Conflict` if the first execution is still in progress after waiting for it,
+    and with `422 Unprocessable Entity` if the key was used for a request with a different body.
+    '''
+    @wraps(func)
+    def inner(self, *args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if key is None:
+            return func(self, *args, **kwargs)
+        if not key or len(key) > IdempotencyModel.MAX_KEY_LENGTH:
+            return { 'message': f'`Idempotency-Key` should be 1 to {IdempotencyModel.MAX_KEY_LENGTH} characters long' }, 400
+
+        user_id, username = get_jwt_identity()
+        h = hashlib.blake2b(digest_size=16)
+        h.update(request.query_string + b'?')
+        h.update(request.get_data(cache=True))
+        fingerprint = h.hexdigest()
+        timeout = IdempotencyModel.WAIT
+        remaining = mongo.remaining_ms()
+        if remaining is not None:
+            timeout = min(timeout, remaining / 1000)
+
+        record, claimed = IdempotencyModel.begin(user_id, f'{request.method} {request.path}', key, fingerprint)
+        if not claimed:
+            if record.fingerprint != fingerprint:
+                return { 'message': '`Idempotency-Key` was already used for a different request' }, 422
+            record, claimed = record.wait(timeout)
+        if not claimed:
+            if record.status == IdempotencyModel.PENDING:
+                return { 'message': 'a request with this `Idempotency-Key` is still in progress' }, 409, { 'Retry-After': '1' }
+            res = Response(
+                record.response['body'],
+                record.response['status'],
+                record.response['headers'],
+                mimetype='application/json'
+            )
+            res.headers['Idempotent-Replayed'] = 'true'
+            return res
+
+        try:
+            with record.held():
+                res = func(self, *args, **kwargs)
+        except BaseException:
+            record.release()
+            raise
+        if isinstance(res, Response):
+            record.release()
+            return res
+        data, status, *headers = res if isinstance(res, tuple) else (res, 200)
+        if 200 <= status < 300:
+            record.finish(json.dumps(data) + '\n', status, headers[0] if headers else {})
+        else:
+            record.release()
+        return res
+    return inner
+
+
+def load_snapshot(snapshot_id:str, user_id:str):
+    '''
+    Loads a snapshot of the given user, aborts with `404` if it's not found.
+    '''
+    try:
+        return SnapshotModel.get(snapshot_id, user_id)
+    except (InvalidId, KeyError) as e:
+        abort(make_response(
+            jsonify({
+                'message': 'snapshot not found',
+                'errors': e.args
+            }), 404
+        ))
+
+
 class parsers():
     '''
     Parsers for the collection routes
     '''
-    cardlist_parser = RequestParser(bundle_errors=True, trim=True)
-    cardlist_parser.add_argument('cards', location=['json'], case_sensitive=False, default=[], type=to_card, action='append')
+    empty_parser = RequestParser()
+
+
+    cardlist_parser = CardListValidator('cards')
+
+
+    changes_parser = RequestParser(bundle_errors=True, trim=True)
+    changes_parser.add_argument('since', location=['args'], case_sensitive=False, required=True, type=int)
+    changes_parser.add_argument('limit', location=['args'], case_sensitive=False, default=1000, type=int)
+
+
+    events_parser = RequestParser(bundle_errors=True, trim=True)
+    events_parser.add_argument('last_event_id', location=['args'], case_sensitive=False, store_missing=False, type=int)
+
+
+    snapshot_parser = RequestParser(bundle_errors=True, trim=True)
+    snapshot_parser.add_argument('version', location=['args'], case_sensitive=False, store_missing=False, type=int)
+
+
+    deck_parser = RequestParser(bundle_errors=True)
+    deck_parser.add_argument('deck', location=['json'], required=True, type=to_deck)
 
 
     pagination_parser = RequestParser(bundle_errors=True, trim=True)
     pagination_parser.add_argument('page',     location=['form', 'args'], case_sensitive=False, default=1,  type=int)
     pagination_parser.add_argument('per_page', location=['form', 'args'], case_sensitive=False, default=20, type=int)
+    pagination_parser.add_argument('q',        location=['args'],         case_sensitive=False, store_missing=False, type=str)
+    pagination_parser.add_argument('tag',      location=['args'],         case_sensitive=False, store_missing=False, type=str)
+
+
+    tags_parser = RequestParser(bundle_errors=True, trim=True)
+    tags_parser.add_argument('prefix', location=['args'], case_sensitive=False, default='', type=str)
+    tags_parser.add_argument('limit',  location=['args'], case_sensitive=False, default=20, type=int)
     
     
     card_parser = RequestParser(bundle_errors=True, trim=True)
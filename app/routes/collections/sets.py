@@ -0,0 +1,87 @@
+from flask import abort, jsonify, make_response
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+
+from .route_utils import data_validator, parsers
+from ...utils import etag_cached
+from ...models import UserModel
+from ...catalog import catalog
+from ... import limiter
+
+
+def load_set_progress(user:UserModel):
+    '''
+    Loads the user's per-set progress, aborting with `503` if the card catalog isn't configured.
+    '''
+    try:
+        return user.collection.set_progress()
+    except RuntimeError as e:
+        abort(make_response(
+            jsonify({
+                'message': 'set progress is not available',
+                'errors': e.args
+            }), 503
+        ))
+
+
+def set_summary(set_code:str, owned:int) -> dict:
+    total = len(catalog.set_cards[set_code])
+    return {
+        'set': set_code,
+        'name': catalog.sets[set_code],
+        'owned': owned,
+        'total': total,
+        'percentage': round(100 * owned / total, 2) if total else 0.0,
+    }
+
+
+class SetsEndpoint(Resource):
+    '''
+    ## `/collections/sets` ENDPOINT
+
+    ### GET
+    Loads the user's completion progress for every set they own cards from.
+    '''
+    @jwt_required()
+    @limiter.limit('read')
+    @data_validator(parsers.empty_parser)
+    @etag_cached
+    def get(self, user:UserModel):
+        owned_ids, owned_per_set = load_set_progress(user)
+        data = [ set_summary(set_code, owned) for set_code, owned in owned_per_set.items() ]
+        data.sort(key=lambda item: (-item['percentage'], item['set']))
+        return {
+            'total_sets': len(data),
+            'data': data,
+        }
+
+
+class SetEndpoint(Resource):
+    '''
+    ## `/collections/sets/<set_code>` ENDPOINT
+
+    ### GET
+    Loads the user's completion progress for a given set, including the cards they're missing.
+    '''
+    @jwt_required()
+    @limiter.limit('read')
+    @data_validator(parsers.empty_parser)
+    @etag_cached
+    def get(self, user:UserModel, set_code:str):
+        owned_ids, owned_per_set = load_set_progress(user)
+        set_code = set_code.lower()
+        if set_code not in catalog.set_cards:
+            abort(make_response(
+                jsonify({ 'message': f'set `{set_code}` not found' }),
+                404
+            ))
+
+        res = set_summary(set_code, owned_per_set.get(set_code, 0))
+        res['missing'] = [
+            {
+                'scryfall_id': scryfall_id,
+                'name': catalog.cards[scryfall_id][0],
+                'collector_number': catalog.cards[scryfall_id][2],
+            } for scryfall_id in catalog.set_cards[set_code] if scryfall_id not in owned_ids
+        ]
+        return res
@@ -0,0 +1,94 @@
+import json
+from flask import Response, abort, jsonify, make_response, stream_with_context
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+
+from .route_utils import data_validator, load_snapshot, parsers
+from ..jobs.route_utils import job_accepted
+from ...models import UserModel, CardModel, JobModel, SnapshotModel
+from ... import limiter
+
+
+def unavailable(e:ValueError):
+    abort(make_response(
+        jsonify({
+            'message': 'version not available from this snapshot',
+            'errors': e.args
+        }), 409
+    ))
+
+
+class SnapshotsEndpoint(Resource):
+    '''
+    ## `/collections/snapshots` ENDPOINT
+
+    ### GET
+    Lists the snapshots of the user's collection, newest first.
+
+    ### POST
+    Queues a `snapshot` job, taking a snapshot of the user's collection.
+    '''
+    @jwt_required()
+    @limiter.limit('read')
+    @data_validator(parsers.empty_parser)
+    def get(self, user:UserModel):
+        return {
+            'version': user.collection_version,
+            'data': [ snapshot.to_JSON() for snapshot in SnapshotModel.find(user.user_id) ],
+        }
+
+    @jwt_required()
+    @limiter.limit('write')
+    @data_validator(parsers.empty_parser)
+    def post(self, user:UserModel):
+        return job_accepted(JobModel.create(user.user_id, 'snapshot', { 'reason': 'manual' }))
+
+
+class SnapshotEndpoint(Resource):
+    '''
+    ## `/collections/snapshots/<snapshot_id>` ENDPOINT
+
+    ### GET
+    Streams the user's collection as it was at a given version, reconstructed from a snapshot and the changes made after it.
+    '''
+    @jwt_required()
+    @limiter.limit('export')
+    @data_validator(parsers.snapshot_parser)
+    def get(self, user:UserModel, snapshot_id:str, version:int=None):
+        snapshot = load_snapshot(snapshot_id, user.user_id)
+        version = snapshot.consistent_version if version is None else version
+        try:
+            cards = snapshot.reconstruct(version)
+        except ValueError as e:
+            unavailable(e)
+
+        def generate():
+            yield f'{{"snapshot_id": "{snapshot._id}", "version": {version}, "data": ['
+            first = True
+            for card in cards:
+                card = CardModel(parent=user.collection, user_id=user.user_id, **card)
+                yield ('' if first else ',') + json.dumps(card.to_JSON(drop_cols=['user_id']))
+                first = False
+            yield ']}'
+
+        return Response(stream_with_context(generate()), mimetype='application/json')
+
+
+class RestoreEndpoint(Resource):
+    '''
+    ## `/collections/snapshots/<snapshot_id>/restore` ENDPOINT
+
+    ### POST
+    Queues a `restore` job, restoring the user's collection to a version reconstructed from a snapshot.
+    '''
+    @jwt_required()
+    @limiter.limit('write')
+    @data_validator(parsers.snapshot_parser)
+    def post(self, user:UserModel, snapshot_id:str, version:int=None):
+        snapshot = load_snapshot(snapshot_id, user.user_id)
+        version = snapshot.consistent_version if version is None else version
+        try:
+            snapshot.changes(version) # fails early, rather than in the job
+        except ValueError as e:
+            unavailable(e)
+        return job_accepted(JobModel.create(user.user_id, 'restore', { 'snapshot_id': str(snapshot._id), 'version': version }))
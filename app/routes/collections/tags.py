@@ -0,0 +1,25 @@
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+
+from .route_utils import data_validator, parsers
+from ...utils import etag_cached
+from ...models import UserModel
+from ... import limiter
+
+
+class TagsEndpoint(Resource):
+    '''
+    ## `/collections/tags` ENDPOINT
+
+    ### GET
+    Autocompletes the tags used in the user's collection, most used first.
+    '''
+    @jwt_required()
+    @limiter.limit('read')
+    @data_validator(parsers.tags_parser)
+    @etag_cached
+    def get(self, user:UserModel, prefix:str, limit:int):
+        return {
+            'prefix': prefix,
+            'data': user.collection.tags(prefix, min(max(limit, 1), 100)),
+        }
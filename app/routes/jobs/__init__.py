@@ -0,0 +1,10 @@
+'''
+A container for the jobs api.
+
+Contains three endpoints accesible by:
+    - `jobs.JobsEndpoint`
+    - `jobs.JobEndpoint`
+    - `jobs.ResultEndpoint`
+'''
+
+from .jobs import JobsEndpoint, JobEndpoint, ResultEndpoint
@@ -0,0 +1,84 @@
+import json
+from flask import Response, abort, jsonify, make_response, stream_with_context
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required, get_jwt_identity
+
+from .route_utils import job_accepted, load_job, parsers
+from ...utils import get_arg_dict
+from ... import job_chunks_db, limiter
+from ...models import JobModel
+
+
+class JobsEndpoint(Resource):
+    '''
+    ## `/jobs` ENDPOINT
+
+    ### POST
+    Queues a new background job for the active user's collection.
+    '''
+    @jwt_required()
+    @limiter.limit('write')
+    def post(self):
+        user_id, username = get_jwt_identity()
+        kind = get_arg_dict(parsers.job_parser)['kind']
+
+        params, inputs = {}, None
+        if kind == 'restore':
+            return { 'message': 'restores are queued with `POST /collections/snapshots/<snapshot_id>/restore`' }, 400
+        if kind == 'import':
+            try:
+                cards = get_arg_dict(parsers.cardlist_parser)['cards']
+            except ValueError as e:
+                return { 'message': 'bad card request', 'errors': e.args }, 400
+            if not cards:
+                return { 'message': 'no data provided' }, 400
+            inputs = [
+                { **card, 'condition': card['condition'].name } if 'condition' in card else card
+                for card in cards
+            ]
+
+        return job_accepted(JobModel.create(user_id, kind, params, inputs))
+
+
+class JobEndpoint(Resource):
+    '''
+    ## `/jobs/<job_id>` ENDPOINT
+
+    ### GET
+    Retrieves a job's status and progress, and its result once done.
+    '''
+    @jwt_required()
+    @limiter.limit('read')
+    def get(self, job_id:str):
+        user_id, username = get_jwt_identity()
+        return load_job(job_id, user_id).to_JSON()
+
+
+class ResultEndpoint(Resource):
+    '''
+    ## `/jobs/<job_id>/result` ENDPOINT
+
+    ### GET
+    Streams the cards exported by a finished `export` job.
+    '''
+    @jwt_required()
+    @limiter.limit('read')
+    def get(self, job_id:str):
+        user_id, username = get_jwt_identity()
+        job = load_job(job_id, user_id)
+        if job.kind != 'export' or job.status != JobModel.DONE:
+            abort(make_response(
+                jsonify({ 'message': 'job has no result', 'status': job.status }),
+                409
+            ))
+
+        def generate():
+            yield f'{{"total_documents": {job.result["total_documents"]}, "data": ['
+            first = True
+            for chunk in job_chunks_db.find({ 'job_id': job._id }).sort('seq', 1):
+                for card in chunk['cards']:
+                    yield ('' if first else ',') + json.dumps(card)
+                    first = False
+            yield ']}'
+
+        return Response(stream_with_context(generate()), mimetype='application/json')
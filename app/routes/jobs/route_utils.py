@@ -0,0 +1,46 @@
+import os
+from flask import abort, jsonify, make_response
+from flask_restful.reqparse import RequestParser
+from bson.errors import InvalidId
+
+from ...utils import CardListValidator
+from ...models import JobModel
+
+
+def job_accepted(job:JobModel):
+    '''
+    Response for a newly queued job.
+
+    :return: A `202 Accepted` response, pointing to the job's status endpoint
+    '''
+    status_url = f'{os.getenv("APP_URL")}/jobs/{job._id}'
+    return (
+        { **job.to_JSON(), 'status_url': status_url },
+        202,
+        { 'Location': status_url }
+    )
+
+
+def load_job(job_id:str, user_id:str):
+    '''
+    Loads a job of the given user, aborts with `404` if it's not found.
+    '''
+    try:
+        return JobModel.get(job_id, user_id)
+    except (InvalidId, KeyError) as e:
+        abort(make_response(
+            jsonify({
+                'message': 'job not found',
+                'errors': e.args
+            }), 404
+        ))
+
+
+class parsers():
+    '''
+    Parsers for the jobs routes
+    '''
+    job_parser = RequestParser(bundle_errors=True, trim=True)
+    job_parser.add_argument('kind', location=['json', 'args'], required=True, nullable=False, case_sensitive=False, type=str, choices=JobModel.KINDS)
+
+    cardlist_parser = CardListValidator('cards')
@@ -6,9 +6,11 @@ Contains three endpoints accesible by:
     - `users.CollectionsEndpoint`
     - `users.CardEndpoint`
     - `users.AllEndpoint`
+    - `users.CoverageEndpoint`
 '''
 
 from .users import UsersEndpoint
 from .all import AllEndpoint
 from .cards import CardEndpoint
 from .collections import CollectionsEndpoint
+from .coverage import CoverageEndpoint
@@ -2,8 +2,10 @@ from typing import List
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required
 
-from .route_utils import data_validator, parsers
+from .route_utils import data_validator, public_cached, parsers
+from ...utils import etag_cached
 from ...models import UserModel, CardModel
+from ... import limiter
 
 class AllEndpoint(Resource):
     '''
@@ -13,7 +15,10 @@ class AllEndpoint(Resource):
     Loads *all* cards associated with a given user from the database.
     '''
     @jwt_required(optional=True)
+    @public_cached
+    @limiter.limit('export')
     @data_validator(parsers.cardlist_parser)
+    @etag_cached
     def get(self, user:UserModel, cards:List[CardModel]):
         data = user.collection \
                 .load_all(cards) \
@@ -24,7 +29,10 @@ class AllEndpoint(Resource):
         }
     
     @jwt_required(optional=True)
+    @public_cached
+    @limiter.limit('export')
     @data_validator(parsers.cardlist_parser)
+    @etag_cached
     def post(self, user:UserModel, cards:List[CardModel]):
         data = user.collection \
                 .load_all(cards) \
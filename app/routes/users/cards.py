@@ -1,7 +1,9 @@
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
+from .route_utils import public_cached
 from ...models import UserModel
+from ... import limiter
 
 
 class CardEndpoint(Resource):
@@ -12,6 +14,8 @@ class CardEndpoint(Resource):
     Loads a specific card using it's `card_id` from the database.
     '''
     @jwt_required(optional=True)
+    @public_cached
+    @limiter.limit('read')
     def get(self, card_id:str, username:str=None):
         user_id, identity_username = get_jwt_identity() or (None, None)
         if username:
@@ -28,6 +32,8 @@ class CardEndpoint(Resource):
                 .to_JSON(drop_cols=['user_id'])
     
     @jwt_required(optional=True)
+    @public_cached
+    @limiter.limit('read')
     def post(self, card_id:str, username:str=None):
         user_id, identity_username = get_jwt_identity() or (None, None)
         if username:
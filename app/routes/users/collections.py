@@ -3,9 +3,10 @@ from typing import List
 from flask_restful import Resource
 from flask_jwt_extended import jwt_required
 
-from .route_utils import data_validator, parsers
-from ...utils import get_arg_dict
+from .route_utils import data_validator, public_cached, parsers
+from ...utils import get_arg_dict, etag_cached
 from ...models import UserModel, CardModel
+from ... import limiter
 
 
 class CollectionsEndpoint(Resource):
@@ -18,7 +19,10 @@ class CollectionsEndpoint(Resource):
     '''
 
     @jwt_required(optional=True)
+    @public_cached
+    @limiter.limit('read')
     @data_validator(parsers.cardlist_parser)
+    @etag_cached
     def get(self, user:UserModel, cards:List[CardModel]):
         args = get_arg_dict(parsers.pagination_parser)
         page, per_page = args['page'], args['per_page']
@@ -32,10 +36,11 @@ class CollectionsEndpoint(Resource):
             'data': data['cards']
         }
 
+        total_documents = user.collection.total_documents
         if page == 1:
             # show total document count on the first page
-            res['total_documents'] = data['doc_count']
-        if page * per_page < data['doc_count']:
+            res['total_documents'] = total_documents
+        if page * per_page < total_documents:
             # show url for the next page if there are cards left to show
             page += 1
             args = '&'.join([ f'{k}={v}' for k,v in args.items() ])
@@ -44,7 +49,10 @@ class CollectionsEndpoint(Resource):
         return res
 
     @jwt_required(optional=True)
+    @public_cached
+    @limiter.limit('read')
     @data_validator(parsers.cardlist_parser)
+    @etag_cached
     def post(self, user:UserModel, cards:List[CardModel]):
         args = get_arg_dict(parsers.pagination_parser)
         page, per_page = args['page'], args['per_page']
@@ -58,10 +66,11 @@ class CollectionsEndpoint(Resource):
             'data': data['cards']
         }
 
+        total_documents = user.collection.total_documents
         if page == 1:
             # show total document count on the first page
-            res['total_documents'] = data['doc_count']
-        if page * per_page < data['doc_count']:
+            res['total_documents'] = total_documents
+        if page * per_page < total_documents:
             # show url for the next page if there are cards left to show
             page += 1
             args = '&'.join([ f'{k}={v}' for k,v in args.items() ])
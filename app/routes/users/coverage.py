@@ -0,0 +1,38 @@
+from typing import List
+from flask import abort, jsonify, make_response
+from flask_restful import Resource
+from flask_jwt_extended import jwt_required
+
+from .route_utils import data_validator, parsers
+from ...models import UserModel
+from ... import limiter
+
+
+class CoverageEndpoint(Resource):
+    '''
+    ## `users/<username>/collection/coverage` ENDPOINT
+
+    ### POST
+    Checks which cards of a deck list are owned in a given user's collection.
+    '''
+    @jwt_required(optional=True)
+    @limiter.limit('read')
+    @data_validator(parsers.deck_parser)
+    def post(self, user:UserModel, deck:List[dict]):
+        try:
+            data = user.collection.coverage(deck)
+        except RuntimeError as e:
+            abort(make_response(
+                jsonify({
+                    'message': 'card names are not supported, use `scryfall_id`s instead',
+                    'errors': e.args
+                }), 503
+            ))
+
+        statuses = [ item['status'] for item in data ]
+        return {
+            'owned': statuses.count('OWNED'),
+            'partial': statuses.count('PARTIAL'),
+            'missing': statuses.count('MISSING') + statuses.count('UNKNOWN'),
+            'data': data,
+        }
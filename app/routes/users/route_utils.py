@@ -1,11 +1,14 @@
-from flask import abort, jsonify, make_response
+import json, time
+from functools import wraps
+from flask import Response, abort, jsonify, make_response, request
 from flask_jwt_extended import get_jwt_identity
 from flask_restful.reqparse import RequestParser
 from bson.errors import InvalidId
 
-from ...utils import get_arg_dict, to_taglist, to_bool, to_amount, to_card
-from ...utils import CardCondition
+from ...utils import get_arg_dict, to_taglist, to_bool, to_amount, to_deck
+from ...utils import CardCondition, CardListValidator
 from ...models import UserModel, CardModel
+from ... import mongo, response_cache, compress
 
 
 def data_validator(parser, data_mandatory=False):
@@ -24,6 +27,7 @@ def data_validator(parser, data_mandatory=False):
             
             try:
                 if username:
+                    # the `public` flag is read from the primary, only card reads may be served by a secondary, see `CollectionModel.reads`
                     user = UserModel(username=username)
                     if not user:
                         abort(make_response(
@@ -71,6 +75,82 @@ def data_validator(parser, data_mandatory=False):
     return outer
 
 
+def public_cached(func):
+    '''
+    A wrapper for serving anonymous reads of public collections from `response_cache`.
+    Should wrap `limiter.limit` and `data_validator`, so cached responses skip the rate limiter's write and the user lookup as well.
+    Only successful responses are cached, keyed by username, route and normalized query.
+    The user's `public` flag and collection version are checked against the primary every `check_interval` seconds,
+    so a user made private, or a collection written, by another process isn't served from this one's cache for long.
+    While the database is unavailable, expired entries are served as well, marked with a `Warning` header,
+    for up to `max_stale` seconds after the user was last checked.
+
+    The decorated method should have the following signature:
+    - `(self, username:str, **kwargs)`
+    '''
+    @wraps(func)
+    def inner(self, username:str=None, **kwargs):
+        if not username or not response_cache.max_bytes or get_jwt_identity():
+            return func(self, username=username, **kwargs)
+
+        group = username.lower()
+        key = (
+            group,
+            request.method,
+            request.endpoint,
+            tuple(sorted(kwargs.items())),
+            tuple(sorted(request.args.items(multi=True))),
+            request.get_data(cache=True),
+        )
+        def respond(body, status, headers):
+            # compressed bodies are cached alongside the original one
+            encoding = compress.negotiate(len(body))
+            if not encoding:
+                return Response(body, status, headers, mimetype='application/json')
+            res = Response(
+                response_cache.variant(key, encoding, lambda: compress.compress(body, encoding)),
+                status, headers, mimetype='application/json'
+            )
+            compress.set_headers(res, encoding)
+            return res
+
+        stale = mongo.breaker.is_open
+        validated = response_cache.validated(group)
+        if stale:
+            # whether the user went private meanwhile can't be checked, so entries are served for a while only
+            if validated is None or time.monotonic() - validated > response_cache.max_stale:
+                return func(self, username=username, **kwargs)
+        elif validated is None or time.monotonic() - validated > response_cache.check_interval:
+            # catches changes made through other processes, which invalidation doesn't reach
+            user = UserModel.exists(username=username)
+            response_cache.validate(group, (user['public'], user.get('collection_version', 0)) if user else None)
+
+        cached = response_cache.get(key, stale=stale)
+        if cached:
+            body, status, headers = cached
+            if stale:
+                headers = { **headers, 'Warning': '110 - "Response is Stale"' }
+            etag = headers.get('ETag', '').strip('"')
+            if etag and request.if_none_match.contains_weak(etag):
+                res = make_response('', 304)
+                res.set_etag(etag)
+                return res
+            return respond(body, status, headers)
+
+        generation = response_cache.generation(group)
+        res = func(self, username=username, **kwargs)
+        if isinstance(res, Response):
+            return res
+        data, status, *headers = res if isinstance(res, tuple) else (res, 200)
+        headers = headers[0] if headers else {}
+        if status != 200:
+            return res
+        body = (json.dumps(data) + '\n').encode()
+        response_cache.set(key, group, generation, body, status, headers)
+        return respond(body, status, headers)
+    return inner
+
+
 class parsers():
     '''
     Parsers for the collection routes
@@ -81,8 +161,11 @@ class parsers():
     user_parser.add_argument('public',   location=['form', 'args', 'json'], case_sensitive=False, store_missing=False, type=to_bool)
     
     
-    cardlist_parser = RequestParser(bundle_errors=True, trim=True)
-    cardlist_parser.add_argument('cards', location=['json'], case_sensitive=False, default=[], type=to_card, action='append')
+    cardlist_parser = CardListValidator('cards')
+
+
+    deck_parser = RequestParser(bundle_errors=True)
+    deck_parser.add_argument('deck', location=['json'], required=True, type=to_deck)
 
 
     pagination_parser = RequestParser(bundle_errors=True, trim=True)
@@ -4,7 +4,9 @@ from flask_restful import Resource
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from .route_utils import data_validator, parsers
+from ...utils import ServerBusy
 from ...models import UserModel
+from ... import limiter
 
 
 class UsersEndpoint(Resource):
@@ -19,6 +21,7 @@ class UsersEndpoint(Resource):
     '''
 
     @jwt_required(optional=True)
+    @limiter.limit('read')
     @data_validator(parsers.user_parser)
     def get(self, user:UserModel, **kwargs):
         user_id, identity_username = get_jwt_identity() or (None, None)
@@ -29,11 +32,15 @@ class UsersEndpoint(Resource):
                 .to_JSON(include_collection=False, drop_cols=['password'])
 
     @jwt_required()
+    @limiter.limit('login')
     @data_validator(parsers.user_parser, data_mandatory=True)
     def post(self, user:UserModel, **kwargs):
         user_id, identity_username = get_jwt_identity() or (None, None)
         if str(user.user_id) != str(user_id):
             return { 'message': 'you are not authorized to access this resource' }, 401
 
-        return user \
-                .update(**kwargs)
+        try:
+            return user \
+                    .update(**kwargs)
+        except ServerBusy as e:
+            return { 'message': 'too many password changes in progress, try again shortly' }, 503, { 'Retry-After': '1' }
@@ -2,3 +2,5 @@ from .enums import *
 from .errors import *
 from .funcs import *
 from .classes import *
+from .validators import *
+from .caching import *
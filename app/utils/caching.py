@@ -0,0 +1,253 @@
+import hashlib, threading, time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response
+
+
+def make_etag(user_id, version) -> str:
+    '''
+    Builds an ETag for a collection read, derived from the user, the collection version,
+    the requested route and its query parameters (including a `cards` filter in the JSON body).
+
+    :param user_id: The collection owner's id
+    :param version: The collection version, see `UserModel.bump_collection_version()`, or a string standing for the response's state
+    :return: An unquoted strong ETag
+    '''
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f'{user_id}:{version}:{request.method}:{request.path}?'.encode())
+    h.update(request.query_string)
+    h.update(request.get_data(cache=True))
+    return h.hexdigest()
+
+
+def not_modified(etag:str):
+    '''
+    :param etag: The current unquoted ETag, see `make_etag()`
+    :return: A `304 Not Modified` response if the request's `If-None-Match` matches the ETag, otherwise `None`
+    '''
+    if request.if_none_match.contains_weak(etag): # compressed responses carry a weak ETag
+        res = make_response('', 304)
+        res.set_etag(etag)
+        return res
+    return None
+
+
+def with_etag(etag:str, res):
+    '''
+    Adds an `ETag` header to a resource method's return value.
+
+    :param etag: The unquoted ETag, see `make_etag()`
+    :param res: The return value, either `data` or a `(data, code[, headers])` tuple
+    :return: A `(data, code, headers)` tuple
+    '''
+    if isinstance(res, tuple):
+        data, code, *headers = res
+        headers = { **(headers[0] if headers else {}), 'ETag': f'"{etag}"' }
+        return data, code, headers
+    return res, 200, { 'ETag': f'"{etag}"' }
+
+
+def etag_cached(func):
+    '''
+    A wrapper for answering conditional collection reads.
+
+    The decorated method should be wrapped by `data_validator` and have the following signature:
+    - `(self, user:UserModel, **kwargs)`
+
+    Responds with `304 Not Modified` if the request's `If-None-Match` matches the current ETag,
+    without calling the decorated method, otherwise adds an `ETag` header to its response.
+    '''
+    @wraps(func)
+    def inner(self, user, *args, **kwargs):
+        etag = make_etag(user.user_id, user.collection_version)
+        return not_modified(etag) or with_etag(etag, func(self, user, *args, **kwargs))
+    return inner
+
+
+class VersionedCache():
+    '''
+    A bounded, thread safe, in-process cache of values computed from a collection.
+
+    Each value is stored along with the collection version it was computed for,
+    and is ignored once the collection has a newer version, see `UserModel.bump_collection_version()`.
+    The least recently used entries are dropped once `maxsize` is reached.
+    '''
+    def __init__(self, maxsize:int=256):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, version:int):
+        '''
+        :return: The cached value, or `None` if missing or computed for another version
+        '''
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] != version:
+                return None
+            self._data.move_to_end(key)
+            return item[1]
+
+    def set(self, key, version:int, value):
+        with self._lock:
+            self._data[key] = (version, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+class ResponseCache():
+    '''
+    A bounded, memory capped, thread safe, in-process LRU cache of serialized responses, grouped by user.
+
+    Entries are dropped when their user is invalidated, see `invalidate()`, or once `ttl` seconds old.
+    Invalidation only reaches the current process, changes made by other processes are caught by
+    validating each group against the database every `check_interval` seconds, see `validate()`.
+    '''
+    def __init__(self, max_bytes:int=64*1024*1024, max_entries:int=10_000, ttl:float=10, check_interval:float=1, max_stale:float=60):
+        self.init(max_bytes, max_entries, ttl, check_interval, max_stale)
+
+    def init(self, max_bytes:int=64*1024*1024, max_entries:int=10_000, ttl:float=10, check_interval:float=1, max_stale:float=60):
+        '''
+        Sets the cache limits, dropping all entries.
+
+        :param max_bytes: Max total size of the cached bodies, `0` disables the cache
+        :param max_entries: Max number of cached responses
+        :param ttl: Seconds an entry is served for
+        :param check_interval: Seconds a group's validation holds, see `validate()`
+        :param max_stale: Seconds after its last validation a group's entries may still be served stale
+        '''
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.check_interval = check_interval
+        self.max_stale = max_stale
+        self._data = OrderedDict()   # key -> (body, status, headers, group, expires, { encoding: compressed body })
+        self._groups = {}            # group -> keys
+        self._generations = {}       # group -> number of invalidations
+        self._epoch = 0              # bumped when `_generations` is reset to bound its size
+        self._states = {}            # group -> (state, validated at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+
+    def generation(self, group) -> tuple:
+        '''
+        :return: A token to pass to `set()`, so a response computed while its group was invalidated isn't cached
+        '''
+        return (self._epoch, self._generations.get(group, 0))
+
+    def get(self, key, stale=False):
+        '''
+        :param stale: If `True`, expired entries are returned as well, e.g. while the database is unavailable
+        :return: A cached `(body, status, headers)` tuple, or `None`
+        '''
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or (not stale and item[4] < time.monotonic()):
+                if item is not None:
+                    self._drop(key)
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[:3]
+
+    def variant(self, key, encoding:str, make):
+        '''
+        Retrieves an alternative representation of a cached body, e.g. compressed, creating it on first use.
+
+        :param key: The cache key
+        :param encoding: The representation's name
+        :param make: A function returning the representation's bytes
+        :return: The representation's bytes
+        '''
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and encoding in item[5]:
+                return item[5][encoding]
+        data = make()
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and encoding not in item[5]:
+                item[5][encoding] = data
+                self._bytes += len(data)
+                self._evict()
+        return data
+
+    def set(self, key, group, generation:tuple, body:bytes, status:int, headers:dict):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            if (self._epoch, self._generations.get(group, 0)) != generation:
+                return
+            if key in self._data:
+                self._drop(key)
+            self._data[key] = (body, status, headers, group, time.monotonic() + self.ttl, {})
+            self._groups.setdefault(group, set()).add(key)
+            self._bytes += len(body)
+            self._evict()
+
+    def validated(self, group):
+        '''
+        :return: When the group was last validated, as a `time.monotonic()` timestamp, or `None`
+        '''
+        item = self._states.get(group)
+        return item[1] if item else None
+
+    def validate(self, group, state):
+        '''
+        Records a group's current state as read from the database, e.g. its user's `public` flag and collection version,
+        invalidating the group if the state changed since its last validation, e.g. by a write served by another process.
+
+        :param state: Any comparable value, `None` if the group's user doesn't exist
+        '''
+        with self._lock:
+            previous = self._states.pop(group, None)
+            changed = previous[0] != state if previous else group in self._groups
+            if len(self._states) >= 4 * self.max_entries:
+                self._states.clear() # groups are validated again on next use
+            self._states[group] = (state, time.monotonic())
+        if changed:
+            self.invalidate(group)
+
+    def _evict(self):
+        while self._data and (self._bytes > self.max_bytes or len(self._data) > self.max_entries):
+            self._drop(next(iter(self._data)))
+            self.evictions += 1
+
+    def invalidate(self, group):
+        '''
+        Drops all entries of a group, e.g. when a user's collection or profile changes.
+        '''
+        with self._lock:
+            if len(self._generations) >= 4 * self.max_entries:
+                self._generations.clear()
+                self._epoch += 1
+            self._generations[group] = self._generations.get(group, 0) + 1
+            for key in list(self._groups.get(group, ())):
+                self._drop(key)
+            self.invalidations += 1
+
+    def _drop(self, key):
+        body, _, _, group, _, variants = self._data.pop(key)
+        self._bytes -= len(body) + sum( len(v) for v in variants.values() )
+        keys = self._groups.get(group)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._groups[group]
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
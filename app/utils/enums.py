@@ -8,6 +8,14 @@ class _BaseEnum(Enum):
         return self.name
 
 
+_past_tense = {
+    'CREATE': 'CREATED',
+    'UPDATE': 'UPDATED',
+    'DELETE': 'DELETED',
+    'NOP':    'NOP',
+}
+
+
 class DatabaseOperation(_BaseEnum):
     '''
     enum{ CREATE=0, UPDATE, DELETE, NOP }
@@ -36,19 +44,21 @@ class DatabaseOperation(_BaseEnum):
         raise EnumParsingError(f'Unable to parse value to Operation Enum: `{value}`')
 
     def __eq__(self, other):
-        return super().__eq__(other) or \
-                self.to_past_tense() == other.upper()
+        if self is other:
+            return True
+        if isinstance(other, str):
+            past_tense = _past_tense[self._name_]
+            return other == past_tense or other.upper() == past_tense
+        return False
+
+    def __hash__(self):
+        return hash(self._name_)
 
     def to_past_tense(self):
-        if self == DatabaseOperation.CREATE:
-            return 'CREATED'
-        if self == DatabaseOperation.UPDATE:
-            return 'UPDATED'
-        if self == DatabaseOperation.DELETE:
-            return 'DELETED'
-        if self == DatabaseOperation.NOP:
-            return 'NOP'
-        raise ValueError(f'Unable to get past tense for Operation Enum: `{self}`')
+        try:
+            return _past_tense[self._name_]
+        except KeyError:
+            raise ValueError(f'Unable to get past tense for Operation Enum: `{self}`')
 
 
 class CardCondition(_BaseEnum):
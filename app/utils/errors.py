@@ -7,3 +7,11 @@ class BooleanParsingError(ValueError):
     pass
 class EnumParsingError(ValueError):
     pass
+class CardValidationError(ValueError):
+    pass
+class ServerBusy(RuntimeError):
+    pass
+class DatabaseUnavailable(RuntimeError):
+    def __init__(self, message:str='database unavailable', retry_after:int=1):
+        super().__init__(message)
+        self.retry_after = retry_after
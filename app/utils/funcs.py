@@ -89,3 +89,42 @@ def to_card(value) -> dict:
                 # raise ValueError(f'`{k}` is not a valid card field')
 
     return cards[0] if isinstance(value, dict) else cards
+
+def to_deck(value) -> list:
+    '''
+    Parses a deck list, merging duplicate entries.
+
+    :param value: List of `{scryfall_id, amount}` or `{name, amount}` dictionaries, `amount` defaults to 1
+    :raises ValueError: If an entry is malformed
+    :return: List of `{scryfall_id, amount}` and `{name, amount}` dictionaries
+    '''
+    if isinstance(value, dict):
+        value = [ value ]
+    if not isinstance(value, list):
+        raise ValueError('`deck` should be a list of dictionaries')
+
+    deck = {}
+    for i, entry in enumerate(value):
+        if not isinstance(entry, dict):
+            raise ValueError(f'deck[{i}]: should be a dictionary')
+        entry = dictkeys_to_lower(entry)
+        if entry.get('scryfall_id'):
+            key = ('scryfall_id', str(entry['scryfall_id']).strip())
+        elif entry.get('name'):
+            key = ('name', ' '.join(str(entry['name']).split()))
+        else:
+            raise ValueError(f'deck[{i}]: either `scryfall_id` or `name` is required')
+        try:
+            amount = int(entry.get('amount', 1))
+        except (TypeError, ValueError):
+            raise ValueError(f'deck[{i}].amount: should be an integer')
+        if amount <= 0:
+            raise ValueError(f'deck[{i}].amount: should be positive')
+        
+        merge_key = (key[0], key[1].lower())
+        if merge_key in deck:
+            deck[merge_key]['amount'] += amount
+        else:
+            deck[merge_key] = { key[0]: key[1], 'amount': amount }
+    
+    return list(deck.values())
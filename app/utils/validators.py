@@ -0,0 +1,150 @@
+import json, re
+from flask import request
+from bson import ObjectId
+
+from .errors import BooleanParsingError, CardValidationError
+from .enums import CardCondition
+from .funcs import to_taglist
+
+
+_amount_re = re.compile(r'^\s*([+\-]?)\s*([0-9]+)\s*$')
+_bools = { 'true': True, 'false': False }
+_conditions = {
+    **{ c.name: c for c in CardCondition },
+    **{ str(c.value): c for c in CardCondition },
+}
+
+
+def _check_id(value):
+    if isinstance(value, ObjectId):
+        return value
+    if isinstance(value, str) and ObjectId.is_valid(value):
+        return value
+    raise ValueError(f'`{value}` is not a valid card id')
+
+def _check_str(value):
+    if isinstance(value, str):
+        return value.strip()
+    raise ValueError(f'`{value}` should be a string')
+
+def _check_amount(value):
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        match = _amount_re.match(value)
+        if match:
+            sign, digits = match.groups()
+            return f'{sign}{digits}' if sign else int(digits)
+    raise ValueError(f'`amount` field should be the in form of one of the following: {{X, +X, -X}} where X is an integer')
+
+def _check_taglist(value):
+    if isinstance(value, list):
+        if all( isinstance(v, str) for v in value ):
+            return [ v.strip() for v in value ]
+    elif isinstance(value, str):
+        try:
+            return to_taglist(value) # a JSON array, same as `to_card`
+        except json.JSONDecodeError:
+            return [ value.strip() ] # a bare tag
+    raise ValueError(f'`tag` field should be an array of strings')
+
+def _check_bool(value):
+    if value is True or value is False:
+        return value
+    try:
+        return _bools[str(value).lower()]
+    except KeyError:
+        raise BooleanParsingError(f'`{value}` cannot be parsed as boolean')
+
+def _check_condition(value):
+    if isinstance(value, CardCondition):
+        return value
+    try:
+        return _conditions[value.upper() if isinstance(value, str) else str(value)]
+    except KeyError:
+        return CardCondition.parse(value) # slow path, handles `Near-Mint` etc.
+
+
+class CardListValidator():
+    '''
+    Precompiled single-pass validator for a `cards` list payload.
+
+    Drop-in replacement for a `RequestParser` with `action='append'` and `type=to_card`,
+    exposes the same `parse_args()` method so it can be used with `get_arg_dict()`.
+    '''
+    fields = {
+        '_id':         _check_id,
+        'scryfall_id': _check_str,
+        'amount':      _check_amount,
+        'tag':         _check_taglist,
+        'foil':        _check_bool,
+        'condition':   _check_condition,
+        'signed':      _check_bool,
+        'altered':     _check_bool,
+        'misprint':    _check_bool,
+    }
+    # fields returned by the api which are silently dropped when sent back
+    read_only = { 'user_id', 'date_created' }
+
+    def __init__(self, key='cards'):
+        self.key = key
+
+    def parse_args(self):
+        '''
+        Parses the request body once and validates its `cards` list.
+
+        :raises CardValidationError(ValueError): containing every error found, prefixed with the card's index
+        :return: `{ 'cards': [ {...}, ... ] }`
+        '''
+        data = request.get_json(silent=True) or {}
+        if not isinstance(data, dict):
+            raise CardValidationError('request body should be a JSON object')
+        return { self.key: self.validate(data.get(self.key)) }
+
+    def validate(self, cards) -> list:
+        '''
+        Validates and coerces a list of card dictionaries.
+
+        :param cards: A list of card dictionaries, a single card dictionary or `None`
+        :raises CardValidationError(ValueError): containing every error found, prefixed with the card's index
+        :return: A list of coerced card dictionaries, with `None` values removed
+        '''
+        if cards is None:
+            return []
+        if not isinstance(cards, list):
+            cards = [ cards ]
+
+        fields, read_only = self.fields, self.read_only
+        key = self.key
+        res, errors = [], []
+        for i, item in enumerate(cards):
+            if isinstance(item, str):
+                try:
+                    item = json.loads(item)
+                except ValueError:
+                    pass
+            if not isinstance(item, dict):
+                errors += [ f'{key}[{i}]: should be an object' ]
+                continue
+
+            card = {}
+            for k, v in item.items():
+                if v is None:
+                    continue
+                k = k.lower()
+                check = fields.get(k)
+                if check is None:
+                    if k not in read_only:
+                        errors += [ f'{key}[{i}].{k}: unknown field' ]
+                    continue
+                try:
+                    card[k] = check(v)
+                except ValueError as e:
+                    errors += [ f'{key}[{i}].{k}: {e}' ]
+            if not ('_id' in card or 'scryfall_id' in card):
+                errors += [ f'{key}[{i}]: either `_id` or `scryfall_id` must be provided' ]
+            res += [ card ]
+
+        if errors:
+            raise CardValidationError(*errors)
+        return res
@@ -0,0 +1,68 @@
+'''
+Login burst benchmark.
+
+Fires concurrent logins at a running server while another set of clients reads `/collections`,
+and reports the throughput and latency of both. Compare runs with `BCRYPT_WORKERS=0` (inline hashing)
+against the default process pool to check that logins don't starve the collection endpoints.
+
+usage: `python -m benchmarks.logins <base_url> --username <name> --password <pw> [--concurrency 32] [--requests 500]`
+'''
+import argparse, json, time, threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+
+
+def fetch(req:Request):
+    start = time.perf_counter()
+    try:
+        with urlopen(req, timeout=60) as res:
+            body = res.read()
+            status = res.status
+    except HTTPError as e:
+        body, status = b'', e.code
+    return time.perf_counter() - start, status, body
+
+
+def report(name:str, results:list, elapsed:float):
+    latencies = sorted( t for t,_,_ in results )
+    errors = sum( 1 for _,status,_ in results if status >= 500 )
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e3
+    print(f'{name}:')
+    print(f'  requests:   {len(results)} ({errors} errors)')
+    print(f'  throughput: {len(results) / elapsed:.1f} req/s')
+    print(f'  latency:    p50 {pct(0.5):.1f} ms | p95 {pct(0.95):.1f} ms | p99 {pct(0.99):.1f} ms')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('base_url')
+    parser.add_argument('--username', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--concurrency', default=32, type=int)
+    parser.add_argument('--requests', default=500, type=int)
+    args = parser.parse_args()
+
+    credentials = json.dumps({ 'username': args.username, 'password': args.password }).encode()
+    login = lambda: Request(f'{args.base_url}/auth', data=credentials, headers={ 'Content-Type': 'application/json' }, method='POST')
+    _, status, body = fetch(login())
+    if status != 200:
+        raise SystemExit(f'login failed with status {status}')
+    token = json.loads(body)['access-token']
+    read = lambda: Request(f'{args.base_url}/collections', headers={ 'Authorization': f'Bearer {token}' })
+
+    def run(name, make_request):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            results = list(pool.map(lambda _: fetch(make_request()), range(args.requests)))
+        report(name, results, time.perf_counter() - start)
+
+    run('reads (baseline)', read)
+    burst = threading.Thread(target=run, args=('logins (burst)', login))
+    burst.start()
+    run('reads (during login burst)', read)
+    burst.join()
+
+
+if __name__ == '__main__':
+    main()
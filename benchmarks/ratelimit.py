@@ -0,0 +1,61 @@
+'''
+Rate limiter overhead benchmark.
+
+Measures the cost of a token bucket update per request for each backend, single threaded and
+from concurrent threads hitting a mix of shared and separate buckets, like a serving process does.
+The `mongo` backend is measured against a real server when a uri is given.
+
+usage: `python -m benchmarks.ratelimit [--mongo-uri <uri>] [--requests 10000] [--threads 8]`
+'''
+import argparse, time
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import MongoClient
+
+from app.ratelimit import MemoryBackend, MongoBackend
+
+
+def run(backend, requests:int, threads:int, keys:int):
+    def hit(i):
+        start = time.perf_counter()
+        backend.take(f'bench:{i % keys}', 300, 60)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if threads == 1:
+        latencies = [ hit(i) for i in range(requests) ]
+    else:
+        with ThreadPoolExecutor(threads) as pool:
+            latencies = list(pool.map(hit, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e6
+    print(f'  threads {threads:>2}, keys {keys:>5}: {requests / elapsed:>10,.0f} ops/s | p50 {pct(0.5):>8.1f} us | p99 {pct(0.99):>8.1f} us')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--mongo-uri', default=None)
+    parser.add_argument('--requests', default=10_000, type=int)
+    parser.add_argument('--threads', default=8, type=int)
+    args = parser.parse_args()
+
+    backends = [ ('memory', MemoryBackend()) ]
+    if args.mongo_uri:
+        client = MongoClient(args.mongo_uri)
+        collection = client.get_default_database()['ratelimits_bench']
+        collection.drop()
+        backends.append(('mongo', MongoBackend(collection)))
+
+    for name, backend in backends:
+        print(f'{name}:')
+        for threads in (1, args.threads):
+            for keys in (1, 1000): # one hot bucket, and many users
+                run(backend, args.requests, threads, keys)
+
+    if args.mongo_uri:
+        collection.drop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+'''
+Benchmark for the card document storage schema.
+
+Compares the BSON size of v1 and v2 card documents and of their `scryfall_id`
+index keys, on a sample of generated cards. Run `flask migrate-cards` against a
+real database to measure the actual collection and index sizes before and after.
+
+usage: `python -m benchmarks.schema`
+'''
+import uuid
+from datetime import datetime
+import bson
+from bson import ObjectId
+
+from app.models import schema
+
+
+def make_v1(i:int):
+    return {
+        '_id': ObjectId(),
+        'user_id': ObjectId(),
+        'scryfall_id': str(uuid.uuid4()),
+        'amount': 1 + i % 4,
+        'tag': [ 'Trade' ] if i % 3 else [],
+        'foil': bool(i % 2),
+        'condition': [ 'NM', 'LP', 'MP', 'HP', 'DAMAGED' ][i % 5],
+        'signed': False,
+        'altered': False,
+        'misprint': False,
+        'date_created': datetime.now(),
+        'public': False,
+    }
+
+
+def make_v2(doc:dict):
+    res = { k:v for k,v in doc.items() if k not in schema.FLAGS }
+    res.update(schema.encode(doc))
+    return res
+
+
+def main():
+    n = 10_000
+    v1 = [ make_v1(i) for i in range(n) ]
+    v2 = [ make_v2(doc) for doc in v1 ]
+    v1_size = sum( len(bson.encode(doc)) for doc in v1 )
+    v2_size = sum( len(bson.encode(doc)) for doc in v2 )
+    v1_key = sum( len(bson.encode({ '': doc['scryfall_id'] })) for doc in v1 )
+    v2_key = sum( len(bson.encode({ '': doc['scryfall_id'] })) for doc in v2 )
+    print(f'{n} cards')
+    print(f'  document:         v1 {v1_size / n:6.1f} B | v2 {v2_size / n:6.1f} B | -{100 * (1 - v2_size / v1_size):.0f}%')
+    print(f'  scryfall_id key:  v1 {v1_key / n:6.1f} B | v2 {v2_key / n:6.1f} B | -{100 * (1 - v2_key / v1_key):.0f}%')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+'''
+HTTP throughput benchmark.
+
+Fires concurrent requests at a running server and reports requests per second and latency percentiles.
+Used to compare serving profiles, e.g. the bare `gunicorn wsgi:app` against `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+Results for `GET /users/<username>/collection` (50 cards, app backed by `mongomock`, 1 CPU,
+2000 requests from 32 threads, two runs each):
+
+    | profile                                  | throughput    | p50        | p95        |
+    |------------------------------------------|---------------|------------|------------|
+    | `gunicorn wsgi:app` (1 sync worker)      | 166-176 req/s | 184-192 ms | 206-211 ms |
+    | `gunicorn -c gunicorn.conf.py` (gevent)  | 189-192 req/s | 168-172 ms | 194-200 ms |
+
+With a single CPU and an in-process database the gain is small, the profile's workers and greenlets
+pay off when requests wait on a networked MongoDB, which was not available for this run.
+
+usage: `python -m benchmarks.throughput <url> [--token <jwt>] [--concurrency 32] [--requests 2000]`
+'''
+import argparse, time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import Request, urlopen
+from urllib.error import HTTPError
+
+
+def fetch(url:str, headers:dict):
+    start = time.perf_counter()
+    try:
+        with urlopen(Request(url, headers=headers), timeout=60) as res:
+            res.read()
+            status = res.status
+    except HTTPError as e:
+        status = e.code
+    return time.perf_counter() - start, status
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('url')
+    parser.add_argument('--token', default=None)
+    parser.add_argument('--concurrency', default=32, type=int)
+    parser.add_argument('--requests', default=2000, type=int)
+    args = parser.parse_args()
+
+    headers = { 'Authorization': f'Bearer {args.token}' } if args.token else {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        results = list(pool.map(lambda _: fetch(args.url, headers), range(args.requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted( t for t,_ in results )
+    errors = sum( 1 for _,status in results if status >= 500 )
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e3
+    print(f'requests:   {args.requests} ({errors} errors)')
+    print(f'throughput: {args.requests / elapsed:.1f} req/s')
+    print(f'latency:    p50 {pct(0.5):.1f} ms | p95 {pct(0.95):.1f} ms | p99 {pct(0.99):.1f} ms')
+
+
+if __name__ == '__main__':
+    main()
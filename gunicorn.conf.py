@@ -0,0 +1,71 @@
+'''
+Gunicorn serving profile.
+
+usage: `gunicorn -c gunicorn.conf.py wsgi:app`
+
+Tunable using environment variables:
+    - `WEB_CONCURRENCY`:       number of worker processes, defaults to `2 * CPUs + 1`
+    - `GUNICORN_WORKER_CLASS`: `gevent` (default) or `gthread`
+    - `GUNICORN_CONNECTIONS`:  greenlets per `gevent` worker, defaults to `100`
+    - `GUNICORN_THREADS`:      threads per `gthread` worker, defaults to `4`
+    - `GUNICORN_TIMEOUT`:      worker timeout in seconds, defaults to `120` to fit bulk endpoints
+    - `BCRYPT_WORKERS`:        password hashing processes per worker, defaults to `1`
+    - `EVENTS_MAX_STREAMS`:    open `/collections/events` streams per worker, defaults to half its concurrency
+
+`gevent` workers serve event streams without holding a thread each, with `gthread` workers
+a few open streams take up most of a worker's threads.
+'''
+import os, multiprocessing
+
+
+## server socket ##
+bind = f'0.0.0.0:{os.getenv("PORT", "8000")}'
+
+## workers ##
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+if worker_class == 'gevent':
+    # patch before the app is preloaded, patching in the workers would be too late
+    from gevent import monkey
+    monkey.patch_all()
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+if worker_class == 'gevent':
+    worker_connections = int(os.getenv('GUNICORN_CONNECTIONS', 100))
+    threads = 1
+else:
+    threads = int(os.getenv('GUNICORN_THREADS', 4))
+
+## load the app once in the master, workers share its memory using copy-on-write ##
+preload_app = True
+
+## timeouts ##
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+## recycle workers to bound memory growth ##
+max_requests = 2000
+max_requests_jitter = 200
+
+
+## mongodb connection pools ##
+# one request holds at most one connection at a time, keep a few spare for background threads
+concurrency = worker_connections if worker_class == 'gevent' else threads
+os.environ.setdefault('MONGO_MAX_POOL_SIZE', str(concurrency + 4))
+os.environ.setdefault('MONGO_MIN_POOL_SIZE', str(min(concurrency, 4)))
+
+## event streams, each holds a thread (or greenlet) while open ##
+os.environ.setdefault('EVENTS_MAX_STREAMS', str(max(1, concurrency // 2)))
+
+
+def pre_fork(server, worker):
+    # the master may have connected while preloading, clients and process pools are not fork-safe
+    from app import mongo, hasher
+    mongo.close()
+    hasher.close()
+
+
+def post_fork(server, worker):
+    from app import mongo, hasher
+    mongo.reset()
+    mongo.connect()
+    hasher.reset()
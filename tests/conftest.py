@@ -0,0 +1,67 @@
+'''
+Shared fixtures, the app runs against `mongomock`, see "Local Development" in the README.
+
+usage: `pip install -r requirements-dev.txt && python -m pytest`
+'''
+import mongomock, pytest
+
+from app import create_app, ensure_indexes, mongo, cards_db
+from app.models import UserModel, CardModel
+
+
+@pytest.fixture
+def app():
+    app = create_app({
+        'TESTING': True,
+        'MONGO_CLIENT': mongomock.MongoClient(),
+        'MONGO_DBNAME': 'magicdex_test',
+        'MONGO_SECONDARY_READS': False,
+        'REQUEST_TIMEOUT': 0, # `mongomock` doesn't take `maxTimeMS` everywhere
+        'SECRET_KEY': 'test',
+        'JWT_SECRET_KEY': 'test',
+        'BCRYPT_LOG_ROUNDS': 4,
+        'BCRYPT_WORKERS': 0,
+        'RATELIMIT_BACKEND': 'memory',
+        'PUBLIC_CACHE_MAX_BYTES': 0,
+        'SSLIFY': False,
+    })
+    with app.app_context():
+        ensure_indexes()
+        yield app
+    mongo.close()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def user(app):
+    return UserModel(username='tester', public=True).create('password')
+
+
+@pytest.fixture
+def auth(user):
+    return { 'Authorization': f'Bearer {user.create_access_token()}' }
+
+
+def add_cards(user:UserModel, *cards:dict):
+    '''
+    Inserts or updates cards in a user's collection, same as `POST /collections`.
+
+    :param cards: `CardModel` keyword arguments
+    :return: The results of `CollectionModel.save()`
+    '''
+    return user.collection.update([ CardModel(parent=user.collection, **card) for card in cards ]).save()
+
+
+def stored(user:UserModel) -> dict:
+    '''
+    :return: The user's cards as stored in the database, `{scryfall_id: amount}`
+    '''
+    res = {}
+    for item in cards_db.find({ 'user_id': user.user_id }):
+        card = CardModel.from_mongo(user.collection, item)
+        res[card.scryfall_id] = res.get(card.scryfall_id, 0) + card.amount
+    return res
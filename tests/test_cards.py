@@ -0,0 +1,26 @@
+import pytest
+from bson import ObjectId
+
+from app.models import CardModel
+
+
+USER_ID = ObjectId()
+
+
+def card(**kwargs):
+    return CardModel(user_id=USER_ID, scryfall_id='4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01', amount=1, **kwargs)
+
+
+def test_identity_uses_normalized_tags():
+    tagged = card(tag=['Trade', 'binder', 'trade'])
+    assert tagged.identity()[2] == tagged.normalized_tags() == ('binder', 'trade')
+    assert tagged == card(tag=['BINDER', 'Trade'])
+    assert tagged != card(tag=['binder'])
+
+
+def test_cards_are_keyed_on_identity():
+    with pytest.raises(TypeError):
+        hash(card())
+
+    cards = [ card(tag=['Trade']), card(tag=['trade', 'TRADE']), card(tag=['binder']) ]
+    assert len({ c.identity() for c in cards }) == 2
@@ -0,0 +1,53 @@
+import gzip, json, zlib
+import pytest
+from flask import Response
+
+from app import compress
+from conftest import add_cards
+
+
+@pytest.fixture
+def collection(user):
+    add_cards(user, *[ { 'scryfall_id': f'4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a{i:02d}', 'amount': 1 } for i in range(20) ])
+
+
+def test_gzip_and_weak_etag(client, auth, collection):
+    plain = client.get('/collections', headers=auth)
+    assert len(plain.data) >= compress.min_size and 'Content-Encoding' not in plain.headers
+    assert 'Accept-Encoding' in plain.headers['Vary']
+    assert plain.get_etag()[1] is False
+
+    res = client.get('/collections', headers={ **auth, 'Accept-Encoding': 'gzip' })
+    assert res.headers['Content-Encoding'] == 'gzip' and 'Accept-Encoding' in res.headers['Vary']
+    assert len(res.data) < len(plain.data)
+    assert json.loads(gzip.decompress(res.data)) == plain.get_json()
+
+    # same representation, weakly equal to the uncompressed one
+    etag, weak = res.get_etag()
+    assert weak and etag == plain.get_etag()[0]
+    for encoding in ('gzip', 'identity'):
+        res = client.get('/collections', headers={ **auth, 'Accept-Encoding': encoding, 'If-None-Match': f'W/"{etag}"' })
+        assert res.status_code == 304 and not res.data
+
+
+def test_negotiation(client, auth, collection, monkeypatch):
+    res = client.get('/collections', headers={ **auth, 'Accept-Encoding': 'gzip;q=0, identity' })
+    assert 'Content-Encoding' not in res.headers
+    res = client.get('/collections', headers={ **auth, 'Accept-Encoding': 'br;q=1.0, gzip;q=0.5' }) # `br` only if `brotli` is installed
+    assert res.headers['Content-Encoding'] == ('br' if 'br' in compress.encodings else 'gzip')
+
+    monkeypatch.setattr(compress, 'min_size', 1024 * 1024)
+    res = client.get('/collections', headers={ **auth, 'Accept-Encoding': 'gzip' })
+    assert 'Content-Encoding' not in res.headers # too small to be worth it
+
+
+def test_streamed_chunks(app, client):
+    chunks = [ f'{i},' * 100 for i in range(5) ]
+    app.add_url_rule('/test/stream', 'test_stream', lambda: Response(iter(chunks), mimetype='text/csv'))
+
+    res = client.get('/test/stream', headers={ 'Accept-Encoding': 'gzip' }, buffered=False)
+    assert res.headers['Content-Encoding'] == 'gzip' and 'Content-Length' not in res.headers
+    decompressor = zlib.decompressobj(31)
+    received = [ decompressor.decompress(data) for data in res.response ]
+    assert received[:len(chunks)] == [ chunk.encode() for chunk in chunks ] # each chunk readable as soon as it is sent
+    assert b''.join(received) + decompressor.flush() == ''.join(chunks).encode()
@@ -0,0 +1,24 @@
+from app import users_db
+from app.models import UserModel, CollectionModel
+from conftest import add_cards
+
+
+BOLT = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01'
+CHOP = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a02'
+
+
+def test_new_users_start_with_counters(user):
+    assert UserModel(user.user_id).counters == { 'doc_count': 0, 'card_count': 0, 'unique_count': 0 }
+
+
+def test_reads_count_without_reconciling(client, auth, user, monkeypatch):
+    monkeypatch.setattr(CollectionModel, '_reconcile_tags', lambda self: None) # `mongomock` lacks pipeline updates
+    add_cards(user, { 'scryfall_id': BOLT, 'amount': 2 })
+    users_db.update_one({ '_id': user.user_id }, { '$unset': { k: '' for k in UserModel.COUNTERS } }) # a user from before counters
+
+    res = client.get('/collections', headers=auth)
+    assert res.status_code == 200 and res.json['total_documents'] == 1
+    assert 'doc_count' not in users_db.find_one({ '_id': user.user_id }) # nothing written
+
+    add_cards(UserModel(user.user_id), { 'scryfall_id': CHOP, 'amount': 3 })
+    assert UserModel(user.user_id).counters == { 'doc_count': 2, 'card_count': 5, 'unique_count': 2 }
@@ -0,0 +1,83 @@
+import time
+import pytest
+from pymongo.errors import ExecutionTimeout
+
+from app import mongo, users_db
+from app.database import CircuitBreaker, Mongo
+from app.utils import DatabaseUnavailable
+
+
+COOLDOWN = 0.05
+
+
+@pytest.fixture
+def breaker(app):
+    mongo.breaker = CircuitBreaker(threshold=2, cooldown=COOLDOWN)
+    state = { 'failing': False }
+
+    def probe():
+        users_db.find_one({})
+        if state['failing']:
+            raise ExecutionTimeout('operation exceeded time limit')
+        users_db.find_one({}) # endpoints make several calls
+        return { 'ok': True }
+
+    app.add_url_rule('/test/breaker', 'test_breaker', probe)
+    mongo.breaker.state = state
+    return mongo.breaker
+
+
+def test_breaker_open_half_open_closed(client, breaker):
+    breaker.state['failing'] = True
+    assert client.get('/test/breaker').status_code == 503
+    assert not breaker.is_open
+    assert client.get('/test/breaker').status_code == 503
+    assert breaker.is_open
+
+    # open, rejected without reaching the endpoint
+    breaker.state['failing'] = False
+    res = client.get('/test/breaker')
+    assert res.status_code == 503 and res.headers['Retry-After'] == '1'
+    assert breaker.is_open
+
+    # half open, every call of the probing request goes through, and its success closes the breaker
+    time.sleep(COOLDOWN)
+    assert client.get('/test/breaker').status_code == 200
+    assert not breaker.is_open
+    assert client.get('/test/breaker').status_code == 200
+
+
+def test_breaker_failed_probe_reopens(client, breaker):
+    breaker.state['failing'] = True
+    client.get('/test/breaker')
+    client.get('/test/breaker')
+    time.sleep(COOLDOWN)
+    assert client.get('/test/breaker').status_code == 503 # the probe
+    assert breaker.is_open
+    breaker.state['failing'] = False
+    assert client.get('/test/breaker').status_code == 503
+    time.sleep(COOLDOWN)
+    assert client.get('/test/breaker').status_code == 200
+
+
+def test_breaker_abandoned_probe_is_replaced():
+    breaker = CircuitBreaker(threshold=1, cooldown=COOLDOWN)
+    breaker.failure()
+    time.sleep(COOLDOWN)
+    assert breaker.allow() # a probe that never settles
+    with pytest.raises(DatabaseUnavailable):
+        breaker.allow()
+    time.sleep(COOLDOWN)
+    assert breaker.allow()
+    breaker.success()
+    assert not breaker.is_open and breaker.allow() is False
+
+
+def test_read_your_writes_window_covers_staleness():
+    mongo = Mongo()
+    with pytest.raises(ValueError):
+        mongo.init('mongodb://localhost/test', secondary_reads=True, max_staleness=90, read_your_writes=100)
+    with pytest.raises(ValueError):
+        mongo.init('mongodb://localhost/test', secondary_reads=True, max_staleness=90, read_your_writes=105, heartbeatFrequencyMS=20_000)
+    mongo.init('mongodb://localhost/test', secondary_reads=True, max_staleness=90, read_your_writes=120)
+    mongo.init('mongodb://localhost/test', secondary_reads=False, read_your_writes=0) # every read goes to the primary
@@ -0,0 +1,112 @@
+from contextlib import nullcontext
+from datetime import datetime, timedelta
+import mongomock, pytest
+from bson import ObjectId
+
+from app import cards_db, journal_db, migrations_db
+from app.models import CollectionModel, UserModel, schema
+from conftest import stored
+
+
+BOLT = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01'
+CHOP = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a02'
+
+
+class Session():
+    '''
+    `mongomock` has no sessions, runs the transaction's writes as they come, without rolling them back.
+    '''
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+    def start_transaction(self):
+        return nullcontext()
+
+
+def card(user, scryfall_id, amount, age, **fields):
+    return {
+        '_id': ObjectId(),
+        'user_id': user.user_id,
+        'scryfall_id': scryfall_id,
+        'amount': amount,
+        'tag': [],
+        'foil': False,
+        'condition': 'NM',
+        'signed': False,
+        'altered': False,
+        'misprint': False,
+        'date_created': datetime.now() - timedelta(days=age),
+        **fields,
+    }
+
+
+@pytest.fixture
+def duplicated(user, monkeypatch):
+    '''
+    Duplicates saved before writes were deduplicated, in both schema versions and with tags differing by case.
+    '''
+    bulk_write = mongomock.collection.Collection.bulk_write
+    monkeypatch.setattr(mongomock.MongoClient, 'start_session', lambda self, **kwargs: Session())
+    monkeypatch.setattr(mongomock.collection.Collection, 'bulk_write', lambda self, requests, session=None, **kwargs: bulk_write(self, requests, **kwargs))
+    monkeypatch.setattr(CollectionModel, '_reconcile_tags', lambda self: None) # `mongomock` lacks pipeline updates
+    oldest = card(user, BOLT, 1, age=3, tag=['Trade'])
+    v2 = card(user, BOLT, 2, age=1, tag=['trade', 'TRADE'])
+    v2 = { **{ k:v for k,v in v2.items() if k not in schema.FLAGS }, **schema.encode(v2) }
+    cards_db.insert_many([
+        oldest,
+        card(user, BOLT, 4, age=2, tag=['trade']),
+        v2,
+        card(user, BOLT, 8, age=1, tag=['trade'], foil=True), # not a duplicate
+        card(user, CHOP, 1, age=1),
+    ])
+    UserModel(username='tester').collection.reconcile()
+    return oldest['_id']
+
+
+def test_duplicates_found_across_versions(user, duplicated):
+    groups = UserModel(username='tester').collection.duplicates()
+    assert len(groups) == 1 and len(groups[0]) == 3
+    assert groups[0][0]['_id'] == duplicated # earliest first
+
+
+def test_merge_into_earliest(user, duplicated):
+    collection = UserModel(username='tester').collection
+    before = stored(user)
+    assert collection.merge_duplicates(collection.duplicates()) == 2
+
+    assert stored(user) == before
+    assert cards_db.find_one({ '_id': duplicated })['amount'] == 7
+    assert cards_db.count_documents({ 'user_id': user.user_id }) == 3
+    assert UserModel(username='tester').collection.duplicates() == []
+    assert UserModel(username='tester').collection.reconcile() == {} # counters followed the merge
+    assert journal_db.count_documents({ 'user_id': user.user_id }) == 3 # one update, two deletes
+
+
+def test_merge_aborts_on_concurrent_write(user, duplicated, monkeypatch):
+    collection = UserModel(username='tester').collection
+    groups = collection.duplicates()
+    fetch = CollectionModel.fetch
+    def fetch_then_write(self, *args, **kwargs):
+        res = fetch(self, *args, **kwargs)
+        cards_db.update_one({ '_id': duplicated }, { '$inc': { 'amount': 1 } }) # a write landing meanwhile
+        return res
+    monkeypatch.setattr(CollectionModel, 'fetch', fetch_then_write)
+
+    with pytest.raises(RuntimeError, match='changed while merging'):
+        collection.merge_duplicates(groups)
+    assert journal_db.count_documents({ 'user_id': user.user_id }) == 0 # not recorded, the transaction rolls the writes back
+
+
+def test_merge_duplicates_command(app, user, duplicated):
+    runner = app.test_cli_runner()
+    res = runner.invoke(args=[ 'merge-duplicates', '--dry-run' ])
+    assert res.exit_code == 0 and '2 extra document(s) found in 1 user(s)' in res.output
+    assert cards_db.count_documents({ 'user_id': user.user_id }) == 5
+
+    res = runner.invoke(args=[ 'merge-duplicates', '--batch-size', '2' ])
+    assert res.exit_code == 0 and '2 document(s) merged in total' in res.output
+    assert cards_db.count_documents({ 'user_id': user.user_id }) == 3
+    assert migrations_db.find_one({ '_id': 'merge_duplicates' }) is None # done, the next run starts over
@@ -0,0 +1,34 @@
+from app import journal_db
+from app.models import UserModel
+from conftest import add_cards
+
+
+def test_collection_etag(client, user, auth):
+    add_cards(user, { 'scryfall_id': '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01', 'amount': 1 })
+    res = client.get('/collections', headers=auth)
+    etag = res.headers['ETag']
+    assert res.status_code == 200 and etag
+
+    res = client.get('/collections', headers={ **auth, 'If-None-Match': etag })
+    assert res.status_code == 304 and res.headers['ETag'] == etag and not res.data
+    assert client.get('/collections', headers={ **auth, 'If-None-Match': f'W/{etag}' }).status_code == 304
+    assert client.get('/collections?per_page=5', headers={ **auth, 'If-None-Match': etag }).status_code == 200
+
+    add_cards(UserModel(username='tester'), { 'scryfall_id': '5b1b9ce7-01c2-4d5d-8a2b-7c3f8c9f1b02', 'amount': 1 })
+    res = client.get('/collections', headers={ **auth, 'If-None-Match': etag })
+    assert res.status_code == 200 and res.headers['ETag'] != etag
+
+
+def test_changes_etag_follows_returned_changes(client, user, auth):
+    add_cards(user, { 'scryfall_id': '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01', 'amount': 1 })
+    pending = journal_db.find_one_and_delete({ 'user_id': user.user_id, 'seq': 1 }) # as if still being appended
+
+    res = client.get('/collections/changes?since=0', headers=auth)
+    etag = res.headers['ETag']
+    assert res.get_json()['changes'] == [] and res.get_json()['has_more']
+    assert client.get('/collections/changes?since=0', headers={ **auth, 'If-None-Match': etag }).status_code == 304
+
+    journal_db.insert_one(pending)
+    res = client.get('/collections/changes?since=0', headers={ **auth, 'If-None-Match': etag })
+    assert res.status_code == 200 and len(res.get_json()['changes']) == 1
+    assert res.headers['ETag'] != etag
@@ -0,0 +1,90 @@
+import json
+import pytest
+
+from app import events
+from app.models import UserModel
+from conftest import add_cards
+
+
+BOLT = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01'
+CHOP = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a02'
+
+
+@pytest.fixture
+def streaming(app):
+    app.config['EVENTS_HEARTBEAT'] = 0.05
+    events.init(max_streams=1, change_stream=False) # `mongomock` has no change streams
+
+
+class Stream():
+    '''
+    Reads a `text/event-stream` response one message at a time.
+    '''
+    def __init__(self, res):
+        self.res = res
+        self.chunks = iter(res.response)
+
+    def next(self) -> dict:
+        message = {}
+        for line in next(self.chunks).decode().strip().split('\n'):
+            k, _, v = line.partition(': ') if not line.startswith(':') else ('comment', '', line[2:])
+            message[k] = json.loads(v) if k == 'data' else v
+        return message
+
+    def close(self):
+        self.res.close()
+
+
+def open_stream(client, auth, **headers):
+    res = client.get('/collections/events', headers={ **auth, **headers }, buffered=False)
+    assert res.status_code == 200 and res.mimetype == 'text/event-stream'
+    return Stream(res)
+
+
+def test_ready_changes_and_heartbeats(client, user, auth, streaming):
+    stream = open_stream(client, auth)
+    assert stream.next() == { 'retry': '3000' }
+    assert stream.next() == { 'id': '0', 'event': 'ready', 'data': { 'version': 0 } }
+
+    add_cards(user, { 'scryfall_id': BOLT, 'amount': 2 }) # wakes the stream up
+    change = stream.next()
+    assert (change['id'], change['event']) == ('1', 'change')
+    assert change['data']['action'] == 'CREATED' and change['data']['amount'] == 2
+
+    assert stream.next() == { 'comment': 'heartbeat' }
+    assert events.streams == 1
+    stream.close()
+    assert events.streams == 0
+
+
+def test_resume_after_last_event_id(client, user, auth, streaming):
+    add_cards(user, { 'scryfall_id': BOLT, 'amount': 1 })
+    add_cards(UserModel(username='tester'), { 'scryfall_id': CHOP, 'amount': 1 })
+
+    stream = open_stream(client, auth, **{ 'Last-Event-ID': '1' })
+    assert stream.next() == { 'retry': '3000' }
+    assert stream.next()['id'] == '2' # no `ready`, only what was missed
+    stream.close()
+
+    stream = open_stream(client, auth, **{ 'Last-Event-ID': 'garbage' })
+    stream.next()
+    assert stream.next() == { 'id': '2', 'event': 'resync', 'data': { 'version': 2 } }
+    stream.close()
+
+
+def test_stream_limit(client, user, auth, streaming):
+    stream = open_stream(client, auth)
+    stream.next()
+    res = client.get('/collections/events', headers=auth)
+    assert res.status_code == 503 and res.headers['Retry-After'] == '5'
+    stream.close()
+    open_stream(client, auth).close()
+
+
+def test_stream_closes_after_max_age(app, client, user, auth, streaming):
+    app.config['EVENTS_MAX_AGE'] = 0
+    stream = open_stream(client, auth)
+    assert [ m.get('event') for m in (stream.next(), stream.next()) ] == [ None, 'ready' ]
+    with pytest.raises(StopIteration):
+        stream.next() # clients reconnect with `Last-Event-ID`
+    stream.close()
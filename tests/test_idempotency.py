@@ -0,0 +1,74 @@
+import threading, time
+from datetime import timedelta
+import pytest
+from flask_jwt_extended import jwt_required
+
+from app.models import IdempotencyModel
+from app.routes.collections.route_utils import idempotent
+
+
+LEASE = 0.1
+
+
+@pytest.fixture
+def slow(app, monkeypatch):
+    '''
+    An idempotent endpoint running several leases long, counting its executions.
+    '''
+    monkeypatch.setattr(IdempotencyModel, 'LEASE', timedelta(seconds=LEASE))
+    monkeypatch.setattr(IdempotencyModel, 'WAIT', 10 * LEASE)
+    state = { 'executions': 0 }
+
+    @idempotent
+    def view(self):
+        state['executions'] += 1
+        time.sleep(5 * LEASE)
+        return { 'execution': state['executions'] }, 201
+
+    app.add_url_rule('/test/idempotent', 'test_idempotent', jwt_required()(lambda: view(None)), methods=['POST'])
+    return state
+
+
+def post(client, auth, key='key', body=b'{}'):
+    return client.post('/test/idempotent', data=body, headers={ **auth, 'Idempotency-Key': key }, content_type='application/json')
+
+
+def test_concurrent_duplicates_execute_once(app, auth, slow):
+    results = []
+    def send():
+        results.append(post(app.test_client(), auth))
+
+    threads = [ threading.Thread(target=send) ]
+    threads[0].start()
+    time.sleep(LEASE / 2)
+    threads += [ threading.Thread(target=send) for _ in range(3) ]
+    for thread in threads[1:]:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert slow['executions'] == 1
+    assert sorted( res.status_code for res in results ) == [201] * 4
+    assert sum( res.headers.get('Idempotent-Replayed') == 'true' for res in results ) == 3
+    assert all( res.get_json() == { 'execution': 1 } for res in results )
+
+
+def test_retry_with_other_body_rejected(client, auth, slow):
+    assert post(client, auth).status_code == 201
+    assert post(client, auth, body=b'{"a": 1}').status_code == 422
+    assert post(client, auth, key='other').status_code == 201
+    assert slow['executions'] == 2
+
+
+def test_abandoned_record_taken_over(user, monkeypatch):
+    record, claimed = IdempotencyModel.begin(user.user_id, 'POST /test', 'key', 'fingerprint')
+    assert claimed
+    duplicate, claimed = IdempotencyModel.begin(user.user_id, 'POST /test', 'key', 'fingerprint')
+    assert not claimed
+
+    # never renewed, e.g. its worker died
+    time.sleep(0.01) # dates are stored to the millisecond, the takeover's should differ
+    monkeypatch.setattr(IdempotencyModel, 'LEASE', timedelta(0))
+    duplicate, claimed = duplicate.wait(timeout=1)
+    assert claimed
+    assert not record.renew() # the first execution lost its claim
@@ -0,0 +1,110 @@
+import sys, time
+from datetime import timedelta
+import pytest
+
+from app import jobs_db
+from app.jobs.handlers import handlers
+from app.models import UserModel, JobModel
+from conftest import add_cards, stored
+
+
+BOLT = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01'
+CHOP = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a02'
+ELK  = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a03'
+
+
+class Interrupted(Exception):
+    pass
+
+
+def interrupt(monkeypatch, when):
+    '''
+    Makes `JobModel.update_progress()` raise once `when(done, checkpoint)` holds, as if the worker died.
+    '''
+    update_progress = JobModel.update_progress
+    def inner(self, done, total=None, checkpoint=None):
+        if when(done, checkpoint):
+            raise Interrupted()
+        update_progress(self, done, total, checkpoint)
+    monkeypatch.setattr(JobModel, 'update_progress', inner)
+
+
+def queue(client, auth, **body):
+    res = client.post('/jobs', json=body, headers=auth)
+    assert res.status_code == 202
+    return res.json['_id']
+
+
+def test_import_stores_inputs_outside_the_job(client, auth, user, monkeypatch):
+    monkeypatch.setattr(JobModel, 'INPUT_CHUNK_SIZE', 2)
+    job_id = queue(client, auth, kind='import', cards=[ { 'scryfall_id': i, 'amount': 1 } for i in (BOLT, CHOP, ELK) ])
+    data = jobs_db.find_one({ '_id': JobModel.get(job_id, user.user_id)._id })
+    assert 'cards' not in data['params']
+    assert (data['params']['inputs'], data['params']['input_chunks']) == (3, 2)
+
+    handlers['import'](JobModel.get(job_id, user.user_id))
+    job = JobModel.get(job_id, user.user_id)
+    assert job.status == JobModel.DONE and job.result == { 'CREATED': 3 }
+    assert stored(user) == { BOLT: 1, CHOP: 1, ELK: 1 }
+
+
+@pytest.mark.parametrize('crash', [ 'after_plan', 'after_apply' ])
+def test_import_resume_applies_relative_amounts_once(client, auth, user, monkeypatch, crash):
+    add_cards(user, { 'scryfall_id': BOLT, 'amount': 2 })
+    job_id = queue(client, auth, kind='import', cards=[ { 'scryfall_id': BOLT, 'amount': '+2' }, { 'scryfall_id': CHOP, 'amount': 1 } ])
+
+    with monkeypatch.context() as m:
+        if crash == 'after_plan':
+            interrupt(m, lambda done, checkpoint: checkpoint and checkpoint.get('plan') is not None)
+        else:
+            interrupt(m, lambda done, checkpoint: checkpoint and checkpoint.get('seq') == 1)
+        with pytest.raises(Interrupted):
+            handlers['import'](JobModel.get(job_id, user.user_id))
+
+    handlers['import'](JobModel.get(job_id, user.user_id)) # resumed
+    job = JobModel.get(job_id, user.user_id)
+    assert job.status == JobModel.DONE and job.result == { 'UPDATED': 1, 'CREATED': 1 }
+    assert stored(user) == { BOLT: 4, CHOP: 1 }
+
+
+def test_clear_resume_keeps_total(client, auth, user, monkeypatch):
+    add_cards(user, *[ { 'scryfall_id': i, 'amount': 1 } for i in (BOLT, CHOP, ELK) ])
+    monkeypatch.setattr(sys.modules['app.jobs.handlers'], 'CHUNK_SIZE', 1) # shadowed by `app.jobs.handlers`
+    job_id = queue(client, auth, kind='clear')
+
+    with monkeypatch.context() as m:
+        interrupt(m, lambda done, checkpoint: done == 2)
+        with pytest.raises(Interrupted):
+            handlers['clear'](JobModel.get(job_id, user.user_id))
+
+    handlers['clear'](JobModel.get(job_id, user.user_id))
+    job = JobModel.get(job_id, user.user_id)
+    assert job.progress == { 'done': 3, 'total': 3 }
+    assert job.result == { 'deleted': 3 }
+    assert stored(user) == {}
+
+
+def test_lease_renewed_while_handler_runs(client, auth, user, monkeypatch):
+    monkeypatch.setattr(JobModel, 'LEASE', timedelta(seconds=0.1))
+    queue(client, auth, kind='reindex')
+    job = JobModel.claim('first')
+
+    with job.held():
+        time.sleep(0.5) # a single step running several leases long, e.g. a snapshot
+        assert JobModel.claim('second') is None
+    time.sleep(0.2)
+    assert JobModel.claim('second')._id == job._id # not renewed anymore, as if the first worker died
+    assert not job.renew()
+
+
+def test_crashing_job_given_up(client, auth, user, monkeypatch):
+    monkeypatch.setattr(JobModel, 'LEASE', timedelta(0))
+    monkeypatch.setattr(JobModel, 'MAX_ATTEMPTS', 2)
+    job_id = queue(client, auth, kind='reindex')
+
+    for attempt in (1, 2): # its worker dies without failing it
+        assert JobModel.claim('worker').attempts == attempt
+        time.sleep(0.01) # dates are stored to the millisecond
+    assert JobModel.claim('worker') is None
+    job = JobModel.get(job_id, user.user_id)
+    assert job.status == JobModel.FAILED and 'after 2 attempts' in job.error
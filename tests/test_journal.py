@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+import pytest
+
+from app import journal_db
+from app.models import UserModel
+from conftest import add_cards
+
+
+IDS = [ f'4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a0{i}' for i in range(1, 5) ]
+
+
+@pytest.fixture
+def journal(user):
+    for scryfall_id in IDS: # one write per card, seq 1 to 4
+        add_cards(UserModel(username='tester'), { 'scryfall_id': scryfall_id, 'amount': 1 })
+    return UserModel(username='tester').collection.journal
+
+
+def seqs(entries):
+    return [ entry['seq'] for entry in entries ]
+
+
+def test_since(journal):
+    entries, full_resync, has_more = journal.since(0)
+    assert seqs(entries) == [1, 2, 3, 4] and not full_resync and not has_more
+    assert 'date_created' not in entries[0]
+
+    entries, full_resync, has_more = journal.since(1, limit=2)
+    assert seqs(entries) == [2, 3] and not full_resync and has_more
+    assert journal.since(4) == ([], False, False)
+    assert journal.since(5) == ([], True, False)
+
+
+def test_since_stops_at_pending_entry(journal):
+    # seq 2 is still being appended by a concurrent write
+    journal_db.delete_one({ 'user_id': journal.user_id, 'seq': 2 })
+
+    entries, full_resync, has_more = journal.since(0)
+    assert seqs(entries) == [1] and not full_resync and has_more
+    assert journal.since(1) == ([], False, True)
+
+
+def test_since_lost_entry_resyncs(journal):
+    journal_db.delete_one({ 'user_id': journal.user_id, 'seq': 2 })
+    journal_db.update_many(
+        { 'user_id': journal.user_id },
+        { '$set': { 'date_created': datetime.now() - 2 * journal.PENDING_TIMEOUT } }
+    )
+    assert journal.since(1) == ([], True, False)
+
+
+def test_since_expired_resyncs(journal):
+    journal_db.delete_many({ 'user_id': journal.user_id, 'seq': { '$lte': 2 } })
+    assert journal.since(0) == ([], True, False)
+    assert seqs(journal.since(2)[0]) == [3, 4]
+
+
+def test_changes_endpoint(client, auth, journal):
+    journal_db.delete_one({ 'user_id': journal.user_id, 'seq': 3 })
+    res = client.get('/collections/changes?since=0', headers=auth).get_json()
+    assert [ c['seq'] for c in res['changes'] ] == [1, 2]
+    assert res['version'] == 4 and res['has_more'] and not res['full_resync']
+    assert res['changes'][0]['action'] == 'CREATED' and res['changes'][0]['card']['amount'] == 1
@@ -0,0 +1,78 @@
+import subprocess, sys, textwrap
+import pytest
+
+from app import hasher
+from app.passwords import PasswordHasher
+from app.utils import ServerBusy
+
+
+@pytest.fixture
+def pooled():
+    hasher = PasswordHasher(rounds=4, workers=1, timeout=30)
+    yield hasher
+    hasher.close()
+
+
+def test_pool_hashes_and_checks(pooled):
+    pw_hash = pooled.hash('password')
+    assert pooled.check(pw_hash, 'password') and not pooled.check(pw_hash, 'other')
+
+
+def test_timeout_is_busy(pooled):
+    pooled.timeout = 0 # the pool's process can't even start in time
+    with pytest.raises(ServerBusy):
+        pooled.hash('password')
+    with pytest.raises(ServerBusy):
+        pooled.check('$2b$04$' + 'a' * 53, 'password')
+
+
+def test_timeout_is_503(client, user, auth, monkeypatch):
+    monkeypatch.setattr(hasher, 'workers', 1)
+    monkeypatch.setattr(hasher, 'timeout', 0)
+    try:
+        res = client.post('/users/tester', json={ 'password': 'changed' }, headers=auth)
+    finally:
+        hasher.close()
+    assert res.status_code == 503 and res.headers['Retry-After'] == '1'
+
+
+GEVENT_SCRIPT = '''
+from gevent import monkey
+monkey.patch_all() # as `gunicorn.conf.py` does for `gevent` workers
+import os, sys, time, gevent
+from app.passwords import PasswordHasher
+
+hasher = PasswordHasher(rounds=10, workers=1)
+pw_hash = hasher.hash('password') # started in the master while preloading
+
+ticks = []
+def tick():
+    while True:
+        ticks.append(time.perf_counter())
+        gevent.sleep(0.005)
+
+ticker = gevent.spawn(tick)
+checks = [ gevent.spawn(hasher.check, pw_hash, 'password') for _ in range(4) ]
+gevent.joinall(checks)
+ticker.kill()
+assert all( g.value for g in checks ), 'wrong results'
+assert len(ticks) > 10, f'hub blocked while waiting, {len(ticks)} ticks'
+
+# same as the `pre_fork` and `post_fork` hooks
+hasher.close()
+pid = os.fork()
+if pid == 0:
+    hasher.reset()
+    ok = hasher.check(pw_hash, 'password')
+    hasher.close()
+    os._exit(0 if ok else 1)
+assert os.waitpid(pid, 0)[1] == 0, 'child failed'
+print('ok')
+'''
+
+
+def test_pool_under_gevent_workers():
+    pytest.importorskip('gevent')
+    res = subprocess.run([ sys.executable, '-c', textwrap.dedent(GEVENT_SCRIPT) ], capture_output=True, text=True, timeout=60)
+    assert res.returncode == 0 and res.stdout.strip() == 'ok', res.stderr
+    assert 'Traceback' not in res.stderr, res.stderr
@@ -0,0 +1,32 @@
+import mongomock, pytest
+
+from app import cards_db, users_db
+from app.models import users
+from conftest import add_cards
+
+
+@pytest.fixture
+def lagging(user, monkeypatch):
+    '''
+    A secondary that still sees the user as public, while the primary made them private.
+    '''
+    secondary = mongomock.MongoClient().db.users
+    secondary.insert_one(users_db.find_one({ '_id': user.user_id }))
+    users_db.update_one({ '_id': user.user_id }, { '$set': { 'public': False } })
+    monkeypatch.setattr(users, 'users_read_db', secondary)
+    return secondary
+
+
+def test_private_collection_not_served_from_secondary(client, user, lagging):
+    add_cards(user, { 'scryfall_id': '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01', 'amount': 1 })
+    card_id = str(cards_db.find_one({ 'user_id': user.user_id })['_id'])
+
+    assert client.get('/users/tester/collection').status_code == 401
+    assert client.get('/users/tester/collection/all').status_code == 401
+    assert client.get(f'/users/tester/collection/{card_id}').status_code == 401
+    assert client.post(f'/users/tester/collection/{card_id}').status_code == 401
+
+
+def test_owner_reads_private_collection(client, user, auth, lagging):
+    add_cards(user, { 'scryfall_id': '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01', 'amount': 1 })
+    assert client.get('/users/tester/collection', headers=auth).status_code == 200
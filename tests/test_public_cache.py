@@ -0,0 +1,52 @@
+import pytest
+
+from app import mongo, response_cache, users_db
+from app.database import CircuitBreaker
+from app.models import UserModel
+from conftest import add_cards
+
+
+@pytest.fixture
+def cache(app, user):
+    response_cache.init(max_bytes=1024*1024, ttl=60, check_interval=0, max_stale=60)
+    add_cards(user, { 'scryfall_id': '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01', 'amount': 1 })
+    yield response_cache
+    response_cache.init(max_bytes=0)
+
+
+def test_private_elsewhere_not_served(client, user, cache):
+    assert client.get('/users/tester/collection').status_code == 200
+    assert client.get('/users/tester/collection').status_code == 200
+    assert cache.hits == 1
+
+    # made private through another process, whose invalidation doesn't reach this one
+    users_db.update_one({ '_id': user.user_id }, { '$set': { 'public': False } })
+    assert client.get('/users/tester/collection').status_code == 401
+
+
+def test_written_elsewhere_not_served(client, user, cache, monkeypatch):
+    assert len(client.get('/users/tester/collection').get_json()['data']) == 1
+    with monkeypatch.context() as m:
+        m.setattr(cache, 'invalidate', lambda group: None) # as if written through another process
+        add_cards(UserModel(username='tester'), { 'scryfall_id': '5b1b9ce7-01c2-4d5d-8a2b-7c3f8c9f1b02', 'amount': 1 })
+    assert len(client.get('/users/tester/collection').get_json()['data']) == 2
+
+
+def test_stale_served_for_a_while(client, user, cache, monkeypatch):
+    assert client.get('/users/tester/collection').status_code == 200
+    monkeypatch.setattr(mongo, 'breaker', CircuitBreaker(threshold=1, cooldown=60))
+    mongo.breaker.failure()
+
+    res = client.get('/users/tester/collection')
+    assert res.status_code == 200 and 'Warning' in res.headers
+
+    monkeypatch.setattr(cache, 'max_stale', 0)
+    assert client.get('/users/tester/collection').status_code == 503
+
+
+def test_stats_requires_listed_user(app, client, auth):
+    assert client.get('/stats/cache').status_code == 401
+    assert client.get('/stats/cache', headers=auth).status_code == 401
+    app.config['STATS_USERS'] = ['tester']
+    res = client.get('/stats/cache', headers=auth)
+    assert res.status_code == 200 and 'hit_ratio' in res.get_json()
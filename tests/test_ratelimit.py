@@ -0,0 +1,79 @@
+import mongomock, pytest
+from pymongo.errors import ExecutionTimeout
+
+from app import limiter, mongo, ratelimits_db, response_cache
+from app.database import CircuitBreaker
+from app.ratelimit import MemoryBackend, MongoBackend
+from app.utils import DatabaseUnavailable
+from conftest import add_cards
+
+
+@pytest.fixture
+def limited(app, monkeypatch):
+    monkeypatch.setattr(limiter, 'enabled', True)
+    monkeypatch.setattr(limiter, 'limits', { **limiter.limits, 'read': (2, 60) })
+    monkeypatch.setattr(limiter, 'backend', MemoryBackend())
+    app.add_url_rule('/test/limited', 'test_limited', limiter.limit('read')(lambda: { 'ok': True }))
+    return limiter
+
+
+def test_memory_backend_refills():
+    backend = MemoryBackend()
+    assert backend.take('k', 2, 0.05) == (True, 1)
+    assert backend.take('k', 2, 0.05)[0]
+    assert not backend.take('k', 2, 0.05)[0]
+    assert backend.take('other', 2, 0.05)[0] # buckets are per key
+
+
+def test_limit_headers_and_429(client, limited):
+    res = client.get('/test/limited')
+    assert res.status_code == 200
+    assert res.headers['RateLimit-Limit'] == '2'
+    assert res.headers['RateLimit-Remaining'] == '1'
+    assert res.headers['RateLimit-Policy'] == '2;w=60;burst=2'
+
+    assert client.get('/test/limited').status_code == 200
+    res = client.get('/test/limited')
+    assert res.status_code == 429
+    assert res.headers['Retry-After'] == '30'
+    assert res.headers['RateLimit-Remaining'] == '0'
+
+
+def test_limiter_timeout_does_not_trip_breaker(client, limited, monkeypatch):
+    def timeout(*args, **kwargs):
+        raise ExecutionTimeout('operation exceeded time limit')
+
+    monkeypatch.setattr(mongo, 'breaker', CircuitBreaker(threshold=1, cooldown=60))
+    monkeypatch.setattr(limited, 'backend', MongoBackend(ratelimits_db, mongo.breaker))
+    monkeypatch.setattr(mongomock.collection.Collection, 'find_one_and_update', timeout)
+    for _ in range(3):
+        assert client.get('/test/limited').status_code == 200 # fails open
+    assert not mongo.breaker.is_open and mongo.breaker.failures == 0
+
+
+def test_limiter_skips_database_while_breaker_open(monkeypatch):
+    breaker = CircuitBreaker(threshold=1, cooldown=60)
+    breaker.failure()
+    monkeypatch.setattr(mongomock.collection.Collection, 'find_one_and_update', lambda *args, **kwargs: pytest.fail('called'))
+    with pytest.raises(DatabaseUnavailable):
+        MongoBackend(mongomock.MongoClient().db.ratelimits, breaker).take('k', 2, 60)
+
+
+def test_cached_public_reads_skip_limiter(client, limited, user, monkeypatch):
+    monkeypatch.setattr(response_cache, 'max_bytes', 1024*1024)
+    monkeypatch.setattr(limited, 'limits', { **limited.limits, 'read': (1, 60) })
+    add_cards(user, { 'scryfall_id': '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01', 'amount': 1 })
+    for _ in range(3):
+        assert client.get('/users/tester/collection').status_code == 200
+
+
+def test_client_address_from_trusted_proxies_only(app, client, limited):
+    app.add_url_rule('/test/key', 'test_key', lambda: { 'key': limited.key('read') })
+    key = lambda forwarded: client.get('/test/key', headers={ 'X-Forwarded-For': forwarded }, environ_base={ 'REMOTE_ADDR': '10.0.0.1' }).get_json()['key']
+
+    # behind one proxy, only the address it appended is trusted, whatever the client sent before it
+    assert key('203.0.113.7') == 'read:ip:203.0.113.7'
+    assert key('198.51.100.1, 203.0.113.7') == 'read:ip:203.0.113.7'
+
+    app.wsgi_app = app.wsgi_app.app # `PROXY_COUNT=0`, clients connect directly
+    assert key('198.51.100.1') == 'read:ip:10.0.0.1'
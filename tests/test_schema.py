@@ -0,0 +1,91 @@
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from bson.binary import Binary
+
+from app import cards_db, commands, migrations_db
+from app.models import CollectionModel, UserModel, schema
+from conftest import stored
+
+
+BOLT = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01'
+CHOP = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a02'
+
+
+def v1(user, scryfall_id, amount=1, **fields):
+    return {
+        '_id': ObjectId(),
+        'user_id': user.user_id,
+        'scryfall_id': scryfall_id,
+        'amount': amount,
+        'tag': [],
+        'foil': False,
+        'condition': 'NM',
+        'signed': False,
+        'altered': False,
+        'misprint': False,
+        'date_created': datetime.now(),
+        **fields,
+    }
+
+
+def test_encode_decode_round_trip():
+    doc = { 'scryfall_id': BOLT, 'condition': 'LP', 'foil': True, 'signed': False, 'altered': True, 'misprint': False }
+    encoded = schema.encode(doc)
+    assert encoded['v'] == schema.SCHEMA_VERSION
+    assert isinstance(encoded['scryfall_id'], Binary) and len(encoded['scryfall_id']) == 16
+    assert encoded['flags'] == schema.FLAGS['foil'] | schema.FLAGS['altered']
+    assert schema.decode(encoded) == doc
+
+    assert schema.encode(encoded) == encoded # already v2
+    assert schema.decode(doc) is doc # v1 is the models' layout
+    assert schema.encode({ 'scryfall_id': 'not-a-uuid' })['scryfall_id'] == 'not-a-uuid'
+
+
+def test_scryfall_id_in_matches_both_versions(app):
+    cards_db.insert_many([ { 'scryfall_id': BOLT }, { 'v': 2, 'scryfall_id': schema.encode_scryfall_id(BOLT) }, { 'scryfall_id': CHOP } ])
+    found = cards_db.find({ 'scryfall_id': schema.scryfall_id_in([ BOLT ]) })
+    assert [ schema.decode_scryfall_id(item['scryfall_id']) for item in found ] == [ BOLT, BOLT ]
+
+
+@pytest.fixture
+def migrate(app, monkeypatch):
+    # `mongomock` has no `collStats`
+    monkeypatch.setattr(commands, '_storage_stats', lambda name: { 'count': cards_db.count_documents({}) })
+    runner = app.test_cli_runner()
+    return lambda *args: runner.invoke(args=[ 'migrate-cards', *args ])
+
+
+def test_migrate_cards(client, auth, user, migrate, monkeypatch):
+    cards_db.insert_many([
+        v1(user, BOLT, 2, tag=['Trade', 'trade'], foil=True, condition='LP'),
+        v1(user, CHOP),
+    ])
+    monkeypatch.setattr(CollectionModel, '_reconcile_tags', lambda self: None) # `mongomock` lacks pipeline updates
+    UserModel(username='tester').collection.reconcile() # counters of the v1 cards
+    before = stored(user)
+
+    res = migrate('--batch-size', '1')
+    assert res.exit_code == 0, res.output
+    assert '2 card(s) migrated' in res.output
+    docs = { schema.decode_scryfall_id(item['scryfall_id']): item for item in cards_db.find({ 'user_id': user.user_id }) }
+    assert all( item['v'] == schema.SCHEMA_VERSION and 'foil' not in item for item in docs.values() )
+    assert docs[BOLT]['flags'] == schema.FLAGS['foil'] and docs[BOLT]['tag_normalized'] == ['trade']
+    assert stored(user) == before
+
+    cards = client.get('/collections', headers=auth).get_json()['data']
+    bolt, = [ card for card in cards if card['scryfall_id'] == BOLT ]
+    assert bolt['foil'] is True and bolt['condition'] == 'LP' and bolt['amount'] == 2
+
+
+def test_migrate_cards_resumes(user, migrate):
+    cards_db.insert_many([ v1(user, BOLT), v1(user, CHOP) ])
+    first = cards_db.find_one({ 'scryfall_id': BOLT })['_id']
+    migrations_db.insert_one({ '_id': 'cards_v2', 'last_id': first, 'migrated': 1 }) # interrupted after the first card
+
+    assert migrate().exit_code == 0
+    assert cards_db.find_one({ '_id': first })['scryfall_id'] == BOLT # skipped
+    assert cards_db.find_one({ 'scryfall_id': schema.encode_scryfall_id(CHOP) })['v'] == schema.SCHEMA_VERSION
+
+    assert migrate('--restart').exit_code == 0
+    assert cards_db.count_documents({ 'v': schema.SCHEMA_VERSION }) == 2
@@ -0,0 +1,49 @@
+import gzip, json
+import pytest
+
+from app.catalog import catalog
+from conftest import add_cards
+
+
+NAMES = [ f'Goblin {"X" * i}' for i in range(30) ] + [ 'Goblin Guide // Goblin Back' ]
+
+
+def scryfall_id(i:int) -> str:
+    return f'00000000-0000-4000-8000-{i:012d}'
+
+
+@pytest.fixture
+def cards(tmp_path):
+    path = tmp_path / 'catalog.gz'
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for i, name in enumerate(NAMES):
+            f.write(json.dumps([ scryfall_id(i), name, 'tst', str(i + 1), 'Test Set' ]) + '\n')
+    catalog.load(str(path))
+    yield
+    catalog.__init__()
+
+
+def test_ids_for_search_is_not_capped_by_suggestions(cards):
+    everything = [ scryfall_id(i) for i in range(len(NAMES)) ]
+    assert len(catalog.search('gob')) == 20 # the typeahead is
+    assert sorted(catalog.ids_for_search('gob')) == everything
+    assert catalog.ids_for_search('goblin back') == [ scryfall_id(len(NAMES) - 1) ]
+    assert catalog.ids_for_search('elf') == []
+
+
+def test_ids_for_search_capped_shortest_first(cards, monkeypatch):
+    assert catalog.ids_for_search('gob', max_ids=3) == [ scryfall_id(i) for i in range(3) ]
+
+    def matches(query):
+        yield from [ 'goblin', 'goblin x' ]
+        pytest.fail('matches are walked past the cap')
+    monkeypatch.setattr(catalog, '_matches', matches)
+    assert catalog.ids_for_search('gob', max_ids=2) == [ scryfall_id(0), scryfall_id(1) ]
+
+
+def test_collection_search_counts_every_match(cards, user, client, auth):
+    add_cards(user, *[ { 'scryfall_id': scryfall_id(i), 'amount': 1 } for i in range(25, len(NAMES)) ]) # the longest names
+    res = client.get('/collections?q=gob&per_page=2', headers=auth)
+    assert res.status_code == 200
+    assert res.json['total_documents'] == len(NAMES) - 25
+    assert len(res.json['data']) == 2 and 'next_page' in res.json
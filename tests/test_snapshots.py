@@ -0,0 +1,65 @@
+import pytest
+
+from app import snapshot_chunks_db
+from app.jobs.handlers import handlers
+from app.models import UserModel, JobModel, SnapshotModel
+from conftest import add_cards, stored
+
+
+BOLT = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a01'
+CHOP = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a02'
+ELK  = '4a0a8bd6-f0b1-4c4e-9f1a-6b2e7b8f0a03'
+
+
+def run_restore(user:UserModel, snapshot:SnapshotModel, version:int=None):
+    job = JobModel.create(user.user_id, 'restore', { 'snapshot_id': str(snapshot._id), 'version': version })
+    handlers['restore'](JobModel.get(job._id, user.user_id))
+    return JobModel.get(job._id, user.user_id)
+
+
+def test_reconstruct_replays_journal(user):
+    add_cards(user, { 'scryfall_id': BOLT, 'amount': 2 }, { 'scryfall_id': CHOP, 'amount': 1 })
+    snapshot = SnapshotModel.create(UserModel(user.user_id))
+    add_cards(UserModel(user.user_id), { 'scryfall_id': BOLT, 'amount': '+3' }, { 'scryfall_id': ELK, 'amount': 4 })
+    version = UserModel(user.user_id).collection_version
+
+    cards = { card['scryfall_id']: card['amount'] for card in snapshot.reconstruct() }
+    assert cards == { BOLT: 2, CHOP: 1 }
+    cards = { card['scryfall_id']: card['amount'] for card in snapshot.reconstruct(version) }
+    assert cards == { BOLT: 5, CHOP: 1, ELK: 4 }
+
+
+def test_restore(user):
+    add_cards(user, { 'scryfall_id': BOLT, 'amount': 2 }, { 'scryfall_id': CHOP, 'amount': 1 })
+    snapshot = SnapshotModel.create(UserModel(user.user_id))
+    user = UserModel(user.user_id)
+    add_cards(user, { 'scryfall_id': BOLT, 'amount': '+3' }, { 'scryfall_id': ELK, 'amount': 4 })
+
+    job = run_restore(UserModel(user.user_id), snapshot)
+    assert job.status == JobModel.DONE
+    assert (job.result['created'], job.result['updated'], job.result['deleted']) == (0, 1, 1)
+    assert stored(user) == { BOLT: 2, CHOP: 1 }
+
+
+def test_restore_keeps_target_when_pruning(user, monkeypatch):
+    monkeypatch.setattr(SnapshotModel, 'MAX_PER_USER', 2)
+    add_cards(user, { 'scryfall_id': BOLT, 'amount': 2 })
+    target = SnapshotModel.create(UserModel(user.user_id))
+    add_cards(UserModel(user.user_id), { 'scryfall_id': CHOP, 'amount': 10 }) # a bad import
+    SnapshotModel.create(UserModel(user.user_id))
+
+    # the safety snapshot taken by the job would push the target out
+    job = run_restore(UserModel(user.user_id), target)
+    assert job.status == JobModel.DONE
+    assert stored(user) == { BOLT: 2 }
+
+
+def test_restore_incomplete_snapshot_fails_untouched(user):
+    add_cards(user, { 'scryfall_id': BOLT, 'amount': 2 })
+    snapshot = SnapshotModel.create(UserModel(user.user_id))
+    add_cards(UserModel(user.user_id), { 'scryfall_id': CHOP, 'amount': 1 })
+    snapshot_chunks_db.delete_many({ 'snapshot_id': snapshot._id })
+
+    with pytest.raises(ValueError):
+        list(snapshot.restore(UserModel(user.user_id).collection))
+    assert stored(user) == { BOLT: 2, CHOP: 1 }
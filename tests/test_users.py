@@ -0,0 +1,37 @@
+import pytest
+
+from app import hasher, users_db
+from app.models import UserModel
+from app.utils import ServerBusy
+
+
+@pytest.fixture
+def hashes(monkeypatch):
+    calls = []
+    hash_async = hasher.hash_async
+    monkeypatch.setattr(hasher, 'hash_async', lambda password: calls.append(password) or hash_async(password))
+    return calls
+
+
+def test_update_same_password_not_hashed(user, hashes):
+    assert user.update(password='password') == [{ 'field': 'password', 'action': 'NOP' }]
+    assert hashes == []
+
+
+def test_update_password(user, hashes):
+    assert user.update(password='changed') == [{ 'field': 'password', 'action': 'UPDATED' }]
+    assert hashes == ['changed']
+    user = UserModel(username='tester')
+    assert user.check_password_hash('changed') and not user.check_password_hash('password')
+
+
+def test_update_busy_check_hashes_nothing(user, hashes, monkeypatch):
+    def busy(*args):
+        raise ServerBusy('too many password operations in progress')
+
+    monkeypatch.setattr(hasher, 'check', busy)
+    stored = users_db.find_one({ '_id': user.user_id })['password']
+    with pytest.raises(ServerBusy):
+        user.update(password='changed')
+    assert hashes == []
+    assert users_db.find_one({ '_id': user.user_id })['password'] == stored
@@ -0,0 +1,20 @@
+import pytest
+
+from app.utils.validators import _check_taglist
+
+
+@pytest.mark.parametrize('value, expected', [
+    ([ ' a', 'b ' ],    [ 'a', 'b' ]),
+    ('["a", "b"]',      [ 'a', 'b' ]),
+    ("['a', 'b']",      [ 'a', 'b' ]),
+    ('[]',              []),
+    ('trade binder ',   [ 'trade binder' ]),
+])
+def test_taglist(value, expected):
+    assert _check_taglist(value) == expected
+
+
+@pytest.mark.parametrize('value', [ 5, [ 'a', 1 ], '[1, 2]', '{"a": 1}' ])
+def test_taglist_invalid(value):
+    with pytest.raises(ValueError):
+        _check_taglist(value)
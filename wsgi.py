@@ -1,6 +1,9 @@
 '''Web Server Gateway Interface'''
 
-from app import app
+from app import create_app, startup
+
+app = create_app()
+startup(app)
 
 if __name__ == "__main__":    
     # app.run(ssl_context='adhoc')